@@ -1,3 +1,25 @@
-from cgrates.client import Client
-from cgrates.client.base import TPNotFoundException
-from cgrates.schemas import models
\ No newline at end of file
+import importlib
+
+# Loaded on first access, keeps `import cgrates` cheap (no requests/schematics/rfc3339 until used)
+_lazy = {
+    'Client': ('cgrates.client.client', 'Client'),
+    'TPNotFoundException': ('cgrates.client.base', 'TPNotFoundException'),
+    'models': ('cgrates.schemas.models', None),
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    module_name, attr = _lazy[name]
+    module = importlib.import_module(module_name)
+    value = getattr(module, attr) if attr else module
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
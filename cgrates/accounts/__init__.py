@@ -0,0 +1,3 @@
+from cgrates.accounts.sync import AccountSync, AccountChange, ADDED, CHANGED, REMOVED
+from cgrates.accounts.balances import BalanceTable, ANY_DESTINATION
+from cgrates.accounts.ledger import ReservationLedger, Reservation, estimate_cost
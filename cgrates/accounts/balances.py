@@ -0,0 +1,250 @@
+import math
+import datetime
+from array import array
+from collections import defaultdict
+import logging
+
+log = logging.getLogger()
+
+
+# Destination key for balances without destination ids (usable for any destination)
+ANY_DESTINATION = "*any"
+
+_numpy = None
+
+
+def _np():
+    """
+    NumPy if installed (queries are vectorized), else None (plain Python over the same columns)
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def _expiration(value, cache):
+    """
+    Epoch seconds of an ExpirationDate (RFC3339 string or datetime), NaN if the balance never expires
+    """
+    if not value:
+        return math.nan
+
+    if isinstance(value, datetime.datetime):
+        return math.nan if value.year <= 1 else value.timestamp()
+
+    seconds = cache.get(value)
+
+    if seconds is None:
+        if value.startswith("0001-01-01"):
+            seconds = math.nan
+        else:
+            text = value.replace("Z", "+00:00")
+            # Go sends up to nanoseconds, fromisoformat takes microseconds
+            if "." in text:
+                head, _, tail = text.partition(".")
+                digits = len(tail) - len(tail.lstrip("0123456789"))
+                text = head + tail[digits:]
+            when = datetime.datetime.fromisoformat(text)
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=datetime.timezone.utc)
+            seconds = when.timestamp()
+        cache[value] = seconds
+
+    return seconds
+
+
+class BalanceTable:
+    """
+    Accounts' balances flattened into columns, one row per balance
+    Columns are stdlib arrays (value, weight, expiration as epoch seconds with NaN for never, disabled,
+    balance type and account codes), with NumPy installed queries run vectorized over them without copying
+
+    Build it from the streaming account iterator: BalanceTable.from_client(client)
+    """
+
+    def __init__(self):
+        self.accounts = []
+        self.types = []
+
+        self.account = array('l')
+        self.type = array('b')
+        self.value = array('d')
+        self.weight = array('d')
+        self.expiration = array('d')
+        self.disabled = array('b')
+        self.balance_id = []
+        self.destination_ids = []
+
+        self._account_codes = {}
+        self._type_codes = {}
+        self._expirations = {}
+
+    @classmethod
+    def from_accounts(cls, accounts):
+        """
+        :param accounts: AccountRecord (client.iter_accounts(records=True)) or models.Account
+        """
+        table = cls()
+        for account in accounts:
+            table.add_account(account)
+        return table
+
+    @classmethod
+    def from_client(cls, client, page_size: int = 500, account_ids=None):
+        return cls.from_accounts(client.iter_accounts(page_size=page_size, account_ids=account_ids, records=True))
+
+    def _code(self, codes, names, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def add_account(self, account):
+        account_code = self._code(self._account_codes, self.accounts, account.account)
+
+        if hasattr(account, 'balances'):
+            # AccountRecord
+            balances = [(b.balance_type, b, b.destination_ids) for b in account.balances]
+        else:
+            # models.Account, DestinationIDs is a dict of id => enabled
+            balances = [(balance_type, b, tuple(d for d, enabled in (b.destination_ids or {}).items() if enabled not in (False, "false")))
+                        for balance_type, items in (account.balance_map or {}).items() for b in items]
+
+        for balance_type, balance, destination_ids in balances:
+            self.account.append(account_code)
+            self.type.append(self._code(self._type_codes, self.types, balance_type))
+            self.value.append(balance.value or 0.0)
+            self.weight.append(balance.weight or 0.0)
+            self.expiration.append(_expiration(balance.expiration_date, self._expirations))
+            self.disabled.append(1 if balance.disabled else 0)
+            self.balance_id.append(balance.id)
+            self.destination_ids.append(destination_ids)
+
+    def __len__(self):
+        return len(self.value)
+
+    def _vectorized(self):
+        # Empty tables take the plain path (frombuffer rejects empty buffers on older NumPy)
+        return _np() if len(self) else None
+
+    def _type_code(self, balance_type):
+        return self._type_codes.get(balance_type, -1)
+
+    def filter(self, balance_type: str = None, include_disabled: bool = False, expiring_before: datetime.datetime = None,
+               min_value: float = None, max_value: float = None, destination_id: str = None):
+        """
+        :param expiring_before: Only balances with an expiration date before this
+        :param destination_id: Only balances restricted to this destination id
+        :return: BalanceTable of the matching rows
+        """
+        code = self._type_code(balance_type) if balance_type is not None else None
+        before = expiring_before.timestamp() if expiring_before is not None else None
+
+        np = self._vectorized()
+
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            if code is not None:
+                mask &= np.frombuffer(self.type, dtype=np.int8) == code
+            if not include_disabled:
+                mask &= np.frombuffer(self.disabled, dtype=np.int8) == 0
+            if before is not None:
+                # NaN (never expires) compares False
+                mask &= np.frombuffer(self.expiration) < before
+            if min_value is not None:
+                mask &= np.frombuffer(self.value) >= min_value
+            if max_value is not None:
+                mask &= np.frombuffer(self.value) <= max_value
+            if destination_id is not None:
+                mask &= np.fromiter((destination_id in d for d in self.destination_ids), dtype=bool, count=len(self))
+            return self.take(np.flatnonzero(mask))
+
+        rows = [
+            i for i in range(len(self))
+            if (code is None or self.type[i] == code)
+            and (include_disabled or not self.disabled[i])
+            and (before is None or self.expiration[i] < before)
+            and (min_value is None or self.value[i] >= min_value)
+            and (max_value is None or self.value[i] <= max_value)
+            and (destination_id is None or destination_id in self.destination_ids[i])
+        ]
+        return self.take(rows)
+
+    def take(self, rows):
+        """
+        :return: BalanceTable of the given row indexes (accounts and types keep their codes)
+        """
+        table = BalanceTable()
+        table.accounts, table._account_codes = self.accounts, self._account_codes
+        table.types, table._type_codes = self.types, self._type_codes
+
+        np = self._vectorized()
+
+        for name in ('account', 'type', 'value', 'weight', 'expiration', 'disabled'):
+            column = getattr(self, name)
+            if np is not None:
+                selected = array(column.typecode)
+                selected.frombytes(np.frombuffer(column, dtype=np.dtype(column.typecode))[rows].tobytes())
+            else:
+                selected = array(column.typecode, [column[i] for i in rows])
+            setattr(table, name, selected)
+
+        rows = rows.tolist() if np is not None and hasattr(rows, 'tolist') else rows
+
+        table.balance_id = [self.balance_id[i] for i in rows]
+        table.destination_ids = [self.destination_ids[i] for i in rows]
+
+        return table
+
+    def expiring_within(self, days: float, now: datetime.datetime = None, **kwargs):
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        return self.filter(expiring_before=now + datetime.timedelta(days=days), **kwargs)
+
+    def total(self):
+        np = self._vectorized()
+        if np is not None:
+            return float(np.frombuffer(self.value).sum())
+        return math.fsum(self.value)
+
+    def by_account(self):
+        """
+        :return: account => sum of balance values (every account seen, 0 if no rows here)
+        """
+        np = self._vectorized()
+        if np is not None:
+            sums = np.bincount(np.frombuffer(self.account, dtype=np.dtype('l')), weights=np.frombuffer(self.value), minlength=len(self.accounts))
+            return dict(zip(self.accounts, sums.tolist()))
+
+        sums = [0.0] * len(self.accounts)
+        for account, value in zip(self.account, self.value):
+            sums[account] += value
+        return dict(zip(self.accounts, sums))
+
+    def accounts_below(self, threshold: float, balance_type: str = "*monetary"):
+        """
+        :return: Accounts whose enabled balance_type balances sum to less than threshold, lowest first
+        """
+        sums = self.filter(balance_type=balance_type).by_account()
+        return sorted((a for a, total in sums.items() if total < threshold), key=lambda a: sums[a])
+
+    def exposure_by_destination(self, balance_type: str = "*monetary"):
+        """
+        :return: destination id => sum of enabled balance_type values usable for it (unrestricted balances under ANY_DESTINATION)
+        """
+        table = self.filter(balance_type=balance_type)
+        result = defaultdict(float)
+
+        for value, destination_ids in zip(table.value, table.destination_ids):
+            for destination_id in destination_ids or (ANY_DESTINATION,):
+                result[destination_id] += value
+
+        return dict(result)
+
+    def __repr__(self):
+        return '<BalanceTable(accounts={}, balances={})>'.format(len(self.accounts), len(self))
@@ -0,0 +1,245 @@
+import math
+import time
+import uuid
+import threading
+from collections import namedtuple
+from cgrates.accounts.balances import _expiration
+import logging
+
+log = logging.getLogger()
+
+
+Reservation = namedtuple("Reservation", ["reservation_id", "account", "amount", "expires"])
+
+
+def estimate_cost(quote, seconds: float):
+    """
+    Cost of a call of seconds at a tariff.PriceMatrix Quote, as the engine bills it: connect fee plus the usage
+    rounded up to whole increments (at least the first)
+    """
+    return quote.connect_fee + max(1, math.ceil(seconds / quote.increment)) * quote.first_increment_price
+
+
+class _AccountState:
+
+    __slots__ = ('balance', 'allow_negative', 'disabled', 'fetched', 'pending')
+
+    def __init__(self, balance, allow_negative, disabled, fetched):
+        self.balance = balance
+        self.allow_negative = allow_negative
+        self.disabled = disabled
+        self.fetched = fetched
+        self.pending = {}
+
+
+class ReservationLedger:
+    """
+    In process prepaid pre-authorization
+    Account balances are seeded from the engine and held locally, calls reserve an amount against them, so
+    "can this call afford N seconds" is answered without a round trip and concurrent calls cannot overspend
+    what this process has reserved
+
+    A balance is refreshed from the engine once older than max_age (on next use), after settle (process_cdr)
+    and on reconcile(), which can be run on a schedule. Reservations not settled or released within ttl lapse
+    Note: Reservations are per process, several processes authorizing the same account can still overspend
+    between refreshes. Only balances without destination restrictions are counted
+    """
+
+    def __init__(self, client, balance_type: str = "*monetary", max_age: float = 60.0, ttl: float = 3600.0, page_size: int = 500):
+        """
+        :param max_age: Seconds a seeded balance is trusted before it is fetched again (None for until reconcile)
+        :param ttl: Seconds a reservation is held
+        """
+        self.client = client
+        self.balance_type = balance_type
+        self.max_age = max_age
+        self.ttl = ttl
+        self.page_size = page_size
+
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._reservations = {}
+        self._expirations = {}
+
+        self.fetches = 0
+        self.declined = 0
+
+    def _balance(self, record, now):
+        total = 0.0
+        for balance in record.balances:
+            if balance.balance_type != self.balance_type or balance.disabled or balance.destination_ids:
+                continue
+            expires = _expiration(balance.expiration_date, self._expirations)
+            if not expires <= now:
+                # NaN (never expires) compares False
+                total += balance.value or 0.0
+        return total
+
+    def _fetch(self, account_ids, settled=None):
+        """
+        Fetch balances from the engine and install them, pending reservations are kept
+        :param settled: Id of a reservation whose debit the fetched balances include, dropped as they are installed
+        """
+        account_ids = list(account_ids)
+        records = {r.account: r for r in self.client.iter_accounts(page_size=self.page_size, account_ids=account_ids, records=True)}
+
+        now = time.time()
+        fetched = time.monotonic()
+
+        with self._lock:
+            self.fetches += 1
+
+            for account_id in account_ids:
+                record = records.get(account_id)
+                if record is None:
+                    # Unknown accounts can afford nothing
+                    state = _AccountState(0.0, False, True, fetched)
+                else:
+                    state = _AccountState(self._balance(record, now), record.allow_negative, record.disabled, fetched)
+
+                previous = self._accounts.get(account_id)
+                if previous is not None:
+                    state.pending = previous.pending
+
+                self._accounts[account_id] = state
+
+            if settled is not None:
+                self._drop(settled)
+
+    def _state(self, account):
+        """
+        Account state, fetched if unknown or older than max_age (call without the lock held)
+        """
+        state = self._accounts.get(account)
+
+        if state is None or (self.max_age is not None and time.monotonic() - state.fetched >= self.max_age):
+            self._fetch([account])
+            state = self._accounts[account]
+
+        return state
+
+    def _expire(self, state, now):
+        for reservation_id in [r.reservation_id for r in state.pending.values() if r.expires <= now]:
+            del state.pending[reservation_id]
+            del self._reservations[reservation_id]
+            log.debug("Reservation {} lapsed".format(reservation_id))
+
+    def _available(self, state):
+        self._expire(state, time.monotonic())
+
+        if state.disabled:
+            return 0.0
+
+        if state.allow_negative:
+            return math.inf
+
+        return state.balance - sum(r.amount for r in state.pending.values())
+
+    def available(self, account):
+        """
+        :return: Balance less pending reservations (inf if the account may go negative)
+        """
+        state = self._state(account)
+        with self._lock:
+            return self._available(state)
+
+    def can_afford(self, account, amount: float):
+        return self.available(account) >= amount
+
+    def max_seconds(self, account, quote):
+        """
+        :param quote: tariff.PriceMatrix Quote
+        :return: Seconds of call the account can afford now, whole increments (0 if not even the first)
+        """
+        available = self.available(account) - quote.connect_fee
+
+        if available < quote.first_increment_price:
+            return 0
+
+        if math.isinf(available) or quote.first_increment_price <= 0:
+            return math.inf
+
+        # Rounded first so float error does not drop a whole increment (0.9 // 0.01 == 89)
+        return int(round(available / quote.first_increment_price, 9)) * quote.increment
+
+    def reserve(self, account, amount: float, reservation_id: str = None):
+        """
+        Hold amount against the account if it can afford it
+        :return: Reservation, None if declined
+        """
+        state = self._state(account)
+
+        with self._lock:
+            if self._available(state) < amount:
+                self.declined += 1
+                return None
+
+            reservation = Reservation(reservation_id or uuid.uuid4().hex, account, amount, time.monotonic() + self.ttl)
+
+            if reservation.reservation_id in self._reservations:
+                raise Exception("Reservation {} already exists".format(reservation.reservation_id))
+
+            state.pending[reservation.reservation_id] = reservation
+            self._reservations[reservation.reservation_id] = reservation
+
+        return reservation
+
+    def authorize(self, account, quote, seconds: float, reservation_id: str = None):
+        """
+        Reserve the cost of a call of seconds at quote (see estimate_cost)
+        :return: Reservation, None if declined
+        """
+        return self.reserve(account, estimate_cost(quote, seconds), reservation_id=reservation_id)
+
+    def release(self, reservation_id):
+        """
+        Drop a reservation (call not connected)
+        :return: The Reservation, None if unknown or lapsed
+        """
+        with self._lock:
+            return self._drop(reservation_id)
+
+    def _drop(self, reservation_id):
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is not None:
+            self._accounts[reservation.account].pending.pop(reservation_id, None)
+        return reservation
+
+    def settle(self, reservation_id, cdr):
+        """
+        Submit the call's CDR (the engine debits the account), then refresh the balance and drop the reservation
+        together, so the debit is never missing from both (which would overstate what the account can afford)
+        If the refresh fails the reservation stays held until released, it lapses or the next settle
+        :return: process_cdr result
+        """
+        reservation = self._reservations.get(reservation_id)
+
+        result = self.client.process_cdr(cdr)
+
+        if reservation is not None:
+            self._fetch([reservation.account], settled=reservation_id)
+
+        return result
+
+    def reconcile(self, account_ids=None):
+        """
+        Refresh balances from the engine (default every known account), in pages of page_size
+        """
+        with self._lock:
+            account_ids = list(account_ids if account_ids is not None else self._accounts)
+
+        if account_ids:
+            self._fetch(account_ids)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'accounts': len(self._accounts),
+                'reservations': len(self._reservations),
+                'reserved': sum(r.amount for r in self._reservations.values()),
+                'fetches': self.fetches,
+                'declined': self.declined,
+            }
+
+    def __repr__(self):
+        return '<ReservationLedger(accounts={}, reservations={})>'.format(len(self._accounts), len(self._reservations))
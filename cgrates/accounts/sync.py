@@ -0,0 +1,78 @@
+import json
+import hashlib
+from collections import namedtuple
+import logging
+
+log = logging.getLogger()
+
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+AccountChange = namedtuple("AccountChange", ["kind", "account_id", "account"])
+
+
+class AccountSync:
+    """
+    Incremental account mirror
+    Keeps a compact snapshot (account_id => 8 byte digest of the account) and pulls the tenant's accounts
+    page by page, emitting only added, changed and removed accounts
+    Note: Paging relies on the engine returning accounts in a stable order between pages
+    """
+
+    def __init__(self, client, page_size: int = 500, snapshot: dict = None):
+        self.client = client
+        self.page_size = page_size
+        self.snapshot = dict(snapshot or {})
+
+    @staticmethod
+    def digest(account):
+        data = account.to_dict()
+
+        # The engine does not keep balances in a stable order
+        if data.get('BalanceMap'):
+            data['BalanceMap'] = {k: sorted(v or [], key=lambda b: (str(b.get('ID')), str(b.get('Uuid'))))
+                                  for k, v in data['BalanceMap'].items()}
+
+        data = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest()
+
+    def changes(self):
+        """
+        Pull all accounts and yield an AccountChange per added, changed or removed account
+        The snapshot is updated as changes are yielded, removals are detected once all pages are pulled
+        :return: Generator of AccountChange
+        """
+
+        seen = set()
+
+        for account in self.client.iter_accounts(page_size=self.page_size):
+            account_id = account.account
+
+            seen.add(account_id)
+
+            digest = self.digest(account)
+            previous = self.snapshot.get(account_id)
+
+            if previous == digest:
+                continue
+
+            self.snapshot[account_id] = digest
+
+            yield AccountChange(ADDED if previous is None else CHANGED, account_id, account)
+
+        for account_id in [a for a in self.snapshot if a not in seen]:
+            del self.snapshot[account_id]
+            yield AccountChange(REMOVED, account_id, None)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({k: v.hex() for k, v in self.snapshot.items()}, f)
+
+    def load(self, path):
+        with open(path) as f:
+            self.snapshot = {k: bytes.fromhex(v) for k, v in json.load(f).items()}
+
+    def __repr__(self):
+        return '<AccountSync(accounts={})>'.format(len(self.snapshot))
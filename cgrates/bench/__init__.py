@@ -0,0 +1,7 @@
+from cgrates.bench.stats import LatencyStats
+from cgrates.bench.capture import TrafficRecorder, read_capture
+from cgrates.bench.replay import Replayer, peak_concurrency
+from cgrates.bench.fake import FakeEngine, ENGINE_HANDLERS
+from cgrates.bench.runner import LoadRunner
+from cgrates.bench.workloads import (PrefixDistribution, UsageDistribution, Workload, CostWorkload, CDRWorkload,
+                                     BalanceChurnWorkload, MixedWorkload, parse_prefixes)
@@ -0,0 +1,93 @@
+import os
+import json
+import gzip
+import random
+import threading
+import logging
+
+log = logging.getLogger()
+
+
+class TrafficRecorder:
+    """
+    Records sampled call_api traffic (method, params, timing, payload sizes, error) as gzipped JSON lines
+    Files rotate at max_bytes (uncompressed) keeping `backups` old files: path, path.1, path.2...
+    """
+
+    def __init__(self, path, sample_rate: float = 1.0, max_bytes: int = 64 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._written = 0
+
+        self.recorded = 0
+        self.skipped = 0
+
+    def sample(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        for i in range(self.backups - 1, 0, -1):
+            source = "{}.{}".format(self.path, i)
+            if os.path.exists(source):
+                os.replace(source, "{}.{}".format(self.path, i + 1))
+
+        if self.backups:
+            os.replace(self.path, "{}.1".format(self.path))
+
+    def record(self, method, params, started, duration, request_bytes, response_bytes, error=None):
+        line = json.dumps({
+            't': started,
+            'd': duration,
+            'm': method,
+            'p': params,
+            'rq': request_bytes,
+            'rs': response_bytes,
+            'e': error,
+            'th': threading.get_ident(),
+        }, separators=(",", ":"), default=str) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at")
+                self._written = 0
+
+            self._file.write(line)
+            self._written += len(line)
+            self.recorded += 1
+
+            if self._written >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __repr__(self):
+        return '<TrafficRecorder(path={}, sample_rate={}, recorded={})>'.format(self.path, self.sample_rate, self.recorded)
+
+
+def read_capture(*paths):
+    """
+    Read captured calls from one or more capture files, ordered by start time
+    :return: List of dicts with keys t (start), d (duration), m (method), p (params), rq/rs (sizes), e (error), th (thread)
+    """
+    records = []
+
+    for path in paths:
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                records.append(json.loads(line))
+
+    records.sort(key=lambda r: r['t'])
+
+    return records
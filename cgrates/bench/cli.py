@@ -0,0 +1,121 @@
+import sys
+import csv
+import json
+import argparse
+import logging
+from cgrates.bench.fake import FakeEngine, ENGINE_HANDLERS
+from cgrates.bench.runner import LoadRunner
+from cgrates.bench.workloads import (parse_prefixes, PrefixDistribution, UsageDistribution, CostWorkload, CDRWorkload,
+                                     BalanceChurnWorkload, MixedWorkload)
+
+log = logging.getLogger()
+
+CSV_FIELDS = ['operation', 'count', 'errors', 'duration', 'throughput', 'p50', 'p90', 'p99', 'max', 'le', 'bucket_count']
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cgrates-bench", description="Synthetic load generator for CGRateS through py-cgrates")
+
+    parser.add_argument("workload", choices=["cost", "cdr", "balance", "mix"])
+
+    target = parser.add_argument_group("target")
+    target.add_argument("--host", default="localhost")
+    target.add_argument("--port", type=int, default=2080)
+    target.add_argument("--tenant", default="cgrates.org")
+    target.add_argument("--fake", action="store_true", help="Run against a local fake engine (measures client overhead only)")
+    target.add_argument("--fake-latency", type=float, default=0.0, help="Seconds the fake engine waits per call")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=8, help="Closed loop workers, or max in flight for open loop")
+    load.add_argument("--rate", type=float, default=None, help="Open loop arrivals per second (default closed loop)")
+    load.add_argument("--duration", type=float, default=10, help="Measured seconds")
+    load.add_argument("--warmup", type=float, default=2, help="Unmeasured warm-up seconds")
+    load.add_argument("--seed", type=int, default=None)
+
+    workload = parser.add_argument_group("workload")
+    workload.add_argument("--prefixes", default="64:6,61:3,1:1", help="Destination prefix distribution prefix:weight,...")
+    workload.add_argument("--number-length", type=int, default=10)
+    workload.add_argument("--usage-median", type=float, default=60, help="Median call duration in seconds (log-normal)")
+    workload.add_argument("--usage-sigma", type=float, default=1.0)
+    workload.add_argument("--unanswered", type=float, default=0.2, help="Share of unanswered (0s) CDRs")
+    workload.add_argument("--accounts", type=int, default=100, help="Number of accounts (ACC_0 .. ACC_N-1)")
+    workload.add_argument("--mix", default="cost:8,cdr:1,balance:1", help="Workload mix for 'mix' as name:weight,...")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--format", choices=["json", "csv"], default="json")
+    output.add_argument("--output", default="-", help="File to write to (default stdout)")
+
+    return parser
+
+
+def build_workload(args):
+    destinations = PrefixDistribution(parse_prefixes(args.prefixes), length=args.number_length)
+    accounts = ["ACC_{}".format(i) for i in range(args.accounts)]
+
+    workloads = {
+        'cost': lambda: CostWorkload(destinations, UsageDistribution(args.usage_median, args.usage_sigma), subjects=accounts),
+        'cdr': lambda: CDRWorkload(destinations, UsageDistribution(args.usage_median, args.usage_sigma, args.unanswered), accounts=accounts),
+        'balance': lambda: BalanceChurnWorkload(accounts),
+    }
+
+    if args.workload == "mix":
+        return MixedWorkload([(weight, workloads[name]()) for name, weight in parse_prefixes(args.mix)])
+
+    return workloads[args.workload]()
+
+
+def write_json(report, f):
+    json.dump(report, f, indent=2)
+    f.write("\n")
+
+
+def write_csv(report, f):
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+
+    for name, stats in [("*total", report['total'])] + list(report['operations'].items()):
+        for bound, count in stats['histogram']:
+            row = {k: stats[k] for k in CSV_FIELDS[1:-2]}
+            row.update({'operation': name, 'le': bound, 'bucket_count': count})
+            writer.writerow(row)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from cgrates.client import Client
+
+    engine = None
+    host, port = args.host, args.port
+
+    if args.fake:
+        engine = FakeEngine(handlers=ENGINE_HANDLERS, latency=args.fake_latency).start()
+        host, port = engine.host, engine.port
+
+    try:
+        client = Client(tenant=args.tenant, host=host, port=port, pool_size=args.concurrency)
+
+        runner = LoadRunner(client, build_workload(args), concurrency=args.concurrency, rate=args.rate,
+                            duration=args.duration, warmup=args.warmup, seed=args.seed)
+        runner.run()
+    finally:
+        if engine is not None:
+            engine.stop()
+
+    report = runner.to_dict()
+    report['workload'] = args.workload
+    report['target'] = "fake" if args.fake else "{}:{}".format(host, port)
+
+    write = write_csv if args.format == "csv" else write_json
+
+    if args.output == "-":
+        write(report, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as f:
+            write(report, f)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import json
+import socket
+import time
+import zlib
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger()
+
+
+def _get_cost(params):
+    usage = int(float(str(params[0].get("Usage", "0")).rstrip("s")) * 10 ** 9)
+    return {
+        "Cost": round(usage / 10 ** 9 * 0.01, 4),
+        "Usage": usage,
+        "Charges": [{"Increments": [{"Cost": 0.01, "Usage": 10 ** 9}]}],
+        "RatingFilters": {"1": {"DestinationID": "DST_FAKE", "DestinationPrefix": params[0].get("Destination", "")[:2],
+                                "RatingPlanID": "RPL_FAKE", "Subject": params[0].get("Subject")}},
+        "Rates": {"1": [{"Value": 0.6, "GroupIntervalStart": 0, "RateIncrement": 10 ** 9, "RateUnit": 60 * 10 ** 9}]},
+    }
+
+
+def _get_account(params):
+    return {
+        "ID": "{}:{}".format(params[0].get("Tenant"), params[0].get("Account")),
+        "BalanceMap": {"*monetary": [{"Uuid": "fake", "ID": "MainBalance", "Value": 10.0, "Weight": 10}]},
+        "AllowNegative": False,
+        "Disabled": False,
+    }
+
+
+# Handlers answering like an engine for the calls used by cgrates-bench
+ENGINE_HANDLERS = {
+    "ApierV1.GetCost": _get_cost,
+    "ApierV2.GetAccount": _get_account,
+}
+
+
+class FakeEngine:
+    """
+    Local JSON-RPC stand-in for a CGRateS engine, for replays and benchmarks without an engine
+    Every method answers "OK" unless a handler is registered for it
+    """
+
+    def __init__(self, handlers: dict = None, latency: float = 0.0, host="127.0.0.1", port=0, response_encoding: str = None):
+        """
+        :param handlers: method => callable(params) returning the result, exceptions are returned as the JSON-RPC error
+        :param latency: Seconds to sleep before answering each call
+        :param port: 0 picks a free port, see .port
+        :param response_encoding: "gzip" or "deflate" to compress responses when the client accepts it
+        """
+        self.handlers = handlers or {}
+        self.latency = latency
+        self.response_encoding = response_encoding
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.compressed_requests = 0
+
+        # Kept alive connections, closed on stop
+        self._connections = set()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _handler_class(self):
+        engine = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            # Keep-alive, like the engine, so pooled client connections are reused
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes, with Nagle each call would wait for the delayed ACK (~40ms)
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with engine._lock:
+                    engine._connections.add(self.connection)
+
+            def finish(self):
+                with engine._lock:
+                    engine._connections.discard(self.connection)
+                super().finish()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+                    with engine._lock:
+                        engine.compressed_requests += 1
+
+                content = json.dumps(engine.handle(json.loads(body))).encode("utf-8")
+
+                encoding = engine.response_encoding
+                if encoding and encoding in self.headers.get("Accept-Encoding", ""):
+                    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+                    content = compressor.compress(content) + compressor.flush()
+                else:
+                    encoding = None
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request):
+        with self._lock:
+            self.calls += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        method = request.get("method")
+        params = request.get("params")
+        handler = self.handlers.get(method)
+
+        if handler is None:
+            return {"id": request.get("id"), "result": "OK", "error": None}
+
+        try:
+            return {"id": request.get("id"), "result": handler(params), "error": None}
+        except Exception as e:
+            return {"id": request.get("id"), "result": None, "error": str(e)}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-engine", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __repr__(self):
+        return '<FakeEngine({}:{}, calls={})>'.format(self.host, self.port, self.calls)
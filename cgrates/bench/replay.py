@@ -0,0 +1,108 @@
+import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from cgrates.bench.stats import LatencyStats
+import logging
+
+log = logging.getLogger()
+
+
+def peak_concurrency(records):
+    """
+    Highest number of captured calls in flight at the same time
+    """
+    ends = []
+    peak = 0
+
+    for record in sorted(records, key=lambda r: r['t']):
+        while ends and ends[0] <= record['t']:
+            heapq.heappop(ends)
+        heapq.heappush(ends, record['t'] + record['d'])
+        peak = max(peak, len(ends))
+
+    return peak
+
+
+class Replayer:
+    """
+    Re-issues captured traffic (see TrafficRecorder/read_capture) through a client, against any engine or a FakeEngine
+    Calls keep their captured inter-arrival times divided by speed, speed=None replays as fast as possible
+    Concurrency is capped at the captured peak (unless workers is given)
+
+    Latency is measured from each call's scheduled time, so a backed up target shows up as latency
+    instead of silently slowing the replay down
+    """
+
+    def __init__(self, client, speed: float = 1.0, workers: int = None, limiter=None):
+        """
+        :param limiter: client.AdaptiveLimiter, caps concurrency from observed latency (defaults to the client's limiter)
+        """
+        self.client = client
+        self.speed = speed
+        self.workers = workers
+        self.limiter = limiter or getattr(client, 'limiter', None)
+
+        self.stats = None
+        self.by_method = {}
+        self._lock = threading.Lock()
+
+    def _call(self, record, scheduled):
+        ok = True
+        try:
+            if self.limiter is None:
+                _, error = self.client.call_api(record['m'], record['p'])
+            else:
+                with self.limiter.slot():
+                    _, error = self.client.call_api(record['m'], record['p'])
+            ok = error is None
+        except Exception as e:
+            log.warning("Replay of {} failed: {}".format(record['m'], e))
+            ok = False
+
+        latency = time.perf_counter() - scheduled
+
+        self.stats.add(latency, ok)
+
+        with self._lock:
+            stats = self.by_method.get(record['m'])
+            if stats is None:
+                stats = self.by_method[record['m']] = LatencyStats()
+        stats.add(latency, ok)
+
+    def replay(self, records: List[dict]):
+        """
+        :return: LatencyStats (throughput and latency percentiles), per method stats in .by_method
+        """
+        records = sorted(records, key=lambda r: r['t'])
+
+        self.stats = LatencyStats()
+        self.by_method = {}
+
+        if not records:
+            return self.stats
+
+        workers = self.workers or max(1, peak_concurrency(records))
+        first = records[0]['t']
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self.stats.started = start = time.perf_counter()
+
+            for record in records:
+                if self.speed:
+                    scheduled = start + (record['t'] - first) / self.speed
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    scheduled = time.perf_counter()
+
+                executor.submit(self._call, record, scheduled)
+
+        self.stats.finished = time.perf_counter()
+
+        for stats in self.by_method.values():
+            stats.started, stats.finished = self.stats.started, self.stats.finished
+
+        return self.stats
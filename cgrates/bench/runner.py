@@ -0,0 +1,136 @@
+import math
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cgrates.bench.stats import LatencyStats
+import logging
+
+log = logging.getLogger()
+
+
+class LoadRunner:
+    """
+    Drive a workload through a client
+
+    Closed loop (rate=None): `concurrency` workers each issue the next operation as soon as the previous returns
+    Open loop (rate=N): operations arrive at N per second (Poisson arrivals) regardless of how fast they complete,
+    latency is measured from the scheduled arrival so a saturated target shows up as latency (no coordinated omission)
+
+    A warm-up phase runs the same load first and is not measured
+    """
+
+    def __init__(self, client, workload, concurrency: int = 8, rate: float = None, duration: float = 10, warmup: float = 0, seed: int = None):
+        self.client = client
+        self.workload = workload
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+
+        self.stats = None
+        self.by_operation = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, worker):
+        return random.Random(None if self.seed is None else self.seed * 1000 + worker)
+
+    def _record(self, name, latency, ok):
+        self.stats.add(latency, ok)
+
+        with self._lock:
+            stats = self.by_operation.get(name)
+            if stats is None:
+                stats = self.by_operation[name] = LatencyStats()
+        stats.add(latency, ok)
+
+    def _execute(self, rng, scheduled):
+        name = getattr(self.workload, 'name', None)
+        ok = True
+        try:
+            name = self.workload(self.client, rng) or name
+        except Exception as e:
+            log.debug("Operation failed: {}".format(e))
+            ok = False
+        self._record(name or "error", time.perf_counter() - scheduled, ok)
+
+    def _closed_loop(self, deadline):
+        def worker(index):
+            rng = self._rng(index)
+            while time.perf_counter() < deadline:
+                self._execute(rng, time.perf_counter())
+
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _open_loop(self, deadline):
+        rng = self._rng(0)
+        rngs = threading.local()
+
+        def execute(scheduled, seed):
+            if getattr(rngs, 'rng', None) is None:
+                rngs.rng = random.Random(seed)
+            self._execute(rngs.rng, scheduled)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            scheduled = time.perf_counter()
+
+            while True:
+                scheduled += rng.expovariate(self.rate)
+                if scheduled >= deadline:
+                    break
+
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+                executor.submit(execute, scheduled, rng.random())
+
+    def _phase(self, duration):
+        self.stats = LatencyStats()
+        self.by_operation = {}
+
+        self.stats.started = time.perf_counter()
+        deadline = self.stats.started + duration
+
+        if self.rate:
+            self._open_loop(deadline)
+        else:
+            self._closed_loop(deadline)
+
+        self.stats.finished = time.perf_counter()
+
+        for stats in self.by_operation.values():
+            stats.started, stats.finished = self.stats.started, self.stats.finished
+
+    def run(self):
+        """
+        :return: LatencyStats of the measured phase, per operation stats in .by_operation
+        """
+        if self.warmup:
+            log.info("Warming up for {}s".format(self.warmup))
+            self._phase(self.warmup)
+
+        self._phase(self.duration)
+
+        return self.stats
+
+    def to_dict(self):
+        def stats_dict(stats):
+            data = stats.to_dict()
+            data['histogram'] = [["+Inf" if math.isinf(bound) else bound, count] for bound, count in stats.histogram()]
+            return data
+
+        return {
+            'model': 'open' if self.rate else 'closed',
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'duration': self.duration,
+            'warmup': self.warmup,
+            'total': stats_dict(self.stats),
+            'operations': {name: stats_dict(stats) for name, stats in sorted(self.by_operation.items())},
+        }
@@ -0,0 +1,72 @@
+import math
+import threading
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds: 100us doubling up to ~26s, then +inf
+BUCKETS = [0.0001 * 2 ** i for i in range(19)] + [math.inf]
+
+
+class LatencyStats:
+    """
+    Thread safe latency/error recorder with percentiles and a log scale histogram
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def add(self, seconds, ok=True):
+        with self._lock:
+            self.latencies.append(seconds)
+            if not ok:
+                self.errors += 1
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    @property
+    def throughput(self):
+        return self.count / self.duration if self.duration else 0.0
+
+    def percentile(self, p, ordered=None):
+        ordered = ordered if ordered is not None else sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+    def histogram(self):
+        """
+        :return: List of (upper bound seconds, count) for the fixed BUCKETS, bounds are identical across runs so they can be diffed
+        """
+        counts = [0] * len(BUCKETS)
+        for latency in self.latencies:
+            counts[bisect_left(BUCKETS, latency)] += 1
+        return list(zip(BUCKETS, counts))
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'duration': self.duration,
+            'throughput': self.throughput,
+            'p50': self.percentile(50, ordered),
+            'p90': self.percentile(90, ordered),
+            'p99': self.percentile(99, ordered),
+            'max': ordered[-1] if ordered else 0.0,
+        }
+
+    def __repr__(self):
+        data = self.to_dict()
+        return '<LatencyStats(count={count}, errors={errors}, throughput={throughput:.1f}/s, p50={p50:.4f}, p99={p99:.4f})>'.format(**data)
@@ -0,0 +1,158 @@
+import abc
+import math
+import uuid
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+
+def parse_prefixes(value: str):
+    """
+    Parse a destination prefix distribution, eg "64:6,61:3,1:1" (weight defaults to 1)
+    :return: List of (prefix, weight)
+    """
+    result = []
+
+    for item in value.split(","):
+        prefix, _, weight = item.strip().partition(":")
+        result.append((prefix, float(weight) if weight else 1.0))
+
+    return result
+
+
+class PrefixDistribution:
+    """
+    Random destination numbers, the prefix is picked by weight and padded with random digits to length
+    """
+
+    def __init__(self, prefixes: List, length: int = 10):
+        self.prefixes = [p for p, _ in prefixes]
+        self.weights = [w for _, w in prefixes]
+        self.length = length
+
+    def number(self, rng: random.Random):
+        prefix = rng.choices(self.prefixes, weights=self.weights)[0]
+        return prefix + "".join(rng.choice("0123456789") for _ in range(max(0, self.length - len(prefix))))
+
+
+class UsageDistribution:
+    """
+    Call durations: log-normal (heavy tailed) around a median in seconds, a share of calls is unanswered (0s)
+    """
+
+    def __init__(self, median: float = 60, sigma: float = 1.0, unanswered: float = 0.0):
+        self.median = median
+        self.sigma = sigma
+        self.unanswered = unanswered
+
+    def seconds(self, rng: random.Random):
+        if self.unanswered and rng.random() < self.unanswered:
+            return 0
+        return max(1, int(rng.lognormvariate(math.log(self.median), self.sigma)))
+
+
+class Workload(abc.ABC):
+    """
+    One operation per call, returns the operation name (stats are kept per operation)
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def __call__(self, client, rng: random.Random):
+        pass
+
+
+class CostWorkload(Workload):
+    """
+    get_cost over a destination prefix distribution
+    """
+
+    name = "get_cost"
+
+    def __init__(self, destinations: PrefixDistribution, usage: UsageDistribution = None, subjects: List[str] = None, category="call"):
+        self.destinations = destinations
+        self.usage = usage or UsageDistribution()
+        self.subjects = subjects or ["1001"]
+        self.category = category
+
+    def __call__(self, client, rng):
+        client.get_cost(
+            subject=rng.choice(self.subjects),
+            destination=self.destinations.number(rng),
+            answer_time=datetime.now(),
+            usage="{}s".format(self.usage.seconds(rng)),
+            category=self.category,
+        )
+        return self.name
+
+
+class CDRWorkload(Workload):
+    """
+    process_cdr stream, answer times trail now by the call's usage
+    """
+
+    name = "process_cdr"
+
+    def __init__(self, destinations: PrefixDistribution, usage: UsageDistribution = None, accounts: List[str] = None, request_type="*postpaid"):
+        self.destinations = destinations
+        self.usage = usage or UsageDistribution(unanswered=0.2)
+        self.accounts = accounts or ["1001"]
+        self.request_type = request_type
+
+    def __call__(self, client, rng):
+        from cgrates.schemas.models import VoiceCDR
+
+        account = rng.choice(self.accounts)
+        usage = self.usage.seconds(rng)
+        answer_time = datetime.now().replace(microsecond=0) - timedelta(seconds=usage)
+
+        cdr = VoiceCDR()
+        cdr.origin_id = uuid.uuid4().hex
+        cdr.account = account
+        cdr.subject = account
+        cdr.destination = self.destinations.number(rng)
+        cdr.setup_time = answer_time
+        cdr.answer_time = answer_time
+        cdr.usage = "{}s".format(usage)
+        cdr.request_type = self.request_type
+
+        client.process_cdr(cdr)
+        return self.name
+
+
+class BalanceChurnWorkload(Workload):
+    """
+    Account/balance churn: add_balance (debits and top ups), with a share of get_account reads
+    """
+
+    name = "balance"
+
+    def __init__(self, accounts: List[str], balance_id="MainBalance", read_ratio: float = 0.2, max_value: float = 10):
+        self.accounts = accounts
+        self.balance_id = balance_id
+        self.read_ratio = read_ratio
+        self.max_value = max_value
+
+    def __call__(self, client, rng):
+        account = rng.choice(self.accounts)
+
+        if rng.random() < self.read_ratio:
+            client.get_account(account=account)
+            return "get_account"
+
+        client.add_balance(account=account, value=round(rng.uniform(-self.max_value, self.max_value), 2), balance_id=self.balance_id, refresh=False)
+        return "add_balance"
+
+
+class MixedWorkload(Workload):
+    """
+    Weighted mix of workloads, eg [(8, CostWorkload(...)), (2, CDRWorkload(...))]
+    """
+
+    def __init__(self, workloads: List):
+        self.weights = [w for w, _ in workloads]
+        self.workloads = [wl for _, wl in workloads]
+
+    def __call__(self, client, rng):
+        return rng.choices(self.workloads, weights=self.weights)[0](client, rng)
@@ -0,0 +1,3 @@
+from cgrates.cdrs.batch import CDRBatch, format_timestamps
+from cgrates.cdrs.export import CDRExporter, RotatingWriter, NDJSONWriter, ParquetWriter, CDR_FIELDS
+from cgrates.cdrs.dedup import CDRDeduplicator, BloomFilter, ScalableBloomFilter, LRUSet
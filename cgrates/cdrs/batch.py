@@ -0,0 +1,266 @@
+import csv
+import datetime
+import logging
+
+log = logging.getLogger()
+
+
+# Column name => ProcessExternalCDR field (as models.CDR, Tenant is set by the client)
+COLUMNS = {
+    'origin_id': "OriginID",
+    'category': "Category",
+    'account': "Account",
+    'request_type': "RequestType",
+    'direction': "Direction",
+    'subject': "Subject",
+    'destination': "Destination",
+    'setup_time': "SetupTime",
+    'answer_time': "AnswerTime",
+    'usage': "Usage",
+    'type_of_record': "ToR",
+}
+
+TIMESTAMP_COLUMNS = ('setup_time', 'answer_time')
+
+_SERIALIZED = {v: k for k, v in COLUMNS.items()}
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_DATE = _EPOCH.date()
+_SECOND = datetime.timedelta(seconds=1)
+
+_clock = None
+
+
+def _clock_table():
+    """
+    "HH:MM:SS" for every second of the day, built once
+    """
+    global _clock
+    if _clock is None:
+        _clock = ["{:02d}:{:02d}:{:02d}".format(s // 3600, s // 60 % 60, s % 60) for s in range(86400)]
+    return _clock
+
+
+def _offset_suffix(tz):
+    offset = int(tz.utcoffset(None).total_seconds())
+    sign = "-" if offset < 0 else "+"
+    return offset, "{}{:02d}{:02d}".format(sign, abs(offset) // 3600, abs(offset) // 60 % 60)
+
+
+def format_timestamps(seconds, tz: datetime.tzinfo = None):
+    """
+    Format epoch seconds as models.CDR does (ISODateTimeType "%Y-%m-%dT%H:%M:%S%z") without a datetime per value:
+    the date part is cached per day and the time of day comes from a lookup table
+    :param seconds: Epoch seconds (None allowed)
+    :param tz: None for naive wall clock seconds (no offset suffix), or a fixed offset datetime.timezone
+    :return: List of str
+    """
+
+    if tz is not None and not isinstance(tz, datetime.timezone):
+        # Offsets that vary (DST) need a real conversion per value
+        return [None if s is None else datetime.datetime.fromtimestamp(s, tz).strftime("%Y-%m-%dT%H:%M:%S%z") for s in seconds]
+
+    offset, suffix = _offset_suffix(tz) if tz is not None else (0, "")
+
+    clock = _clock_table()
+    days = {}
+    result = []
+
+    for value in seconds:
+        if value is None:
+            result.append(None)
+            continue
+
+        day, second = divmod(int(value) + offset, 86400)
+
+        prefix = days.get(day)
+        if prefix is None:
+            prefix = days[day] = (_EPOCH_DATE + datetime.timedelta(days=day)).isoformat() + "T"
+
+        result.append(prefix + clock[second] + suffix)
+
+    return result
+
+
+def _is_array(values):
+    return hasattr(values, "dtype")
+
+
+class CDRBatch:
+    """
+    Columnar CDRs: one list (or NumPy array) per field instead of a models.CDR per record
+    ProcessExternalCDR payloads are built straight from the columns, timestamps are formatted per column
+
+    Timestamp columns may hold datetimes (all naive or all aware), epoch seconds, NumPy datetime64
+    or already formatted strings. Naive values are sent without an offset (as models.CDR does),
+    aware values and epoch seconds are sent in tz (default UTC) with its offset
+    Usage may hold seconds (sent as "30s") or strings such as "30s"
+
+    Fields the same for every CDR (eg type_of_record) can be given once as constants
+    """
+
+    def __init__(self, tz: datetime.tzinfo = None, **constants):
+        """
+        :param tz: Time zone aware timestamps are sent in (default UTC)
+        :param constants: Column => value for every CDR, eg type_of_record="*voice"
+        """
+        self._check_columns(constants)
+
+        self.tz = tz
+        self.constants = constants
+        self.columns = {}
+        self._length = 0
+        self._payload_columns = None
+
+    @staticmethod
+    def _check_columns(names):
+        unknown = set(names) - set(COLUMNS)
+        if unknown:
+            raise Exception("Unknown CDR columns: {}".format(", ".join(sorted(unknown))))
+
+    @classmethod
+    def from_columns(cls, columns: dict, tz: datetime.tzinfo = None, **constants):
+        """
+        :param columns: Column => list or NumPy array, all of the same length
+        """
+        batch = cls(tz=tz, **constants)
+        batch._check_columns(columns)
+
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise Exception("CDR columns differ in length: {}".format(sorted(lengths)))
+
+        batch.columns = dict(columns)
+        batch._length = lengths.pop() if lengths else 0
+
+        return batch
+
+    @classmethod
+    def from_csv(cls, f, tz: datetime.tzinfo = None, delimiter=",", **constants):
+        """
+        :param f: Path or text file with a header row of column names (eg answer_time) or field names (eg AnswerTime)
+        Timestamps are expected as "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DDTHH:MM:SS[+HHMM]" and are sent as is
+        """
+        if isinstance(f, str):
+            with open(f, newline="") as fp:
+                return cls.from_csv(fp, tz=tz, delimiter=delimiter, **constants)
+
+        reader = csv.reader(f, delimiter=delimiter)
+        header = [_SERIALIZED.get(name, name) for name in next(reader)]
+
+        rows = list(reader)
+        columns = {name: [row[i] or None for row in rows] for i, name in enumerate(header)}
+
+        for name in TIMESTAMP_COLUMNS:
+            if name in columns:
+                columns[name] = [None if v is None else v.replace(" ", "T", 1) for v in columns[name]]
+
+        return cls.from_columns(columns, tz=tz, **constants)
+
+    @classmethod
+    def from_cdrs(cls, cdrs, tz: datetime.tzinfo = None):
+        """
+        :param cdrs: models.CDR instances
+        """
+        cdrs = list(cdrs)
+        return cls.from_columns({name: [getattr(cdr, name) for cdr in cdrs] for name in COLUMNS}, tz=tz)
+
+    def append(self, **values):
+        """
+        Add one CDR, eg append(account="1001", destination="6421555", answer_time=datetime.now(), usage=30)
+        """
+        self._check_columns(values)
+
+        for name, value in values.items():
+            column = self.columns.get(name)
+
+            if column is None:
+                column = self.columns[name] = [None] * self._length
+            elif _is_array(column):
+                column = self.columns[name] = column.tolist()
+
+            column.append(value)
+
+        self._length += 1
+
+        for name, column in self.columns.items():
+            if len(column) < self._length:
+                column.append(None)
+
+        self._payload_columns = None
+
+    def __len__(self):
+        return self._length
+
+    def _timestamps(self, values):
+        if _is_array(values):
+            if values.dtype.kind == "M":
+                import numpy
+                return numpy.datetime_as_string(values.astype("datetime64[s]")).tolist()
+            values = values.tolist()
+
+        sample = next((v for v in values if v is not None), None)
+
+        if sample is None or isinstance(sample, str):
+            return list(values)
+
+        if isinstance(sample, datetime.datetime):
+            if sample.tzinfo is None:
+                return format_timestamps([None if v is None else (v - _EPOCH) // _SECOND for v in values])
+            values = [None if v is None else v.timestamp() for v in values]
+
+        return format_timestamps(values, self.tz or datetime.timezone.utc)
+
+    @staticmethod
+    def _usages(values):
+        if _is_array(values):
+            values = values.tolist()
+
+        return [v if v is None or isinstance(v, str) else "{}s".format(int(v) if v == int(v) else v) for v in values]
+
+    def _formatted(self):
+        """
+        :return: Field name => list of payload values, built once
+        """
+        if self._payload_columns is None:
+            formatted = {}
+
+            for name, values in self.columns.items():
+                if name in TIMESTAMP_COLUMNS:
+                    formatted[COLUMNS[name]] = self._timestamps(values)
+                elif name == 'usage':
+                    formatted[COLUMNS[name]] = self._usages(values)
+                else:
+                    formatted[COLUMNS[name]] = values.tolist() if _is_array(values) else values
+
+            self._payload_columns = formatted
+
+        return self._payload_columns
+
+    def payloads(self, start: int = 0, stop: int = None):
+        """
+        ProcessExternalCDR params per CDR (without Tenant)
+        :return: List of dicts
+        """
+        formatted = self._formatted()
+        names = list(formatted)
+        columns = [formatted[name][start:stop] for name in names]
+
+        constants = {COLUMNS[k]: v for k, v in self.constants.items() if k not in self.columns}
+
+        if not constants:
+            return [dict(zip(names, row)) for row in zip(*columns)]
+
+        result = []
+        for row in zip(*columns):
+            payload = dict(constants)
+            payload.update(zip(names, row))
+            result.append(payload)
+
+        return result
+
+    def __iter__(self):
+        return iter(self.payloads())
+
+    def __repr__(self):
+        return '<CDRBatch(size={}, columns={})>'.format(self._length, ",".join(sorted(self.columns)))
@@ -0,0 +1,308 @@
+import os
+import math
+import json
+import time
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+
+log = logging.getLogger()
+
+
+MAGIC = b"CGRDEDP\x02"
+HEADER = struct.Struct("<8sI")
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings, sized for capacity items at error_rate false positives
+    (about 1.2 bytes per item at 1%, 1.8 at 0.1%)
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits: bytearray = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    @property
+    def false_positive_rate(self):
+        """
+        Expected false positive rate at the current count
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return '<BloomFilter(capacity={}, count={}, bytes={})>'.format(self.capacity, self.count, len(self.bits))
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows instead of saturating (Almeida et al, Scalable Bloom Filters): once a stage is full
+    a new one is added, `growth` times larger at a `tightening` times lower error rate, so the stages'
+    error rates sum to at most error_rate however many items are added
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, growth: int = 2, tightening: float = 0.5, stages: list = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+
+        self.stages = stages if stages is not None else [self.stage(0)]
+
+    def stage(self, index, bits: bytearray = None, count: int = 0):
+        return BloomFilter(self.capacity * self.growth ** index, self.error_rate * (1 - self.tightening) * self.tightening ** index,
+                           bits=bits, count=count)
+
+    def add(self, key):
+        if self.stages[-1].full:
+            self.stages.append(self.stage(len(self.stages)))
+        self.stages[-1].add(key)
+
+    def __contains__(self, key):
+        return any(key in stage for stage in self.stages)
+
+    @property
+    def false_positive_rate(self):
+        return sum(stage.false_positive_rate for stage in self.stages)
+
+    @property
+    def bytes(self):
+        return sum(len(stage.bits) for stage in self.stages)
+
+    def __len__(self):
+        return sum(stage.count for stage in self.stages)
+
+    def __repr__(self):
+        return '<ScalableBloomFilter(stages={}, count={}, bytes={})>'.format(len(self.stages), len(self), self.bytes)
+
+
+class LRUSet:
+    """
+    Exact set of the most recent maxsize keys
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+
+    def add(self, key):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+
+class CDRDeduplicator:
+    """
+    Duplicate CDR guard on origin_id
+    A Bloom filter per window of `window` seconds screens every origin_id (the last `generations` are kept, so
+    at least one full window, with no false negatives). Filters grow past capacity rather than saturate
+    (ScalableBloomFilter). A filter hit is confirmed against an exact LRU set of the most recent exact_size
+    origin_ids: only confirmed duplicates are dropped, unconfirmed hits (false positives, or duplicates older than
+    the exact set) are sent and left to the engine to reject
+
+    With trust_filter a filter hit alone drops the CDR, the window is then the filters' rather than exact_size,
+    at the cost of dropping new CDRs at error_rate (counted as 'probable' in stats)
+    Memory: about 2.2 bytes per origin_id per window for the filters at the default 0.1%, about 90 bytes per
+    origin_id (plus the string) for the exact set
+
+    origin_ids are recorded once the engine accepted the CDR, so a failed submission can be retried.
+    claim() holds an origin_id while it is submitted, so concurrent submissions of it wait for the first's outcome
+    """
+
+    def __init__(self, window: float = 3600, capacity: int = 1000000, error_rate: float = 0.001, exact_size: int = 100000,
+                 generations: int = 2, trust_filter: bool = False):
+        """
+        :param capacity: Expected origin_ids per window (beyond it the filter adds stages, which costs memory and lookups)
+        :param error_rate: False positive budget, shared between the generations
+        :param exact_size: origin_ids held in the exact LRU set
+        :param trust_filter: Drop on a filter hit without confirmation
+        """
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.generations = generations
+        self.trust_filter = trust_filter
+
+        self._lock = threading.Condition()
+        self._in_flight = set()
+        self.filters = [self._filter()]
+        self.started = time.time()
+        self.recent = LRUSet(exact_size)
+
+        self.checked = 0
+        self.duplicates = 0
+        self.probable = 0
+        self.unconfirmed = 0
+
+    def _filter(self, stages=None):
+        return ScalableBloomFilter(self.capacity, self.error_rate / self.generations, stages=stages)
+
+    def _rotate(self):
+        if time.time() - self.started >= self.window:
+            self.filters.insert(0, self._filter())
+            del self.filters[self.generations:]
+            self.started = time.time()
+
+    def _is_duplicate(self, origin_id):
+        self.checked += 1
+
+        if not any(origin_id in f for f in self.filters):
+            return False
+
+        if origin_id in self.recent:
+            self.duplicates += 1
+            return True
+
+        if self.trust_filter:
+            self.probable += 1
+            return True
+
+        self.unconfirmed += 1
+        return False
+
+    def is_duplicate(self, origin_id):
+        """
+        :return: True if origin_id was recorded recently (confirmed by the exact set, or a filter hit with trust_filter)
+        """
+        with self._lock:
+            return self._is_duplicate(origin_id)
+
+    def claim(self, origin_id):
+        """
+        Check origin_id and hold it for submission, waits while another submission of it is in flight
+        Follow with add() once the engine accepted the CDR, release() if it failed
+        :return: False if it is a duplicate (nothing held)
+        """
+        with self._lock:
+            while origin_id in self._in_flight:
+                self._lock.wait()
+
+            if self._is_duplicate(origin_id):
+                return False
+
+            self._in_flight.add(origin_id)
+            return True
+
+    def release(self, origin_id):
+        with self._lock:
+            self._in_flight.discard(origin_id)
+            self._lock.notify_all()
+
+    def add(self, origin_id):
+        with self._lock:
+            self._rotate()
+            self.filters[0].add(origin_id)
+            self.recent.add(origin_id)
+
+            self._in_flight.discard(origin_id)
+            self._lock.notify_all()
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'probable': self.probable,
+            'unconfirmed': self.unconfirmed,
+            'filters': [len(f) for f in self.filters],
+            'stages': [len(f.stages) for f in self.filters],
+            'bytes': sum(f.bytes for f in self.filters),
+            'false_positive_rate': sum(f.false_positive_rate for f in self.filters),
+        }
+
+    def save(self, path):
+        """
+        Persist the filters and exact set (written atomically)
+        """
+        with self._lock:
+            header = json.dumps({
+                'window': self.window,
+                'capacity': self.capacity,
+                'error_rate': self.error_rate,
+                'generations': self.generations,
+                'trust_filter': self.trust_filter,
+                'started': self.started,
+                'counts': [[stage.count for stage in f.stages] for f in self.filters],
+                'recent': list(self.recent),
+                'exact_size': self.recent.maxsize,
+            }).encode("utf-8")
+
+            tmp = "{}.tmp".format(path)
+            with open(tmp, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(header)))
+                f.write(header)
+                for bloom in self.filters:
+                    for stage in bloom.stages:
+                        f.write(stage.bits)
+
+            os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, length = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise Exception("{} is not a CDR dedup file".format(path))
+
+            header = json.loads(f.read(length))
+
+            dedup = cls(window=header['window'], capacity=header['capacity'], error_rate=header['error_rate'],
+                        exact_size=header['exact_size'], generations=header['generations'], trust_filter=header['trust_filter'])
+
+            filters = []
+            for counts in header['counts']:
+                bloom = dedup._filter(stages=[])
+                for index, count in enumerate(counts):
+                    size = len(bloom.stage(index).bits)
+                    bloom.stages.append(bloom.stage(index, bits=bytearray(f.read(size)), count=count))
+                filters.append(bloom)
+
+            dedup.filters = filters
+
+        dedup.started = header['started']
+        for origin_id in header['recent']:
+            dedup.recent.add(origin_id)
+
+        return dedup
+
+    def __repr__(self):
+        return '<CDRDeduplicator(checked={}, duplicates={})>'.format(self.checked, self.duplicates)
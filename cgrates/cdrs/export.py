@@ -0,0 +1,271 @@
+import abc
+import os
+import json
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+log = logging.getLogger()
+
+
+# CdrsV1.GetCDRs (ExternalCDR) fields and their Parquet column types, nested values are stored as JSON strings
+CDR_FIELDS = [
+    ("CGRID", "string"),
+    ("RunID", "string"),
+    ("OrderID", "int64"),
+    ("OriginHost", "string"),
+    ("Source", "string"),
+    ("OriginID", "string"),
+    ("ToR", "string"),
+    ("RequestType", "string"),
+    ("Tenant", "string"),
+    ("Category", "string"),
+    ("Account", "string"),
+    ("Subject", "string"),
+    ("Destination", "string"),
+    ("SetupTime", "string"),
+    ("AnswerTime", "string"),
+    ("Usage", "string"),
+    ("ExtraFields", "string"),
+    ("CostSource", "string"),
+    ("Cost", "float64"),
+    ("CostDetails", "string"),
+    ("ExtraInfo", "string"),
+    ("PreRated", "bool"),
+]
+
+
+class RotatingWriter(abc.ABC):
+    """
+    Writes CDR pages to a series of files in directory, rotated by size and/or age
+    Files are named after their first OrderID and written under a .tmp name until complete,
+    so a resumed export rewrites an interrupted file instead of leaving a partial one
+    """
+
+    extension = None
+
+    def __init__(self, directory, prefix="cdrs", max_bytes: int = 64 * 1024 * 1024, max_seconds: float = None):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+        self.files = []
+
+        self._path = None
+        self._opened = None
+        self._bytes = 0
+
+    @abc.abstractmethod
+    def _open(self, path):
+        pass
+
+    @abc.abstractmethod
+    def _write(self, rows):
+        """
+        :return: Bytes written
+        """
+
+    @abc.abstractmethod
+    def _close(self):
+        pass
+
+    def write(self, rows):
+        """
+        :return: True if a file was completed
+        """
+        if not rows:
+            return False
+
+        if self._path is None:
+            self._path = os.path.join(self.directory, "{}-{:012d}.{}".format(self.prefix, rows[0].get('OrderID') or 0, self.extension))
+            self._open(self._path + ".tmp")
+            self._opened = time.monotonic()
+            self._bytes = 0
+
+        self._bytes += self._write(rows)
+
+        if (self.max_bytes and self._bytes >= self.max_bytes) or (self.max_seconds and time.monotonic() - self._opened >= self.max_seconds):
+            return self.close()
+
+        return False
+
+    def close(self):
+        """
+        Complete the current file (if any)
+        :return: True if a file was completed
+        """
+        if self._path is None:
+            return False
+
+        self._close()
+        os.replace(self._path + ".tmp", self._path)
+        self.files.append(self._path)
+        log.debug("Wrote {} ({} bytes)".format(self._path, self._bytes))
+
+        self._path = None
+        return True
+
+
+class NDJSONWriter(RotatingWriter):
+    """
+    One JSON object per line, optionally gzipped
+    """
+
+    def __init__(self, directory, prefix="cdrs", max_bytes: int = 64 * 1024 * 1024, max_seconds: float = None, compress: bool = False):
+        super(NDJSONWriter, self).__init__(directory, prefix=prefix, max_bytes=max_bytes, max_seconds=max_seconds)
+        self.compress = compress
+        self.extension = "ndjson.gz" if compress else "ndjson"
+        self._file = None
+
+    def _open(self, path):
+        self._file = gzip.open(path, "wt") if self.compress else open(path, "w")
+
+    def _write(self, rows):
+        data = "".join(json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in rows)
+        self._file.write(data)
+        return len(data)
+
+    def _close(self):
+        self._file.close()
+        self._file = None
+
+
+class ParquetWriter(RotatingWriter):
+    """
+    Columnar Parquet files, one row group per page (requires pyarrow)
+    Columns are fixed by the schema, by default the CDR_FIELDS (other fields are dropped), so a column that is
+    null throughout a page keeps its type. Nested values (eg CostDetails) are stored as JSON strings
+    max_bytes applies to the uncompressed Arrow size
+    """
+
+    extension = "parquet"
+
+    def __init__(self, directory, prefix="cdrs", max_bytes: int = 256 * 1024 * 1024, max_seconds: float = None, compression="zstd",
+                 fields: list = None):
+        """
+        :param fields: (name, Arrow type name) columns, default CDR_FIELDS
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception("pyarrow is required for Parquet export (pip install pyarrow)")
+
+        super(ParquetWriter, self).__init__(directory, prefix=prefix, max_bytes=max_bytes, max_seconds=max_seconds)
+
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.compression = compression
+        self.fields = fields or CDR_FIELDS
+        self.schema = pyarrow.schema([(name, pyarrow.type_for_alias(kind)) for name, kind in self.fields])
+        self._writer = None
+        self._pending_path = None
+
+    def _flatten(self, row):
+        flat = {}
+        for name, kind in self.fields:
+            value = row.get(name)
+            if kind == "string" and value is not None and not isinstance(value, str):
+                value = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+            flat[name] = value
+        return flat
+
+    def _open(self, path):
+        self._pending_path = path
+
+    def _write(self, rows):
+        table = self._pa.Table.from_pylist([self._flatten(row) for row in rows], schema=self.schema)
+
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._pending_path, self.schema, compression=self.compression)
+
+        self._writer.write_table(table)
+        return table.nbytes
+
+    def _close(self):
+        self._writer.close()
+        self._writer = None
+
+
+class CDRExporter:
+    """
+    Pull CDRs page by page (by OrderID) and hand them to a RotatingWriter
+    The next page is fetched while the current one is written, so at most two pages are held in memory
+
+    With a checkpoint path the last exported OrderID is saved each time a file is completed,
+    a new exporter with the same checkpoint resumes from there
+    Note: Relies on the engine returning CDRs in OrderID order
+    """
+
+    def __init__(self, client, writer: RotatingWriter, page_size: int = 1000, checkpoint: str = None, account_id: str = None):
+        self.client = client
+        self.writer = writer
+        self.page_size = page_size
+        self.checkpoint = checkpoint
+        self.account_id = account_id
+
+        self.last_order_id = self._load_checkpoint()
+        self.exported = 0
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return None
+
+        with open(self.checkpoint) as f:
+            return json.load(f)['last_order_id']
+
+    def _save_checkpoint(self, last_order_id):
+        if self.checkpoint is None:
+            return
+
+        tmp = "{}.tmp".format(self.checkpoint)
+        with open(tmp, "w") as f:
+            json.dump({'last_order_id': last_order_id}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def _fetch(self, last_order_id):
+        return self.client.get_cdrs(account_id=self.account_id, last_order_id=last_order_id, limit=self.page_size)
+
+    def run(self, max_pages: int = None):
+        """
+        Export everything after the checkpoint and complete the last file
+        :param max_pages: Stop after this many pages
+        :return: Number of CDRs exported
+        """
+        last_order_id = self.last_order_id
+        pages = 0
+
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            future = prefetch.submit(self._fetch, last_order_id)
+
+            while future is not None:
+                page = future.result()
+
+                if not page:
+                    break
+
+                last_order_id = max(cdr['OrderID'] for cdr in page)
+                pages += 1
+
+                # A short page is the last one
+                more = len(page) >= self.page_size and (max_pages is None or pages < max_pages)
+                future = prefetch.submit(self._fetch, last_order_id) if more else None
+
+                if self.writer.write(page):
+                    self._save_checkpoint(last_order_id)
+
+                self.exported += len(page)
+
+        self.writer.close()
+
+        if last_order_id != self.last_order_id:
+            self._save_checkpoint(last_order_id)
+
+        self.last_order_id = last_order_id
+
+        return self.exported
+
+    def __repr__(self):
+        return '<CDRExporter(last_order_id={}, exported={})>'.format(self.last_order_id, self.exported)
@@ -1,10 +1,38 @@
-from cgrates.client.apier_v1 import ClientV1
-from cgrates.client.apier_v2 import ClientV2
-from cgrates.client.cdrs_v1 import ClientCdrsV1
+import importlib
 
-class Client(ClientV1, ClientV2, ClientCdrsV1):
+# Loaded on first access, keeps `import cgrates.client` cheap
+_lazy = {
+    'Client': 'cgrates.client.client',
+    'ClientV1': 'cgrates.client.apier_v1',
+    'ClientV2': 'cgrates.client.apier_v2',
+    'AccountRecord': 'cgrates.client.apier_v2',
+    'BalanceRecord': 'cgrates.client.apier_v2',
+    'ClientCdrsV1': 'cgrates.client.cdrs_v1',
+    'ClientBulk': 'cgrates.client.bulk',
+    'BulkResult': 'cgrates.client.bulk',
+    'CostResult': 'cgrates.client.cost',
+    'Transport': 'cgrates.client.transport',
+    'Compression': 'cgrates.client.transport',
+    'TransportStats': 'cgrates.client.transport',
+    'SingleFlight': 'cgrates.client.coalesce',
+    'AsyncSingleFlight': 'cgrates.client.coalesce',
+    'Scheduler': 'cgrates.client.scheduler',
+    'TokenBucket': 'cgrates.client.scheduler',
+    'AdaptiveLimiter': 'cgrates.client.limiter',
+    'SharedCache': 'cgrates.client.cache',
+}
 
-    def __init__(self, tenant, host="localhost", port=2080):
-        self.host = host
-        self.port = port
-        self.tenant = tenant
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module(_lazy[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
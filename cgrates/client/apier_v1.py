@@ -2,6 +2,10 @@ from datetime import time
 from typing import List
 from cgrates.schemas import models
 from cgrates.client.base import BaseClient, TPNotFoundException
+from cgrates.client.cost import CostResult
+from cgrates.tariff.plan import TariffPlan
+from cgrates.tariff.validator import TariffPlanValidator
+from cgrates.tracing import traced
 import logging
 
 log = logging.getLogger()
@@ -9,6 +13,7 @@ log = logging.getLogger()
 
 class ClientV1(BaseClient):
 
+    @traced
     def reload_cache(self):
 
         method = "ApierV1.ReloadCache"
@@ -25,6 +30,63 @@ class ClientV1(BaseClient):
             else:
                 raise Exception("{} returned error: {}".format(method, error))
 
+    def _get_tp_ids(self, method):
+
+        params = {
+            "TPid": self.tenant
+        }
+
+        data, error = self.call_api(method, params=[params])
+
+        if error:
+            if error == "NOT_FOUND":
+                return []
+
+            raise Exception("{} returned error: {}".format(method, error))
+
+        return data
+
+    @traced
+    def get_timing_ids(self):
+        return self._get_tp_ids("ApierV1.GetTPTimingIds")
+
+    @traced
+    def get_destination_ids(self):
+        return self._get_tp_ids("ApierV1.GetTPDestinationIDs")
+
+    @traced
+    def get_rate_ids(self):
+        return self._get_tp_ids("ApierV1.GetTPRateIds")
+
+    @traced
+    def get_destination_rate_ids(self):
+        return self._get_tp_ids("ApierV1.GetTPDestinationRateIds")
+
+    @traced
+    def get_rating_plan_ids(self):
+        return self._get_tp_ids("ApierV1.GetTPRatingPlanIds")
+
+    def _check_references(self, plan, kinds):
+        """
+        Check the plan's references exist with the tariff plan validator, listing the ids of each of kinds once
+        rather than reading every referenced object
+        :raises TPNotFoundException: For the first missing reference
+        """
+        listings = {
+            'timings': self.get_timing_ids,
+            'destinations': self.get_destination_ids,
+            'rates': self.get_rate_ids,
+            'destination_rates': self.get_destination_rate_ids,
+        }
+
+        known_ids = {kind: listings[kind]() for kind in kinds}
+
+        report = TariffPlanValidator(check_overlaps=False, check_unused=False, known_ids=known_ids).validate(plan)
+
+        if report.errors:
+            raise TPNotFoundException(report.errors[0].message)
+
+    @traced
     def get_timing(self, timing_id):
 
         self.ensure_valid_tag(name="timing_id", value=timing_id)
@@ -46,12 +108,11 @@ class ClientV1(BaseClient):
         return models.Timing(data)
 
 
+    @traced
     def add_timing(self, timing_id, week_days: List[int] = None, time: time = None):
 
         self.ensure_valid_tag(name="timing_id", value=timing_id)
 
-        method = "ApierV1.SetTPTiming"
-
         timing = models.Timing({'timing_id' : timing_id})
 
         if week_days:
@@ -59,6 +120,20 @@ class ClientV1(BaseClient):
         if time:
             timing.time = time
 
+        self.set_timing(timing)
+
+        return self.get_timing(timing_id)
+
+    @traced
+    def set_timing(self, timing: models.Timing):
+        """
+        Set timing without reading it back
+        """
+
+        self.ensure_valid_tag(name="timing_id", value=timing.timing_id)
+
+        method = "ApierV1.SetTPTiming"
+
         params = timing.to_dict()
         params['TPid'] = self.tenant
 
@@ -67,9 +142,8 @@ class ClientV1(BaseClient):
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        return self.get_timing(timing_id)
-
 
+    @traced
     def get_destination(self, destination_id: str):
 
         self.ensure_valid_tag(name="destination_id", value=destination_id, prefix="DST")
@@ -86,8 +160,19 @@ class ClientV1(BaseClient):
 
         return models.Destination(data)
 
+    @traced
     def add_destination(self, destination_id: str, prefixes):
 
+        self.set_destination(destination_id=destination_id, prefixes=prefixes)
+
+        return self.get_destination(destination_id=destination_id)
+
+    @traced
+    def set_destination(self, destination_id: str, prefixes):
+        """
+        Set destination and load it into data_db without reading it back
+        """
+
         self.ensure_valid_tag(name="destination_id", value=destination_id, prefix="DST")
 
         method = "ApierV1.SetTPDestination"
@@ -116,8 +201,7 @@ class ClientV1(BaseClient):
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        return self.get_destination(destination_id=destination_id)
-
+    @traced
     def get_rates(self, rate_id: str):
 
         self.ensure_valid_tag(name="rate_id", value=rate_id, prefix="RT")
@@ -139,8 +223,19 @@ class ClientV1(BaseClient):
 
         return [models.Rate(r) for r in data['RateSlots']]
 
+    @traced
     def add_rates(self, rate_id: str, rates: List[models.Rate]):
 
+        self.set_rates(rate_id=rate_id, rates=rates)
+
+        return self.get_rates(rate_id=rate_id)
+
+    @traced
+    def set_rates(self, rate_id: str, rates: List[models.Rate]):
+        """
+        Set rates without reading them back
+        """
+
         self.ensure_valid_tag(name="rate_id", value=rate_id, prefix="RT")
 
         method = "ApierV1.SetTPRate"
@@ -156,9 +251,8 @@ class ClientV1(BaseClient):
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        return self.get_rates(rate_id=rate_id)
-
 
+    @traced
     def get_destination_rates(self, dest_rate_id: str):
 
         self.ensure_valid_tag(name="dest_rate_id", value=dest_rate_id, prefix="DR")
@@ -180,20 +274,24 @@ class ClientV1(BaseClient):
 
         return [models.DestinationRate(dr) for dr in data['DestinationRates']]
 
+    @traced
     def add_destination_rates(self, dest_rate_id: str, dest_rates: List[models.DestinationRate]):
 
         self.ensure_valid_tag(name="dest_rate_id", value=dest_rate_id, prefix="DR")
 
-        for dr in dest_rates:
-            rates = self.get_rates(rate_id=dr.rate_id)
-            if not rates:
-                raise TPNotFoundException("Rate {} Not found. Cannot add destination rate {}".format(dr.rate_id, dest_rate_id))
-            dest = self.get_destination(destination_id=dr.dest_id)
-            if not dest:
-                raise TPNotFoundException("Destination {} Not found. Cannot add destination rate {}".format(dr.dest_id, dest_rate_id))
+        self._check_references(TariffPlan(destination_rates={dest_rate_id: dest_rates}), ['rates', 'destinations'])
+
+        self.set_destination_rates(dest_rate_id=dest_rate_id, dest_rates=dest_rates)
+
+        return self.get_destination_rates(dest_rate_id=dest_rate_id)
 
+    @traced
+    def set_destination_rates(self, dest_rate_id: str, dest_rates: List[models.DestinationRate]):
+        """
+        Set destination rates without checking rates/destinations exist or reading them back
+        """
 
-        # todo: confirm rates and destinations first?
+        self.ensure_valid_tag(name="dest_rate_id", value=dest_rate_id, prefix="DR")
 
         method = "ApierV1.SetTPDestinationRate"
 
@@ -220,9 +318,7 @@ class ClientV1(BaseClient):
         #if error:
         #    raise Exception("{} returned error: {}".format(method, error))
 
-
-        return self.get_destination_rates(dest_rate_id=dest_rate_id)
-
+    @traced
     def get_rating_plans(self, rating_plan_id: str):
 
         self.ensure_valid_tag(name="rating_plan_id", value=rating_plan_id, prefix="RPL")
@@ -245,17 +341,24 @@ class ClientV1(BaseClient):
         return [models.RatingPlan(rp) for rp in data['RatingPlanBindings']]
 
 
+    @traced
     def add_rating_plans(self, rating_plan_id: str, rating_plans: List[models.RatingPlan]):
 
         self.ensure_valid_tag(name="rating_plan_id", value=rating_plan_id, prefix="RPL")
 
-        # Verify child deps exist. Eg destination rates/destinations/rates
-        for rp in rating_plans:
-            dr = self.get_destination_rates(dest_rate_id=rp.dest_rate_id)
-            if not dr:
-                raise Exception("Destination Rate {} Not found. Cannot add rating plan {}".format(rp.dest_rate_id, rating_plan_id))
+        self._check_references(TariffPlan(rating_plans={rating_plan_id: rating_plans}), ['destination_rates', 'timings'])
+
+        self.set_rating_plans(rating_plan_id=rating_plan_id, rating_plans=rating_plans)
+
+        return self.get_rating_plans(rating_plan_id=rating_plan_id)
+
+    @traced
+    def set_rating_plans(self, rating_plan_id: str, rating_plans: List[models.RatingPlan]):
+        """
+        Set rating plans and load them into data_db without checking destination rates exist or reading them back
+        """
 
-            # todo: verify timing tag
+        self.ensure_valid_tag(name="rating_plan_id", value=rating_plan_id, prefix="RPL")
 
         method = "ApierV1.SetTPRatingPlan"
 
@@ -282,9 +385,7 @@ class ClientV1(BaseClient):
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-
-        return self.get_rating_plans(rating_plan_id=rating_plan_id)
-
+    @traced
     def get_rating_profile(self, rating_profile_id: str):
 
         self.ensure_valid_tag(name="rating_profile_id", value=rating_profile_id, prefix="RPF")
@@ -308,6 +409,7 @@ class ClientV1(BaseClient):
         return [models.RatingPlanActivation(rp) for rp in data['RatingPlanActivations']]
 
 
+    @traced
     def add_rating_profiles(self, rating_profile_id: str, subject: str, rating_plan_activations: List[models.RatingPlanActivation]):
 
         self.ensure_valid_tag(name="rating_profile_id", value=rating_profile_id, prefix="RPF")
@@ -349,7 +451,11 @@ class ClientV1(BaseClient):
         return self.get_rating_profile(rating_profile_id=rating_profile_id)
 
 
+    @traced
     def get_cost(self, subject, destination, answer_time, usage, category="call"):
+        """
+        :return: CostResult, None if the destination is not authorized
+        """
 
         method = "ApierV1.GetCost"
 
@@ -374,19 +480,10 @@ class ClientV1(BaseClient):
 
             raise Exception("{} returned error: {}".format(method, error))
 
-        def format_s(num):
-            return "{}s".format(round(num / (1000*1000*1000)))
-
-        return {
-            'cost' : data["Cost"],
-            'usage': format_s(data["Usage"]),
-            'charges': [[{'cost': i["Cost"], 'usage': format_s(i['Usage'])} for i in c["Increments"]] for c in data['Charges']],
-            'rating_filters': [{'dest_id': rf['DestinationID'], 'prefix': rf['DestinationPrefix'], 'rating_plan_id': rf['RatingPlanID'], 'subject': rf['Subject']} for rf in data['RatingFilters'].values()],
-            'rates': [[{'value': i['Value'], 'group_interval_start': i['GroupIntervalStart'], 'rate_increment': format_s(i['RateIncrement']), 'rate_unit': format_s(i['RateUnit'])} for i in rf] for rf in data['Rates'].values()],
-
-        }
+        return CostResult(data)
 
 
+    @traced
     def add_action(self, action):
 
         method = "ApierV1.SetTPActions"
@@ -404,6 +501,7 @@ class ClientV1(BaseClient):
 
         return data
 
+    @traced
     def add_action_plan(self, action_plan_id, action_plan):
 
         method = "ApierV1.SetTPActionPlan"
@@ -424,6 +522,7 @@ class ClientV1(BaseClient):
 
         return data
 
+    @traced
     def add_action_trigger(self, action_trigger_id, action_trigger):
 
         method = "ApierV1.SetTPActionTriggers"
@@ -444,6 +543,7 @@ class ClientV1(BaseClient):
 
         return data
 
+    @traced
     def add_account_action(self, account, action_plan_id, action_triggers_id):
 
         method = "ApierV1.SetTPAccountActions"
@@ -469,7 +569,19 @@ class ClientV1(BaseClient):
 
         return data
 
-    def add_balance(self, account, value, balance_id, balance_type="*monetary"):
+    @traced
+    def add_balance(self, account, value, balance_id, balance_type="*monetary", refresh: bool = True):
+        """
+        :param refresh: Fetch the updated account, False skips the get_account read back
+        :return: Account, None without refresh
+        """
+
+        self._add_balance(account=account, value=value, balance_id=balance_id, balance_type=balance_type)
+
+        if refresh:
+            return self.get_account(account=account)
+
+    def _add_balance(self, account, value, balance_id, balance_type="*monetary"):
 
         method = "ApierV1.AddBalance"
 
@@ -486,8 +598,7 @@ class ClientV1(BaseClient):
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        return self.get_account(account=account)
-
+    @traced
     def rate_cdrs(self):
 
         method = "CdrsV1.RateCDRs"
@@ -1,10 +1,38 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from cgrates.schemas import models
 from cgrates.client.base import BaseClient
+from cgrates.tracing import traced
 import logging
 
 log = logging.getLogger()
 
 
+BalanceRecord = namedtuple("BalanceRecord", ["balance_type", "uuid", "id", "value", "weight", "disabled", "expiration_date", "destination_ids"])
+
+
+class AccountRecord(namedtuple("AccountRecord", ["account", "allow_negative", "disabled", "balances"])):
+    """
+    Lightweight read-only account: plain tuples, no schematics model or validation
+    balances is a tuple of BalanceRecord over all balance types
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_data(cls, item):
+        balances = []
+
+        for balance_type, items in (item.get('BalanceMap') or {}).items():
+            for b in items:
+                destination_ids = tuple(d for d, enabled in (b.get('DestinationIDs') or {}).items() if enabled)
+                balances.append(BalanceRecord(balance_type, b.get('Uuid'), b.get('ID'), b.get('Value'), b.get('Weight'),
+                                              b.get('Disabled', False), b.get('ExpirationDate'), destination_ids))
+
+        return cls(item['ID'], item.get('AllowNegative', False), item.get('Disabled', False), tuple(balances))
+
+
 class ClientV2(BaseClient):
 
     def _create_account_from_data(self, item):
@@ -21,32 +49,109 @@ class ClientV2(BaseClient):
 
         return account
 
-    def get_accounts(self):
+    @traced
+    def get_accounts(self, account_ids: List[str] = None, offset: int = None, limit: int = None):
         """
         Get Accounts
         Note: This uses data_db
+        :param account_ids: Only return these accounts (default all accounts of the tenant)
+        :param offset: Skip this many accounts (paging)
+        :param limit: Return at most this many accounts (paging)
         :return:
         """
 
+        result = []
+
+        for item in self._get_accounts_data(account_ids=account_ids, offset=offset, limit=limit):
+            result.append(self._create_account_from_data(item))
+
+        return result
+
+    def _get_accounts_data(self, account_ids: List[str] = None, offset: int = None, limit: int = None):
+
         method = "ApierV2.GetAccounts"
 
         params = {
             "Tenant": self.tenant,
         }
 
+        if account_ids:
+            params['AccountIds'] = list(account_ids)
+
+        if offset:
+            params['Offset'] = offset
+
+        if limit:
+            params['Limit'] = limit
+
         data, error = self.call_api(method, params=[params])
 
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        result = []
+        return data or []
 
-        for item in data:
-            result.append(self._create_account_from_data(item))
+    def _account_pages(self, page_size: int, account_ids: List[str] = None):
+        """
+        Raw account pages, the next page is fetched in the background while the current one is consumed
+        :return: Generator of lists of account dicts
+        """
 
-        return result
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            requests = ({'account_ids': account_ids[i:i + page_size]} for i in range(0, len(account_ids), page_size))
+        else:
+            requests = None
+
+        def fetch(kwargs):
+            return self._get_accounts_data(limit=page_size, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+
+            if requests is not None:
+                kwargs = next(requests, None)
+                future = prefetch.submit(fetch, kwargs) if kwargs is not None else None
+
+                while future is not None:
+                    page = future.result()
+                    kwargs = next(requests, None)
+                    future = prefetch.submit(fetch, kwargs) if kwargs is not None else None
+                    yield page
+
+                return
+
+            offset = 0
+            future = prefetch.submit(fetch, {'offset': offset})
+
+            while future is not None:
+                page = future.result()
+                offset += len(page)
+
+                # A short page is the last one
+                future = prefetch.submit(fetch, {'offset': offset}) if len(page) >= page_size else None
+
+                yield page
+
+    def iter_accounts(self, page_size: int = 500, account_ids: List[str] = None, records: bool = False):
+        """
+        Iterate accounts page by page (engine side Offset/Limit, or AccountIds chunks when account_ids is given),
+        with one page prefetched. Memory and request size stay bounded by page_size
+        Note: This uses data_db, paging relies on the engine returning accounts in a stable order
+        :param records: Yield AccountRecord tuples instead of models.Account
+        :return: Generator of models.Account (or AccountRecord), account ids without the tenant
+        """
+
+        for page in self._account_pages(page_size, account_ids=account_ids):
+            for item in page:
+                # Strip off tenant
+                item['ID'] = item['ID'].split(":")[-1]
 
+                if records:
+                    yield AccountRecord.from_data(item)
+                else:
+                    yield self._create_account_from_data(item)
 
+    @traced
     def get_account(self, account: str):
         """
         Get Account
@@ -71,6 +176,7 @@ class ClientV2(BaseClient):
 
         return self._create_account_from_data(data)
 
+    @traced
     def add_account(self, account: str, action_plan_id: str ="", action_trigger_id: str="", allow_negative=False):
         """
         Add Account
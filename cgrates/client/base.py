@@ -1,16 +1,149 @@
-import requests
+import copy
+import json
 import re
+import time
+from cgrates.client.cache import CACHED_METHODS, INVALIDATING_METHODS
 import logging
 
 log = logging.getLogger()
 
+TAG_RE = re.compile(r"^[A-Z0-9_]+$")
+
 class TPNotFoundException(Exception):
     pass
 
 
+class TransportError(Exception):
+    """
+    The engine did not answer the call (non 200 response)
+    """
+    pass
+
+
+# Failures of the call itself rather than errors returned by the engine (requests' errors are OSErrors)
+TRANSPORT_ERRORS = (TransportError, OSError)
+
+
 class BaseClient:
+    """
+    Clients are safe to share between threads. Configuration is read-only after construction,
+    the transport keeps one connection pool and callers' models are never mutated
+    """
+
+    @property
+    def tenant(self):
+        return self._tenant
+
+    @property
+    def host(self):
+        return self.transport.host
+
+    @property
+    def port(self):
+        return self.transport.port
+
+    def with_tenant(self, tenant):
+        """
+        Cheap view of this client for another tenant, sharing the same transport (and connection pool)
+        """
+        view = copy.copy(self)
+        view._tenant = tenant
+        return view
+
+    # Set to a SingleFlight to coalesce identical concurrent read calls
+    singleflight = None
+
+    # Set to a bench.TrafficRecorder to capture (sampled) calls for replay
+    recorder = None
+
+    # Set to a scheduler.Scheduler to rate limit and prioritise calls
+    scheduler = None
+
+    # Set to a tracing.Tracer to get spans per client method, call and (de)serialization
+    tracer = None
+
+    # Set to a cache.SharedCache to cache tariff plan and cost reads (see cache.CACHED_METHODS)
+    cache = None
 
     def call_api(self, method, params):
+
+        tracer = self.tracer
+        if tracer is None:
+            return self._cached_call(method, params)
+
+        with tracer.span("call_api", method=method, tenant=self.tenant) as span:
+            data, error = self._cached_call(method, params)
+            if error:
+                span.record_error(error)
+            return data, error
+
+    def _cached_call(self, method, params):
+
+        cache = self.cache
+        if cache is None:
+            return self._recorded_call(method, params)
+
+        if not method.startswith(CACHED_METHODS):
+            try:
+                return self._recorded_call(method, params)
+            finally:
+                # Even a failed write may have been partly applied
+                if method.startswith(INVALIDATING_METHODS):
+                    cache.invalidate()
+
+        # The file may be shared by clients of different engines
+        key = "{}:{}:{}:{}".format(self.host, self.port, method, json.dumps(params, sort_keys=True, default=str))
+
+        value = cache.get(key)
+        if value is not None:
+            return json.loads(value), None
+
+        generation = cache.generation
+        data, error = self._recorded_call(method, params)
+
+        # Errors (eg not found) are not cached
+        if not error:
+            cache.set(key, json.dumps(data).encode("utf-8"), generation=generation)
+
+        return data, error
+
+    def _recorded_call(self, method, params):
+
+        recorder = self.recorder
+        if recorder is None or not recorder.sample():
+            return self._coalesced_call(method, params)
+
+        started = time.time()
+        timer = time.perf_counter()
+        data, error = None, None
+
+        try:
+            data, error = self._coalesced_call(method, params)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            recorder.record(method, params, started, time.perf_counter() - timer,
+                            len(json.dumps(params, default=str)), len(json.dumps(data, default=str)), error)
+
+        return data, error
+
+    def _coalesced_call(self, method, params):
+
+        if self.singleflight is None or ".Get" not in method:
+            return self._call_api(method, params)
+
+        key = (method, json.dumps(params, sort_keys=True, default=str))
+
+        (data, error), shared = self.singleflight.do(key, lambda: self._call_api(method, params))
+
+        # Callers parse the result in place, so each gets its own copy when it is shared
+        if shared:
+            data = copy.deepcopy(data)
+
+        return data, error
+
+    def _call_api(self, method, params):
         body = {
 
             "method": method,
@@ -19,13 +152,39 @@ class BaseClient:
 
         log.debug("Calling {}".format(method), extra={"params": params})
 
-        response = requests.post('http://{}:{}/jsonrpc'.format(self.host, self.port), timeout=5, json=body)
+        tracer = self.tracer
+
+        if tracer is None:
+            status_code, content = self._send(method, json.dumps(body).encode("utf-8"))
+            return self._parse_response(method, status_code, content)
+
+        with tracer.span("serialize") as span:
+            data = json.dumps(body).encode("utf-8")
+            span.set_attribute("payload_size", len(data))
+
+        with tracer.span("request") as span:
+            status_code, content = self._send(method, data)
+            span.set_attribute("status_code", status_code)
+            span.set_attribute("response_size", len(content))
+
+        with tracer.span("deserialize"):
+            return self._parse_response(method, status_code, content)
+
+    def _send(self, method, data):
+
+        if self.scheduler is None:
+            return self.transport.request(data)
+
+        with self.scheduler.slot(method):
+            return self.transport.request(data)
+
+    def _parse_response(self, method, status_code, content):
 
-        if response.status_code != 200:
-            log.error("Received {} response".format(response.status_code), extra={"response": response.text})
-            raise Exception("Received {} calling {}".format(response.status_code, method))
+        if status_code != 200:
+            log.error("Received {} response".format(status_code), extra={"response": content.decode("utf-8", "replace")})
+            raise TransportError("Received {} calling {}".format(status_code, method))
 
-        result = response.json()
+        result = json.loads(content)
 
         return result['result'], result.get('error', None)
 
@@ -33,5 +192,5 @@ class BaseClient:
         if prefix and not value.startswith("{}_".format(prefix)):
             raise Exception("{} must begin with prefix {}_ found: {}".format(name, prefix, value))
 
-        if not re.match("^[A-Z0-9\_]+$", value):
+        if not TAG_RE.match(value):
             raise Exception("{} must be upper case/alpha or underscore only".format(name))
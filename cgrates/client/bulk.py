@@ -0,0 +1,285 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable
+from cgrates.client.base import BaseClient, TRANSPORT_ERRORS
+from cgrates.client.scheduler import BULK
+from cgrates.tracing import traced
+from cgrates.tariff.plan import TariffPlan
+import logging
+
+log = logging.getLogger()
+
+
+class BulkResult:
+    """
+    Results of a bulk operation, in the same order as the input items.
+    Items that failed hold None in results and their exception in errors (keyed by index)
+    """
+
+    def __init__(self, size):
+        self.results = [None] * size
+        self.errors = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def __repr__(self):
+        return '<BulkResult(total={}, errors={})>'.format(len(self.results), len(self.errors))
+
+
+class ClientBulk(BaseClient):
+
+    # Default worker pool size and items per ApierV2.GetAccounts request
+    bulk_workers = 8
+    bulk_chunk_size = 100
+
+    # Set to a limiter.AdaptiveLimiter to size bulk concurrency from observed latency (bulk_workers is then ignored)
+    limiter = None
+
+    @traced
+    def fan_out(self, func: Callable, items: Iterable, workers: int = None, progress: Callable = None):
+        """
+        Call func(item) for every item over a bounded worker pool
+        Errors are collected per item and do not abort the batch
+        :param workers: Pool size, with a limiter it caps the threads the limiter can use (default limiter.max_limit)
+        :param progress: Optional callback(done, total) invoked as items complete
+        :return: BulkResult
+        """
+
+        items = list(items)
+        total = len(items)
+        result = BulkResult(total)
+
+        if not total:
+            return result
+
+        limiter = self.limiter
+
+        workers = min(workers or (limiter.max_limit if limiter else self.bulk_workers), total)
+
+        # Keep a bounded window of futures in flight so huge batches do not queue everything up front
+        window = workers * 2
+        pending = {}
+        done_count = 0
+        queue = iter(enumerate(items))
+
+        if limiter is not None:
+            limited_func = func
+
+            # Errors returned by the engine for an item (eg not found) are not overload, only failed calls shrink the limit
+            def func(item):
+                with limiter.slot(errors=TRANSPORT_ERRORS):
+                    return limited_func(item)
+
+        tracer = self.tracer
+        if tracer is not None:
+            # Worker threads have no current span, parent their spans to this one
+            parent, traced_func = tracer.current(), func
+
+            def func(item):
+                with tracer.activate(parent):
+                    return traced_func(item)
+
+        scheduler = self.scheduler
+        if scheduler is not None:
+            # Bulk work yields to interactive/normal calls
+            bulk_func = func
+
+            def func(item):
+                with scheduler.priority(BULK):
+                    return bulk_func(item)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            def submit():
+                for index, item in queue:
+                    pending[pool.submit(func, item)] = index
+                    if len(pending) >= window:
+                        return
+
+            submit()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        result.results[index] = future.result()
+                    except Exception as e:
+                        log.warning("Bulk item {} failed: {}".format(index, e))
+                        result.errors[index] = e
+
+                    done_count += 1
+
+                    if progress:
+                        progress(done_count, total)
+
+                submit()
+
+        return result
+
+    @traced
+    def get_accounts_by_id(self, account_ids: Iterable[str], workers: int = None, progress: Callable = None):
+        """
+        Get many accounts, fetched in chunks of bulk_chunk_size over a bounded worker pool
+        Note: This uses data_db
+        :param progress: Optional callback(done, total) invoked per account
+        :return: BulkResult of Account, ordered as account_ids
+        """
+
+        account_ids = list(account_ids)
+        chunks = [account_ids[i:i + self.bulk_chunk_size] for i in range(0, len(account_ids), self.bulk_chunk_size)]
+
+        result = BulkResult(len(account_ids))
+
+        def fetch(chunk):
+            accounts = {}
+            for account in self.get_accounts(account_ids=chunk):
+                # Strip off tenant
+                account.account = account.account.split(":")[-1]
+                accounts[account.account] = account
+            return accounts
+
+        def chunk_done(done, total):
+            if progress:
+                progress(min(done * self.bulk_chunk_size, len(account_ids)), len(account_ids))
+
+        fetched = self.fan_out(fetch, chunks, workers=workers, progress=chunk_done)
+
+        for chunk_index, chunk in enumerate(chunks):
+            offset = chunk_index * self.bulk_chunk_size
+            error = fetched.errors.get(chunk_index)
+
+            for i, account_id in enumerate(chunk):
+                if error:
+                    result.errors[offset + i] = error
+                elif account_id in fetched[chunk_index]:
+                    result.results[offset + i] = fetched[chunk_index][account_id]
+                else:
+                    result.errors[offset + i] = Exception("Account {} Not found".format(account_id))
+
+        return result
+
+    @traced
+    def get_cost_many(self, requests: Iterable[dict], workers: int = None, progress: Callable = None):
+        """
+        Price many calls concurrently (the engine has no batched GetCost, requests share the connection pool)
+        Each item holds get_cost kwargs, eg {"subject": "1001", "destination": "6421555", "answer_time": now, "usage": "60s"}
+        :param progress: Optional callback(done, total) invoked per request
+        :return: BulkResult of CostResult (None for unauthorized destinations)
+        """
+
+        return self.fan_out(lambda r: self.get_cost(**r), requests, workers=workers, progress=progress)
+
+    @traced
+    def process_cdrs(self, batch, workers: int = None, progress: Callable = None, chunk_size: int = 10000):
+        """
+        Submit a CDRBatch (or an iterable of models.CDR) concurrently, one ProcessExternalCDR per CDR
+        Payloads are built chunk_size CDRs at a time
+        :param progress: Optional callback(done, total) invoked per CDR
+        :return: BulkResult of True (submitted) or False (dropped as a duplicate), errors keyed by CDR index
+        """
+
+        from cgrates.cdrs.batch import CDRBatch
+
+        if not isinstance(batch, CDRBatch):
+            batch = CDRBatch.from_cdrs(batch)
+
+        total = len(batch)
+        result = BulkResult(total)
+
+        for start in range(0, total, chunk_size):
+
+            def chunk_progress(done, chunk_total, start=start):
+                progress(start + done, total)
+
+            chunk = self.fan_out(self._process_cdr, batch.payloads(start, start + chunk_size), workers=workers,
+                                 progress=chunk_progress if progress else None)
+
+            result.results[start:start + len(chunk)] = chunk.results
+
+            for index, error in chunk.errors.items():
+                result.errors[start + index] = error
+
+        return result
+
+    @traced
+    def add_balances(self, balances: Iterable[dict], refresh: bool = False, workers: int = None, progress: Callable = None):
+        """
+        Add many balances concurrently
+        Each item holds add_balance kwargs, eg {"account": "1001", "value": 10, "balance_id": "MainBalance"}
+        :param refresh: Fetch the updated accounts afterwards (in chunks) rather than one get_account per balance
+        :param progress: Optional callback(done, total) invoked per balance
+        :return: BulkResult of the updated Account (refresh=True) or None per item
+        """
+
+        balances = list(balances)
+
+        result = self.fan_out(lambda b: self._add_balance(**b), balances, workers=workers, progress=progress)
+
+        if refresh:
+            ok = [i for i in range(len(balances)) if i not in result.errors]
+            accounts = self.get_accounts_by_id(sorted({balances[i]['account'] for i in ok}), workers=workers)
+            by_id = {a.account: a for a in accounts if a}
+
+            for i in ok:
+                account_id = balances[i]['account']
+                if account_id in by_id:
+                    result.results[i] = by_id[account_id]
+                else:
+                    result.errors[i] = Exception("Account {} Not found".format(account_id))
+
+        return result
+
+    def _tariff_plan_fetchers(self):
+        return [
+            ('timings', self.get_timing_ids, lambda i: self.get_timing(timing_id=i)),
+            ('destinations', self.get_destination_ids, lambda i: self.get_destination(destination_id=i)),
+            ('rates', self.get_rate_ids, lambda i: self.get_rates(rate_id=i)),
+            ('destination_rates', self.get_destination_rate_ids, lambda i: self.get_destination_rates(dest_rate_id=i)),
+            ('rating_plans', self.get_rating_plan_ids, lambda i: self.get_rating_plans(rating_plan_id=i)),
+        ]
+
+    @traced
+    def get_tariff_plan_ids(self):
+        """
+        Ids of the tenant's tariff plan objects, one call per kind
+        :return: Dict of kind (timings, destinations, rates, destination_rates, rating_plans) => list of ids
+        """
+        return {name: get_ids() for name, get_ids, _ in self._tariff_plan_fetchers()}
+
+    @traced
+    def get_tariff_plan(self, workers: int = None, ids: dict = None):
+        """
+        Fetch the tenant's whole tariff plan (timings, destinations, rates, destination rates and rating plans)
+        Objects are fetched concurrently (one call per object), failures raise the first error
+        :param ids: Only fetch these existing objects, dict of kind => ids (eg from get_tariff_plan_ids), kinds not given are skipped
+        :return: TariffPlan
+        """
+
+        plan = TariffPlan(tenant=self.tenant)
+
+        for name, get_ids, get_one in self._tariff_plan_fetchers():
+            if ids is None:
+                object_ids = get_ids()
+            else:
+                object_ids = list(ids.get(name) or [])
+
+            result = self.fan_out(get_one, object_ids, workers=workers)
+
+            if result.errors:
+                raise next(iter(result.errors.values()))
+
+            setattr(plan, name, {i: item for i, item in zip(object_ids, result) if item is not None})
+
+        return plan
@@ -0,0 +1,244 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+import hashlib
+import threading
+import logging
+
+log = logging.getLogger()
+
+
+# Read calls whose results are cached (tariff plan data, destinations and costs)
+CACHED_METHODS = ("ApierV1.GetTP", "ApierV1.GetDestination", "ApierV1.GetCost")
+
+# Calls after which cached results may be stale, these bump the generation
+INVALIDATING_METHODS = ("ApierV1.SetTP", "ApierV1.Load", "ApierV1.ReloadCache")
+
+MAGIC = b"CGRSHM\x00\x01"
+
+# magic, generation, slots, slot size, ways
+HEADER = struct.Struct("<8sQIII")
+HEADER_SIZE = 64
+GENERATION_OFFSET = 8
+
+# crc, flags, generation, key digest, expires, length (covered by crc) then last used (not covered, written on hits)
+SLOT = struct.Struct("<IIQ16sdId")
+SLOT_CRC = struct.Struct("<I")
+SLOT_GENERATION_OFFSET = 8
+USED = struct.Struct("<d")
+USED_OFFSET = SLOT.size - USED.size
+
+COMPRESSED = 1
+COMPRESS_MIN = 1024
+
+
+class SharedCache:
+    """
+    Memory mapped cache shared by every process on the host that opens the same path
+    (eg gunicorn workers), so hot tariff data and costs are held once per host
+
+    The file is a set associative table of fixed size slots. Reads take no lock: a slot is checked against the key
+    digest, the generation and a CRC, so a slot being rewritten reads as a miss. Writes are serialized with
+    flock. A full set evicts its least recently used slot, values larger than a slot are not cached
+
+    invalidate() bumps the generation in the file header, which drops every entry for every process at once
+    Note: Only writes made through clients using the file invalidate it. Changes made any other way (another host,
+    cgr-loader, the engine's own reloads) are not seen until entries expire, so set a ttl unless every write goes
+    through such a client. POSIX only (flock), the layout of an existing file wins over the constructor's size settings
+    """
+
+    def __init__(self, path, size: int = 64 * 1024 * 1024, slot_size: int = 16 * 1024, ways: int = 4, ttl: float = None):
+        """
+        :param size: File size in bytes (number of slots is size // slot_size, rounded down to whole sets)
+        :param ttl: Seconds entries are kept (None for until invalidated or evicted), bounds staleness from outside writes
+        """
+        try:
+            import fcntl
+        except ImportError:
+            raise Exception("SharedCache requires flock (POSIX)")
+
+        self._fcntl = fcntl
+        self.path = path
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._open(size, slot_size, ways)
+
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.oversize = 0
+
+    def _open(self, size, slot_size, ways):
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                slots = (size - HEADER_SIZE) // slot_size // ways * ways
+                if slots < ways:
+                    raise Exception("SharedCache size {} too small for one set of {} slots".format(size, ways))
+
+                os.ftruncate(self._fd, HEADER_SIZE + slots * slot_size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, 1, slots, slot_size, ways), 0)
+        finally:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+        self._map = mmap.mmap(self._fd, 0)
+
+        magic, _, self.slots, self.slot_size, self.ways = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise Exception("{} is not a shared cache file".format(self.path))
+
+        self._sets = self.slots // self.ways
+
+    def _lock_file(self):
+        # flock is held per open file, a forked child must not share its parent's
+        if os.getpid() != self._pid:
+            self._map.close()
+            os.close(self._fd)
+            self._open(0, 0, 1)
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+
+    @property
+    def generation(self):
+        return struct.unpack_from("<Q", self._map, GENERATION_OFFSET)[0]
+
+    def invalidate(self):
+        """
+        Drop every entry, for every process sharing the file
+        """
+        with self._lock:
+            self._lock_file()
+            try:
+                generation = self.generation + 1
+                struct.pack_into("<Q", self._map, GENERATION_OFFSET, generation)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+        log.debug("Shared cache generation {}".format(generation))
+        return generation
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _offsets(self, digest):
+        first = int.from_bytes(digest[:8], "little") % self._sets * self.ways
+        return [HEADER_SIZE + (first + way) * self.slot_size for way in range(self.ways)]
+
+    def get(self, key):
+        """
+        :return: bytes, None on a miss
+        """
+        digest = self._digest(key)
+        generation = self.generation
+        data = self._map
+
+        for offset in self._offsets(digest):
+            crc, flags, slot_generation, slot_digest, expires, length, _ = SLOT.unpack_from(data, offset)
+
+            if slot_digest != digest or slot_generation != generation or length > self.slot_size - SLOT.size:
+                continue
+
+            now = time.time()
+            if expires and expires <= now:
+                continue
+
+            start = offset + SLOT.size
+            value = data[start:start + length]
+
+            if zlib.crc32(data[offset + SLOT_CRC.size:offset + USED_OFFSET] + value) != crc:
+                # Being rewritten
+                continue
+
+            USED.pack_into(data, offset + USED_OFFSET, now)
+            self.hits += 1
+
+            return zlib.decompress(value) if flags & COMPRESSED else value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value: bytes, generation: int = None):
+        """
+        :param generation: Only store if the cache is still at this generation (read before fetching the value),
+                           so a value fetched before an invalidate is not stored after it
+        :return: True if stored
+        """
+        flags = 0
+        if len(value) >= COMPRESS_MIN:
+            compressed = zlib.compress(value, 1)
+            if len(compressed) < len(value):
+                value, flags = compressed, COMPRESSED
+
+        if len(value) > self.slot_size - SLOT.size:
+            self.oversize += 1
+            return False
+
+        digest = self._digest(key)
+        now = time.time()
+        expires = now + self.ttl if self.ttl else 0.0
+
+        with self._lock:
+            self._lock_file()
+            try:
+                current = self.generation
+                if generation is not None and generation != current:
+                    return False
+
+                offset = self._victim(digest, current, now)
+
+                header = SLOT.pack(0, flags, current, digest, expires, len(value), now)
+                crc = zlib.crc32(header[SLOT_CRC.size:USED_OFFSET] + value)
+
+                data = self._map
+                # Invalid while the value is written (generation 0 is never current)
+                struct.pack_into("<Q", data, offset + SLOT_GENERATION_OFFSET, 0)
+                data[offset + SLOT.size:offset + SLOT.size + len(value)] = value
+                data[offset:offset + SLOT.size] = SLOT.pack(crc, flags, current, digest, expires, len(value), now)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+        self.sets += 1
+        return True
+
+    def _victim(self, digest, generation, now):
+        """
+        Slot for digest: its own, a free, stale or expired one, else the least recently used of the set
+        """
+        victim, oldest = None, None
+
+        for offset in self._offsets(digest):
+            _, _, slot_generation, slot_digest, expires, _, used = SLOT.unpack_from(self._map, offset)
+
+            if slot_digest == digest or slot_generation != generation or (expires and expires <= now):
+                return offset
+
+            if oldest is None or used < oldest:
+                victim, oldest = offset, used
+
+        self.evictions += 1
+        return victim
+
+    def stats(self):
+        return {
+            'generation': self.generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'sets': self.sets,
+            'evictions': self.evictions,
+            'oversize': self.oversize,
+            'slots': self.slots,
+        }
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def __repr__(self):
+        return '<SharedCache(path={}, slots={}, generation={})>'.format(self.path, self.slots, self.generation)
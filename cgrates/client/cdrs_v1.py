@@ -1,4 +1,5 @@
 from cgrates.client.base import BaseClient
+from cgrates.tracing import traced
 from cgrates.schemas.models import CDR
 import logging
 
@@ -6,36 +7,79 @@ log = logging.getLogger()
 
 class ClientCdrsV1(BaseClient):
 
+    # Set to a cdrs.CDRDeduplicator to drop CDRs whose origin_id was already submitted
+    dedup = None
+
+    @traced
     def process_cdr(self, cdr: CDR):
+        """
+        :return: False if the CDR was dropped as a duplicate
+        """
+
+        # Do not mutate the caller's CDR, the client may be shared across threads/tenants
+        return self._process_cdr(cdr.to_dict())
+
+    def _process_cdr(self, params: dict):
+        """
+        :param params: ProcessExternalCDR fields (eg from models.CDR.to_dict or CDRBatch.payloads), Tenant is set here
+        :return: False if the CDR was dropped as a duplicate
+        """
 
         method = "CdrsV1.ProcessExternalCDR"
 
-        cdr.tenant = self.tenant
+        dedup = self.dedup
+        origin_id = params.get('OriginID')
+
+        if dedup is None or not origin_id:
+            self._submit_cdr(method, params)
+            return True
+
+        # Held until the engine answers, a concurrent submission of the same origin_id waits for the outcome
+        if not dedup.claim(origin_id):
+            log.debug("Dropped duplicate CDR {}".format(origin_id))
+            return False
+
+        try:
+            self._submit_cdr(method, params)
+        except BaseException:
+            dedup.release(origin_id)
+            raise
 
-        params = cdr.to_dict()
+        dedup.add(origin_id)
+
+        return True
+
+    def _submit_cdr(self, method, params):
+
+        params['Tenant'] = self.tenant
 
         data, error = self.call_api(method, params=[params])
 
         if error:
             raise Exception("{} returned error: {}".format(method, error))
 
-        return None
-
+    @traced
     def get_cdrs(self, account_id=None, last_order_id=None, limit=1000):
+        """
+        :param last_order_id: Only return CDRs after this OrderID (paging)
+        :return: List of CDR dicts, in OrderID order
+        """
 
         method = "CdrsV1.GetCDRs"
 
         params = {
-          #  "OrderIDStart": last_order_id,
             "Limit": limit,
-         #   "Offset": 1 if last_order_id else 0
+            # Paging by last OrderID needs each page to be the lowest ids, the engine's default order is unspecified
+            "OrderBy": "OrderID",
         }
 
+        if last_order_id is not None:
+            # OrderIDStart is inclusive
+            params['OrderIDStart'] = last_order_id + 1
+
         if account_id:
             params['Accounts'] = [account_id]
 
-        print(params)
-
         data, error = self.call_api(method, params=[params])
 
         if error:
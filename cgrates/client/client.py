@@ -0,0 +1,34 @@
+from cgrates.client.apier_v1 import ClientV1
+from cgrates.client.apier_v2 import ClientV2
+from cgrates.client.cdrs_v1 import ClientCdrsV1
+from cgrates.client.bulk import ClientBulk
+from cgrates.client.transport import Transport, Compression
+
+class Client(ClientV1, ClientV2, ClientCdrsV1, ClientBulk):
+
+    def __init__(self, tenant, host="localhost", port=2080, transport: Transport = None, timeout=5, pool_size=10,
+                 coalesce=False, compression: Compression = None, recorder=None, tracer=None,
+                 scheduler=None, limiter=None, dedup=None, cache=None):
+        """
+        :param transport: Share an existing Transport (and its connection pool), host/port/timeout/pool_size are then ignored
+        :param coalesce: Share one in-flight call between identical concurrent read (Get*) calls, see .singleflight.stats()
+        :param compression: Request/response compression settings, see .transport.stats
+        :param recorder: bench.TrafficRecorder capturing calls for later replay
+        :param tracer: tracing.Tracer, spans per client method with child spans per call_api and (de)serialization
+        :param scheduler: client.Scheduler, rate limits and priority queueing of calls (see .scheduler.stats())
+        :param limiter: client.AdaptiveLimiter, adaptive concurrency for bulk operations (can be shared between clients)
+        :param dedup: cdrs.CDRDeduplicator, drops CDRs already submitted (by origin_id) in process_cdr/process_cdrs
+        :param cache: client.SharedCache, host wide cache of tariff plan and cost reads (per engine), invalidated by this client's writes and reload_cache
+        """
+        self._tenant = tenant
+        self.transport = transport or Transport(host=host, port=port, timeout=timeout, pool_size=pool_size, compression=compression)
+        self.recorder = recorder
+        self.tracer = tracer
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.dedup = dedup
+        self.cache = cache
+
+        if coalesce:
+            from cgrates.client.coalesce import SingleFlight
+            self.singleflight = SingleFlight()
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+
+class _Call:
+
+    __slots__ = ('event', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Request coalescing for threads
+    Concurrent calls with the same key share one outstanding call and its result
+    (no caching, a key is only shared while its call is in flight)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """
+        :return: (result, shared) where shared is True if the result is also handed to other callers
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+        return call.result, call.followers > 0
+
+    def stats(self):
+        return {'leaders': self.leaders, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+    def __repr__(self):
+        return '<SingleFlight(leaders={}, coalesced={})>'.format(self.leaders, self.coalesced)
+
+
+class AsyncSingleFlight:
+    """
+    Request coalescing for asyncio, concurrent awaits with the same key share one outstanding coroutine
+    The shared coroutine runs in its own task, so cancelling one caller (even the first) does not cancel the others
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _done(self, key, task):
+        if self._calls.get(key, [None])[0] is task:
+            del self._calls[key]
+        # Mark retrieved, callers (if any are left) re-raise it themselves
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, coroutine_func):
+        """
+        :param coroutine_func: Called (only by the first caller) to create the coroutine
+        :return: (result, shared)
+        """
+
+        entry = self._calls.get(key)
+
+        if entry is not None:
+            entry[1] += 1
+            self.coalesced += 1
+            return await asyncio.shield(entry[0]), True
+
+        task = asyncio.ensure_future(coroutine_func())
+        entry = self._calls[key] = [task, 0]
+        task.add_done_callback(lambda t: self._done(key, t))
+        self.leaders += 1
+
+        result = await asyncio.shield(task)
+
+        return result, entry[1] > 0
+
+    def stats(self):
+        return {'leaders': self.leaders, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
+
+    def __repr__(self):
+        return '<AsyncSingleFlight(leaders={}, coalesced={})>'.format(self.leaders, self.coalesced)
@@ -0,0 +1,67 @@
+from collections.abc import Mapping
+
+
+def format_s(num):
+    """
+    Nanoseconds => "60s"
+    """
+    return "{}s".format(round(num / (1000*1000*1000)))
+
+
+class CostResult(Mapping):
+    """
+    ApierV1.GetCost result
+    cost and usage are read straight away, the breakdown (charges, rating_filters, rates) is only built when accessed
+    Read only mapping of KEYS, as get_cost used to return a dict ('cost' in result, result.get(...), dict(result))
+    """
+
+    __slots__ = ('cost', 'usage', '_data', '_charges', '_rating_filters', '_rates')
+
+    KEYS = ('cost', 'usage', 'charges', 'rating_filters', 'rates')
+
+    def __init__(self, data):
+        self.cost = data["Cost"]
+        self.usage = format_s(data["Usage"])
+        self._data = data
+        self._charges = None
+        self._rating_filters = None
+        self._rates = None
+
+    @property
+    def charges(self):
+        if self._charges is None:
+            self._charges = [[{'cost': i["Cost"], 'usage': format_s(i['Usage'])} for i in c["Increments"]] for c in self._data['Charges']]
+        return self._charges
+
+    @property
+    def rating_filters(self):
+        if self._rating_filters is None:
+            self._rating_filters = [{'dest_id': rf['DestinationID'], 'prefix': rf['DestinationPrefix'], 'rating_plan_id': rf['RatingPlanID'], 'subject': rf['Subject']} for rf in self._data['RatingFilters'].values()]
+        return self._rating_filters
+
+    @property
+    def rates(self):
+        if self._rates is None:
+            self._rates = [[{'value': i['Value'], 'group_interval_start': i['GroupIntervalStart'], 'rate_increment': format_s(i['RateIncrement']), 'rate_unit': format_s(i['RateUnit'])} for i in rf] for rf in self._data['Rates'].values()]
+        return self._rates
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        # Without building the breakdown
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __repr__(self):
+        return '<CostResult(cost={}, usage={})>'.format(self.cost, self.usage)
@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import logging
+
+log = logging.getLogger()
+
+
+LimitChange = namedtuple("LimitChange", ["time", "limit", "latency", "baseline", "error_rate"])
+
+
+class AdaptiveLimiter:
+    """
+    Adaptive concurrency limit (AIMD on latency and errors), shared by bulk paths
+
+    Call latencies are averaged over windows of `window` calls. While a window's average stays within
+    `tolerance` x the baseline (the lowest latency seen, drifting up slowly so it follows a new normal)
+    and its error rate is below max_error_rate, the limit grows by `increase`. Otherwise queueing has set in
+    and the limit is multiplied by `backoff`
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, increase: int = 1, backoff: float = 0.7,
+                 tolerance: float = 1.5, max_error_rate: float = 0.05, window: int = 20, drift: float = 0.01, history: int = 1000):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.drift = drift
+
+        self._limit = max(min_limit, min(initial, max_limit))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+        self._samples = 0
+        self._latency_sum = 0.0
+        self._errors = 0
+
+        self.baseline = None
+        self.history = deque(maxlen=history)
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, ok: bool = True):
+        with self._condition:
+            self._in_flight -= 1
+
+            self._samples += 1
+            self._latency_sum += latency
+            if not ok:
+                self._errors += 1
+
+            if self._samples >= self.window:
+                self._adjust()
+
+            self._condition.notify_all()
+
+    def _adjust(self):
+        latency = self._latency_sum / self._samples
+        error_rate = self._errors / self._samples
+
+        self._samples, self._latency_sum, self._errors = 0, 0.0, 0
+
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline = min(latency, self.baseline * (1 + self.drift))
+
+        if error_rate > self.max_error_rate or latency > self.baseline * self.tolerance:
+            limit = max(self.min_limit, self._limit * self.backoff)
+        else:
+            limit = min(self.max_limit, self._limit + self.increase)
+
+        if int(limit) != int(self._limit):
+            log.debug("Concurrency limit {} => {} (latency {:.4f}, baseline {:.4f}, errors {:.2%})".format(
+                int(self._limit), int(limit), latency, self.baseline, error_rate))
+
+        self._limit = limit
+        self.history.append(LimitChange(time.time(), int(limit), latency, self.baseline, error_rate))
+
+    @contextmanager
+    def slot(self, errors: tuple = (Exception,)):
+        """
+        Wait for room under the limit, the block's duration (and whether it raised) is fed back into the limit
+        :param errors: Exception types counted as errors, others are raised but count as a completed call
+        """
+        self.acquire()
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except errors:
+            ok = False
+            raise
+        except BaseException as e:
+            # Interrupted, not a completed call
+            ok = isinstance(e, Exception)
+            raise
+        finally:
+            self.release(time.perf_counter() - started, ok)
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self._in_flight,
+            'baseline': self.baseline,
+            'adjustments': len(self.history),
+        }
+
+    def __repr__(self):
+        return '<AdaptiveLimiter(limit={}, in_flight={}, baseline={})>'.format(self.limit, self._in_flight, self.baseline)
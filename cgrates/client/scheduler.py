@@ -0,0 +1,243 @@
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+import logging
+
+log = logging.getLogger()
+
+
+INTERACTIVE, NORMAL, BULK = range(3)
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BULK: "bulk"}
+
+# Latency critical calls, jump ahead of queued normal/bulk calls
+DEFAULT_PRIORITIES = {
+    "ApierV1.GetCost": INTERACTIVE,
+}
+
+
+class TokenBucket:
+    """
+    Token bucket rate limit: rate tokens per second, up to burst tokens saved up
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Block until tokens are available
+        :return: Seconds waited
+        """
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def __repr__(self):
+        return '<TokenBucket(rate={}, burst={})>'.format(self.rate, self.burst)
+
+
+class _PriorityStats:
+
+    __slots__ = ('queued', 'max_queued', 'calls', 'waited', 'wait_time', 'max_wait', 'throttle_time')
+
+    def __init__(self):
+        self.queued = 0
+        self.max_queued = 0
+        self.calls = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.throttle_time = 0.0
+
+    def to_dict(self):
+        return {
+            'queued': self.queued,
+            'max_queued': self.max_queued,
+            'calls': self.calls,
+            'waited': self.waited,
+            'wait_time': self.wait_time,
+            'avg_wait': self.wait_time / self.waited if self.waited else 0.0,
+            'max_wait': self.max_wait,
+            'throttle_time': self.throttle_time,
+        }
+
+
+class Scheduler:
+    """
+    Priority scheduler and rate limiter in front of the transport
+
+    At most max_in_flight calls run at once, when all slots are busy calls queue and are granted by priority
+    (INTERACTIVE, then NORMAL, then BULK, first come first served within a priority). `reserved` slots are never
+    used by BULK calls so interactive traffic always finds room
+
+    Rate limits are token buckets keyed by method pattern (fnmatch), eg "ApierV1.GetCost" or "ApierV1.SetTP*",
+    a call takes a token from every matching bucket before queueing for a slot
+
+    A call's priority comes from the priority() context of its thread (bulk paths run at BULK),
+    else the first matching pattern in priorities, else default_priority
+    """
+
+    def __init__(self, max_in_flight: int = 10, reserved: int = 0, rate_limits: dict = None, priorities: dict = None,
+                 default_priority: int = NORMAL):
+        """
+        :param rate_limits: method pattern => TokenBucket
+        :param priorities: method pattern => priority (default DEFAULT_PRIORITIES)
+        """
+        if reserved >= max_in_flight:
+            raise Exception("reserved ({}) must be less than max_in_flight ({})".format(reserved, max_in_flight))
+
+        self.max_in_flight = max_in_flight
+        self.reserved = reserved
+        self.rate_limits = rate_limits or {}
+        self.priorities = DEFAULT_PRIORITIES if priorities is None else priorities
+        self.default_priority = default_priority
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._local = threading.local()
+
+        self._buckets = {}
+        self._method_priorities = {}
+        self._stats = {priority: _PriorityStats() for priority in PRIORITY_NAMES}
+
+    @contextmanager
+    def priority(self, priority: int):
+        """
+        Run this thread's calls at priority
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def priority_of(self, method):
+        priority = getattr(self._local, "priority", None)
+        if priority is not None:
+            return priority
+
+        priority = self._method_priorities.get(method)
+        if priority is None:
+            priority = next((p for pattern, p in self.priorities.items() if fnmatchcase(method, pattern)), self.default_priority)
+            self._method_priorities[method] = priority
+
+        return priority
+
+    def buckets_of(self, method):
+        buckets = self._buckets.get(method)
+        if buckets is None:
+            buckets = self._buckets[method] = [b for pattern, b in self.rate_limits.items() if fnmatchcase(method, pattern)]
+        return buckets
+
+    def _limit(self, priority):
+        return self.max_in_flight - (self.reserved if priority >= BULK else 0)
+
+    def _acquire(self, priority):
+        """
+        :return: Seconds queued for a slot
+        """
+        stats = self._stats[priority]
+
+        with self._lock:
+            stats.calls += 1
+
+            # Proceed unless slots are full or a call of the same or a more urgent priority is already queued
+            if self._in_flight < self._limit(priority) and not (self._waiters and self._waiters[0][0] <= priority):
+                self._in_flight += 1
+                return 0.0
+
+            event = threading.Event()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), event))
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+
+        started = time.perf_counter()
+        event.wait()
+        waited = time.perf_counter() - started
+
+        with self._lock:
+            stats.waited += 1
+            stats.wait_time += waited
+            stats.max_wait = max(stats.max_wait, waited)
+
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+            # Hand freed slots to the most urgent waiters
+            while self._waiters and self._in_flight < self._limit(self._waiters[0][0]):
+                priority, _, event = heapq.heappop(self._waiters)
+                self._stats[priority].queued -= 1
+                self._in_flight += 1
+                event.set()
+
+    @contextmanager
+    def slot(self, method):
+        """
+        Wait for method's rate limits and a free slot, held for the duration of the call
+        """
+        priority = self.priority_of(method)
+
+        for bucket in self.buckets_of(method):
+            throttled = bucket.acquire()
+            if throttled:
+                with self._lock:
+                    self._stats[priority].throttle_time += throttled
+
+        self._acquire(priority)
+        try:
+            yield priority
+        finally:
+            self._release()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def stats(self):
+        """
+        :return: Per priority queue depth (current/max), calls, waits and wait/throttle times
+        """
+        with self._lock:
+            result = {PRIORITY_NAMES[p]: s.to_dict() for p, s in self._stats.items()}
+            result['in_flight'] = self._in_flight
+        return result
+
+    def __repr__(self):
+        return '<Scheduler(max_in_flight={}, reserved={}, in_flight={})>'.format(self.max_in_flight, self.reserved, self._in_flight)
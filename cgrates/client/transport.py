@@ -0,0 +1,177 @@
+import json
+import time
+import zlib
+import threading
+import logging
+
+log = logging.getLogger()
+
+
+class Compression:
+    """
+    HTTP compression settings
+    Responses are negotiated (Accept-Encoding gzip/deflate), request bodies are gzipped when at least
+    request_threshold bytes. Note: The engine (or a proxy in front of it) must accept gzipped request bodies
+    """
+
+    def __init__(self, request_threshold: int = None, level: int = 6, accept_compressed: bool = True):
+        """
+        :param request_threshold: Gzip request bodies of at least this many bytes (None disables request compression)
+        :param level: zlib compression level (1-9)
+        """
+        self.request_threshold = request_threshold
+        self.level = level
+        self.accept_compressed = accept_compressed
+
+
+class TransportStats:
+    """
+    Payload sizes before/after compression and the CPU time spent (de)compressing
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.request_bytes = 0
+        self.request_wire_bytes = 0
+        self.response_bytes = 0
+        self.response_wire_bytes = 0
+        self.compression_cpu = 0.0
+
+    def record(self, request_bytes, request_wire_bytes, response_bytes, response_wire_bytes, cpu):
+        with self._lock:
+            self.calls += 1
+            self.request_bytes += request_bytes
+            self.request_wire_bytes += request_wire_bytes
+            self.response_bytes += response_bytes
+            self.response_wire_bytes += response_wire_bytes
+            self.compression_cpu += cpu
+
+    @staticmethod
+    def _ratio(raw, wire):
+        return raw / wire if wire else 1.0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'request_bytes': self.request_bytes,
+            'request_wire_bytes': self.request_wire_bytes,
+            'request_ratio': self._ratio(self.request_bytes, self.request_wire_bytes),
+            'response_bytes': self.response_bytes,
+            'response_wire_bytes': self.response_wire_bytes,
+            'response_ratio': self._ratio(self.response_bytes, self.response_wire_bytes),
+            'compression_cpu': self.compression_cpu,
+        }
+
+    def __repr__(self):
+        return '<TransportStats(calls={}, request_ratio={:.2f}, response_ratio={:.2f})>'.format(
+            self.calls, self._ratio(self.request_bytes, self.request_wire_bytes),
+            self._ratio(self.response_bytes, self.response_wire_bytes))
+
+
+def _gzip(content, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def _decode(content, encoding):
+    if encoding == "gzip":
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+
+    return content
+
+
+class Transport:
+    """
+    JSON-RPC over HTTP transport
+    Safe to share between threads and clients: every thread gets its own requests Session,
+    all of them mounted on one connection pool
+    requests is only imported when the first call is made
+    """
+
+    def __init__(self, host="localhost", port=2080, timeout=5, pool_size=10, compression: Compression = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.url = 'http://{}:{}/jsonrpc'.format(host, port)
+
+        self.pool_size = pool_size
+        self.compression = compression or Compression()
+        self.stats = TransportStats()
+
+        self._adapter = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def adapter(self):
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    from requests.adapters import HTTPAdapter
+                    self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        return self._adapter
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            self._local.session = session
+
+        return session
+
+    def request(self, body):
+        """
+        Send a JSON-RPC body
+        :param body: Request dict, or already JSON encoded bytes
+        :return: (status code, decoded response content bytes)
+        """
+
+        compression = self.compression
+        cpu = 0.0
+
+        data = wire = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+
+        headers = {
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate" if compression.accept_compressed else "identity",
+        }
+
+        if compression.request_threshold is not None and len(data) >= compression.request_threshold:
+            started = time.thread_time()
+            wire = _gzip(data, compression.level)
+            cpu += time.thread_time() - started
+            headers["Content-Encoding"] = "gzip"
+
+        response = self.session.post(self.url, data=wire, headers=headers, timeout=self.timeout, stream=True)
+
+        try:
+            raw = response.raw.read(decode_content=False)
+        finally:
+            response.close()
+
+        started = time.thread_time()
+        content = _decode(raw, response.headers.get("Content-Encoding", "").lower())
+        cpu += time.thread_time() - started
+
+        self.stats.record(len(data), len(wire), len(content), len(raw), cpu)
+
+        return response.status_code, content
+
+    def close(self):
+        if self._adapter is not None:
+            self._adapter.close()
+
+    def __repr__(self):
+        return '<Transport({})>'.format(self.url)
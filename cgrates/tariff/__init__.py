@@ -0,0 +1,8 @@
+from cgrates.tariff.plan import TariffPlan
+from cgrates.tariff.index import PrefixIndex
+from cgrates.tariff.snapshot import TariffSnapshot, SnapshotRefresher, SnapshotException, dump_snapshot, load_snapshot, plan_stamp
+from cgrates.tariff.reconcile import Reconciler, ReconcileReport
+from cgrates.tariff.validator import TariffPlanValidator, TariffPlanError, ValidationReport, ValidationIssue, validate_plan
+from cgrates.tariff.timing import CompiledTiming, TimingResolver, TimingSegment
+from cgrates.tariff.matrix import PriceMatrix, Quote
+from cgrates.tariff.prefixes import minimize_prefixes, minimize_destinations, DestinationUploader, UploadReport
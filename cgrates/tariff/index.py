@@ -0,0 +1,48 @@
+
+class PrefixIndex:
+    """
+    Longest prefix match of a number to a destination id
+    """
+
+    def __init__(self):
+        self._prefixes = {}
+        self._max_length = 0
+
+    @classmethod
+    def from_destinations(cls, destinations):
+        """
+        :param destinations: Iterable of models.Destination
+        """
+        index = cls()
+        for destination in destinations:
+            for prefix in destination.prefixes or []:
+                index.add(prefix, destination.destination_id)
+        return index
+
+    def add(self, prefix, destination_id):
+        self._prefixes[prefix] = destination_id
+        self._max_length = max(self._max_length, len(prefix))
+
+    def remove(self, prefix):
+        self._prefixes.pop(prefix, None)
+
+    def lookup(self, number):
+        """
+        :return: (prefix, destination_id) of the longest matching prefix or None
+        """
+        for length in range(min(len(number), self._max_length), 0, -1):
+            prefix = number[:length]
+            destination_id = self._prefixes.get(prefix)
+            if destination_id is not None:
+                return prefix, destination_id
+
+        return None
+
+    def items(self):
+        return self._prefixes.items()
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def __repr__(self):
+        return '<PrefixIndex(prefixes={})>'.format(len(self._prefixes))
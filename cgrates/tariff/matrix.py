@@ -0,0 +1,182 @@
+import math
+from array import array
+from collections import namedtuple, defaultdict
+from cgrates.tariff.plan import TariffPlan
+from cgrates.tariff.index import PrefixIndex
+from cgrates.tariff.timing import CompiledTiming, TimingResolver
+
+
+# Values stored per (destination, timing band) cell
+FIRST_INCREMENT, UNIT_PRICE, CONNECT_FEE, INCREMENT = range(4)
+CELL_SIZE = 4
+
+# increment: seconds the engine bills usage in (rounded up to)
+Quote = namedtuple("Quote", ["destination_id", "prefix", "timing_id", "first_increment_price", "unit_price", "connect_fee", "increment"])
+
+
+def _rate_values(rates):
+    """
+    Cell values of a rate's first slot (GroupIntervalStart 0)
+    :return: (first increment price, price per second, connect fee, increment seconds)
+    """
+    slot = min(rates, key=lambda r: r.group_interval_start or 0)
+    rate_unit = slot.rate_unit or 1
+    rate_increment = slot.rate_increment or rate_unit
+    return slot.rate * rate_increment / rate_unit, slot.rate / rate_unit, slot.connect_fee or 0, rate_increment
+
+
+class PriceMatrix:
+    """
+    Dense price table for one rating plan, indexed by destination ordinal and timing band ordinal
+    Built by expanding RatingPlan => DestinationRate => Rate, a quote is a prefix index walk,
+    a timing band resolve and an array read
+    Cells without a rate hold NaN. Only destinations the plan rates are indexed (so an unrated longer prefix does not
+    hide a rated shorter one), and a destination's band is resolved among the bindings that rate it
+    """
+
+    def __init__(self, plan: TariffPlan, rating_plan_id: str):
+        self.plan = plan
+        self.rating_plan_id = rating_plan_id
+
+        bindings = plan.rating_plans[rating_plan_id]
+
+        self.destination_ids = sorted(plan.destinations)
+        self._destination_ordinals = {d: i for i, d in enumerate(self.destination_ids)}
+
+        self.timing_ids = sorted({rp.timing_id for rp in bindings})
+        self._band_ordinals = {t: i for i, t in enumerate(self.timing_ids)}
+
+        band_timings = []
+        for band, timing_id in enumerate(self.timing_ids):
+            if timing_id in plan.timings:
+                timing = CompiledTiming.from_model(plan.timings[timing_id], timing_id=timing_id)
+            else:
+                timing = CompiledTiming.any(timing_id)
+            weight = max(rp.weight or 0 for rp in bindings if rp.timing_id == timing_id)
+            band_timings.append((band, timing, weight))
+
+        self.resolver = TimingResolver(band_timings)
+
+        self.cells = array('d', [math.nan]) * (len(self.destination_ids) * len(self.timing_ids) * CELL_SIZE)
+
+        # cell => rate_id and rate_id => cells, so a rate change only touches its own cells
+        self._cell_rates = {}
+        self._rate_cells = defaultdict(set)
+
+        self._build(bindings)
+
+        # Destination ordinal => TimingResolver over the bands rating it (None if unrated), shared per set of bands
+        self._resolvers = []
+        resolvers = {}
+
+        for ordinal in range(len(self.destination_ids)):
+            bands = tuple(b for b in range(len(self.timing_ids)) if not math.isnan(self.cells[self._cell(ordinal, b)]))
+
+            if bands and bands not in resolvers:
+                resolvers[bands] = TimingResolver([band_timings[b] for b in bands])
+
+            self._resolvers.append(resolvers.get(bands))
+
+        self.index = PrefixIndex.from_destinations(d for d in plan.destinations.values() if self._is_rated(d.destination_id))
+
+    def _cell(self, destination_ordinal, band):
+        return (destination_ordinal * len(self.timing_ids) + band) * CELL_SIZE
+
+    def _build(self, bindings):
+        weights = {}
+
+        for rp in bindings:
+            band = self._band_ordinals[rp.timing_id]
+
+            for dr in self.plan.destination_rates.get(rp.dest_rate_id, []):
+                destination_ordinal = self._destination_ordinals.get(dr.dest_id)
+                if destination_ordinal is None or dr.rate_id not in self.plan.rates:
+                    continue
+
+                cell = self._cell(destination_ordinal, band)
+
+                # Heavier binding wins when several cover the same cell
+                if cell in weights and weights[cell] > (rp.weight or 0):
+                    continue
+                weights[cell] = rp.weight or 0
+
+                self._set_cell(cell, dr.rate_id)
+
+    def _set_cell(self, cell, rate_id):
+        previous = self._cell_rates.get(cell)
+        if previous is not None:
+            self._rate_cells[previous].discard(cell)
+
+        self._cell_rates[cell] = rate_id
+        self._rate_cells[rate_id].add(cell)
+
+        self.cells[cell:cell + CELL_SIZE] = array('d', _rate_values(self.plan.rates[rate_id]))
+
+    def _is_rated(self, destination_id):
+        ordinal = self._destination_ordinals.get(destination_id)
+        return ordinal is not None and self._resolvers[ordinal] is not None
+
+    def update_rate(self, rate_id, rates):
+        """
+        Replace a rate's slots and rewrite only the cells priced by it
+        :return: Number of cells updated
+        """
+        self.plan.rates[rate_id] = rates
+
+        values = array('d', _rate_values(rates))
+        cells = self._rate_cells.get(rate_id, ())
+
+        for cell in cells:
+            self.cells[cell:cell + CELL_SIZE] = values
+
+        return len(cells)
+
+    def update_destination(self, destination_id, prefixes):
+        """
+        Replace a known destination's prefixes in the prefix index
+        """
+        if destination_id not in self._destination_ordinals:
+            raise KeyError("Destination {} Not in price matrix, rebuild it".format(destination_id))
+
+        destination = self.plan.destinations[destination_id]
+
+        for prefix in destination.prefixes or []:
+            if self.index.lookup(prefix) == (prefix, destination_id):
+                self.index.remove(prefix)
+
+        destination.prefixes = list(prefixes)
+
+        if not self._is_rated(destination_id):
+            return
+
+        for prefix in prefixes:
+            self.index.add(prefix, destination_id)
+
+    def lookup(self, number, when):
+        """
+        :param when: Answer time
+        :return: Quote or None if no destination/timing/rate matches
+        """
+        match = self.index.lookup(number)
+        if match is None:
+            return None
+
+        prefix, destination_id = match
+        ordinal = self._destination_ordinals[destination_id]
+
+        band = self._resolvers[ordinal].resolve(when)
+        if band is None:
+            return None
+
+        cell = self._cell(ordinal, band)
+        values = self.cells[cell:cell + CELL_SIZE]
+
+        if math.isnan(values[FIRST_INCREMENT]):
+            return None
+
+        return Quote(destination_id, prefix, self.timing_ids[band], values[FIRST_INCREMENT], values[UNIT_PRICE], values[CONNECT_FEE],
+                     values[INCREMENT])
+
+    def __repr__(self):
+        return '<PriceMatrix(rating_plan_id={}, destinations={}, bands={})>'.format(
+            self.rating_plan_id, len(self.destination_ids), len(self.timing_ids))
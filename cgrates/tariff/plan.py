@@ -0,0 +1,46 @@
+class TariffPlan:
+    """
+    Client side view of a tenant's tariff plan
+    Each attribute maps object id => model (timings, destinations) or list of models (rates, destination_rates, rating_plans,
+    rating_profiles of RatingPlanActivation)
+    Note: Rating profiles cannot be read back from the engine, so get_tariff_plan leaves them empty
+    """
+
+    def __init__(self, tenant=None, timings=None, destinations=None, rates=None, destination_rates=None, rating_plans=None,
+                 rating_profiles=None):
+        self.tenant = tenant
+        self.timings = timings or {}
+        self.destinations = destinations or {}
+        self.rates = rates or {}
+        self.destination_rates = destination_rates or {}
+        self.rating_plans = rating_plans or {}
+        self.rating_profiles = rating_profiles or {}
+
+    def to_dict(self):
+        return {
+            'Tenant': self.tenant,
+            'Timings': {k: v.to_dict() for k, v in self.timings.items()},
+            'Destinations': {k: v.to_dict() for k, v in self.destinations.items()},
+            'Rates': {k: [r.to_dict() for r in v] for k, v in self.rates.items()},
+            'DestinationRates': {k: [dr.to_dict() for dr in v] for k, v in self.destination_rates.items()},
+            'RatingPlans': {k: [rp.to_dict() for rp in v] for k, v in self.rating_plans.items()},
+            'RatingProfiles': {k: [rpa.to_dict() for rpa in v] for k, v in self.rating_profiles.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        from cgrates.schemas import models
+
+        return cls(
+            tenant=data.get('Tenant'),
+            timings={k: models.Timing(v) for k, v in data.get('Timings', {}).items()},
+            destinations={k: models.Destination(v) for k, v in data.get('Destinations', {}).items()},
+            rates={k: [models.Rate(r) for r in v] for k, v in data.get('Rates', {}).items()},
+            destination_rates={k: [models.DestinationRate(dr) for dr in v] for k, v in data.get('DestinationRates', {}).items()},
+            rating_plans={k: [models.RatingPlan(rp) for rp in v] for k, v in data.get('RatingPlans', {}).items()},
+            rating_profiles={k: [models.RatingPlanActivation(rpa) for rpa in v] for k, v in data.get('RatingProfiles', {}).items()},
+        )
+
+    def __repr__(self):
+        return '<TariffPlan(tenant={}, destinations={}, rates={}, rating_plans={},...)>'.format(
+            self.tenant, len(self.destinations), len(self.rates), len(self.rating_plans))
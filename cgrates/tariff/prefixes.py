@@ -0,0 +1,151 @@
+import json
+import hashlib
+from collections import defaultdict, namedtuple
+import logging
+
+log = logging.getLogger()
+
+
+DIGITS = "0123456789"
+
+UploadReport = namedtuple("UploadReport", ["sent", "unchanged", "errors", "prefixes", "minimized"])
+
+
+def minimize_prefixes(prefixes, reserved=()):
+    """
+    Smallest prefix list matching the same numbers by longest prefix match:
+    prefixes covered by a shorter one of the list are dropped and complete sets of sibling digits
+    (eg 6420-6429) collapse into their parent (642), repeatedly
+
+    :param reserved: Prefixes of other destinations, these are never created, dropped or collapsed over
+                     (a prefix is only dropped if its nearest shorter prefix overall is one of the list)
+    Note: Lossless for numbers longer than the collapsed prefixes (a number equal to a new parent prefix now matches)
+    :return: Sorted list
+    """
+    prefixes = set(prefixes)
+
+    changed = True
+    while changed:
+        changed = False
+
+        # Drop covered prefixes, shortest first so the nearest shorter prefix is decided
+        kept = set()
+        for prefix in sorted(prefixes, key=len):
+            if prefix not in reserved and _covered(prefix, kept, reserved):
+                changed = True
+            else:
+                kept.add(prefix)
+        prefixes = kept
+
+        # Collapse complete sibling sets, a new parent may complete its own siblings on the next pass
+        children = defaultdict(set)
+        for prefix in prefixes:
+            if len(prefix) > 1 and prefix[-1] in DIGITS and prefix not in reserved:
+                children[prefix[:-1]].add(prefix[-1])
+
+        for parent in sorted(children, key=len, reverse=True):
+            if len(children[parent]) == len(DIGITS) and parent not in reserved:
+                prefixes.difference_update(parent + digit for digit in DIGITS)
+                prefixes.add(parent)
+                changed = True
+
+    return sorted(prefixes)
+
+
+def _covered(prefix, prefixes, reserved):
+    for length in range(len(prefix) - 1, 0, -1):
+        ancestor = prefix[:length]
+        if ancestor in prefixes:
+            return True
+        if ancestor in reserved:
+            return False
+    return False
+
+
+class _Reserved:
+    """
+    Prefixes of every destination but one
+    """
+
+    def __init__(self, owners, destination_id):
+        self.owners = owners
+        self.destination_id = destination_id
+
+    def __contains__(self, prefix):
+        owners = self.owners.get(prefix)
+        return owners is not None and (len(owners) > 1 or self.destination_id not in owners)
+
+
+def minimize_destinations(destinations: dict):
+    """
+    Minimize each destination's prefixes without changing which destination any number matches
+    :param destinations: destination_id => prefixes (all destinations rated together, eg a TariffPlan's)
+    :return: destination_id => sorted minimized prefixes
+    """
+    owners = defaultdict(set)
+    for destination_id, prefixes in destinations.items():
+        for prefix in prefixes or []:
+            owners[prefix].add(destination_id)
+
+    return {destination_id: minimize_prefixes(prefixes or [], reserved=_Reserved(owners, destination_id))
+            for destination_id, prefixes in destinations.items()}
+
+
+class DestinationUploader:
+    """
+    Delta upload of destinations: keeps a digest per destination of the prefixes last sent and only sends
+    (SetTPDestination) and loads (LoadDestination) the destinations whose prefixes changed
+    With minimize, prefixes are minimized across all the destinations given before they are compared and sent
+    Note: The snapshot reflects what this uploader sent, changes made by others to the engine are not seen
+    """
+
+    def __init__(self, client, minimize: bool = True, workers: int = None, snapshot: dict = None):
+        self.client = client
+        self.minimize = minimize
+        self.workers = workers
+        self.snapshot = dict(snapshot or {})
+
+    @staticmethod
+    def digest(prefixes):
+        data = json.dumps(sorted(prefixes), separators=(",", ":"))
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest()
+
+    def upload(self, destinations: dict):
+        """
+        :param destinations: destination_id => prefixes
+        :return: UploadReport (sent and unchanged ids, errors by id, prefix counts before/after minimizing)
+        """
+        if self.minimize:
+            prepared = minimize_destinations(destinations)
+        else:
+            prepared = {destination_id: sorted(prefixes or []) for destination_id, prefixes in destinations.items()}
+
+        digests = {destination_id: self.digest(prefixes) for destination_id, prefixes in prepared.items()}
+
+        ids = [destination_id for destination_id, digest in digests.items() if self.snapshot.get(destination_id) != digest]
+        unchanged = [destination_id for destination_id, digest in digests.items() if self.snapshot.get(destination_id) == digest]
+
+        result = self.client.fan_out(lambda i: self.client.set_destination(destination_id=i, prefixes=prepared[i]), ids, workers=self.workers)
+
+        errors = {ids[index]: error for index, error in result.errors.items()}
+
+        for destination_id in ids:
+            if destination_id not in errors:
+                self.snapshot[destination_id] = digests[destination_id]
+
+        if errors:
+            log.error("Destination upload: {} of {} failed".format(len(errors), len(ids)))
+
+        return UploadReport([i for i in ids if i not in errors], unchanged, errors,
+                            sum(len(p or []) for p in destinations.values()), sum(len(p) for p in prepared.values()))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({k: v.hex() for k, v in self.snapshot.items()}, f)
+
+    def load(self, path):
+        with open(path) as f:
+            self.snapshot = {k: bytes.fromhex(v) for k, v in json.load(f).items()}
+
+    def __repr__(self):
+        return '<DestinationUploader(destinations={}, minimize={})>'.format(len(self.snapshot), self.minimize)
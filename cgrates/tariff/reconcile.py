@@ -0,0 +1,170 @@
+import json
+from cgrates.tariff.plan import TariffPlan
+from cgrates.tariff.validator import TariffPlanValidator
+import logging
+
+log = logging.getLogger()
+
+
+# Dependency order, each kind only references kinds before it
+KINDS = ['timings', 'destinations', 'rates', 'destination_rates', 'rating_plans']
+
+
+def _is_unset(value):
+    """
+    Values the engine fills in for unset fields (eg MaxCost 0, GroupIntervalStart "0s") compare as unset
+    """
+    if type(value) in (int, float):
+        return value == 0
+    return value is None or value in ("", "0s") or value == []
+
+
+def _normalized(data):
+    """
+    Model to_dict() form with unset values dropped and integral floats as ints
+    """
+    return {k: int(v) if isinstance(v, float) and v.is_integer() else v for k, v in data.items() if not _is_unset(v)}
+
+
+def _canonical(kind, value):
+    """
+    Comparable form of a tariff plan object, from the model to_dict() forms
+    Order of prefixes and of list items (rate slots, bindings) is not significant, nor are unset vs engine default values
+    """
+
+    if kind == 'destinations':
+        data = _normalized(value.to_dict())
+        data['Prefixes'] = sorted(data.get('Prefixes') or [])
+        return json.dumps(data, sort_keys=True, default=str)
+
+    if isinstance(value, list):
+        return json.dumps(sorted(json.dumps(_normalized(v.to_dict()), sort_keys=True, default=str) for v in value))
+
+    return json.dumps(_normalized(value.to_dict()), sort_keys=True, default=str)
+
+
+class ReconcileReport:
+    """
+    What a reconcile created, updated or left unchanged (ids per kind)
+    """
+
+    def __init__(self):
+        self.created = {kind: [] for kind in KINDS}
+        self.updated = {kind: [] for kind in KINDS}
+        self.unchanged = {kind: 0 for kind in KINDS}
+        self.errors = {}
+        self.applied = False
+
+    @property
+    def changes(self):
+        return sum(len(v) for v in self.created.values()) + sum(len(v) for v in self.updated.values())
+
+    def to_dict(self):
+        return {
+            'created': {k: v for k, v in self.created.items() if v},
+            'updated': {k: v for k, v in self.updated.items() if v},
+            'unchanged': self.unchanged,
+            'errors': {'{}:{}'.format(*k): str(v) for k, v in self.errors.items()},
+            'applied': self.applied,
+        }
+
+    def __repr__(self):
+        return '<ReconcileReport(created={}, updated={}, errors={}, applied={})>'.format(
+            sum(len(v) for v in self.created.values()), sum(len(v) for v in self.updated.values()),
+            len(self.errors), self.applied)
+
+
+class Reconciler:
+    """
+    Push a desired tariff plan to the engine, sending only the objects that differ from the engine's current state
+    Objects are set in dependency order (timings, destinations, rates, destination rates, rating plans)
+    without per object dependency checks or read backs, followed by a single reload_cache
+
+    The engine state is read as one id listing per kind plus one read per desired object that already exists
+    (concurrently), objects outside the desired plan are not read
+    Note: The ApierV1 API has no bulk read of tariff plan objects, so a reconcile still costs a read per existing
+    desired object. Objects missing from the desired plan are left alone (no deletes), rating profiles are
+    validated but not pushed (they cannot be read back to diff)
+    """
+
+    def __init__(self, client, workers: int = None):
+        self.client = client
+        self.workers = workers
+
+    def _setters(self):
+        return {
+            'timings': lambda i, v: self.client.set_timing(v),
+            'destinations': lambda i, v: self.client.set_destination(destination_id=i, prefixes=v.prefixes),
+            'rates': lambda i, v: self.client.set_rates(rate_id=i, rates=v),
+            'destination_rates': lambda i, v: self.client.set_destination_rates(dest_rate_id=i, dest_rates=v),
+            'rating_plans': lambda i, v: self.client.set_rating_plans(rating_plan_id=i, rating_plans=v),
+        }
+
+    def diff(self, desired: TariffPlan, current: TariffPlan):
+        """
+        :return: ReconcileReport of the creates and updates needed (not applied)
+        """
+
+        report = ReconcileReport()
+
+        for kind in KINDS:
+            existing = getattr(current, kind)
+
+            for object_id, value in getattr(desired, kind).items():
+                if object_id not in existing:
+                    report.created[kind].append(object_id)
+                elif _canonical(kind, value) != _canonical(kind, existing[object_id]):
+                    report.updated[kind].append(object_id)
+                else:
+                    report.unchanged[kind] += 1
+
+        return report
+
+    def reconcile(self, desired: TariffPlan, dry_run: bool = False, validate: bool = True):
+        """
+        Fetch the engine's current state of the desired objects, compute the diff and (unless dry_run) apply it
+        Stops at the first kind with errors as later kinds depend on it
+        :param validate: Validate the desired plan offline (against the current plan) before sending anything,
+                         raises TariffPlanError on errors
+        :return: ReconcileReport
+        """
+
+        existing = self.client.get_tariff_plan_ids()
+
+        wanted = {}
+        for kind in KINDS:
+            ids = set(existing[kind])
+            wanted[kind] = [i for i in getattr(desired, kind) if i in ids]
+
+        current = self.client.get_tariff_plan(workers=self.workers, ids=wanted)
+
+        if validate:
+            validator = TariffPlanValidator(known=current, known_ids=existing, check_overlaps=False, check_unused=False)
+            validator.validate(desired).raise_for_errors()
+
+        report = self.diff(desired, current)
+
+        if dry_run:
+            return report
+
+        setters = self._setters()
+
+        for kind in KINDS:
+            ids = report.created[kind] + report.updated[kind]
+            objects = getattr(desired, kind)
+
+            result = self.client.fan_out(lambda i: setters[kind](i, objects[i]), ids, workers=self.workers)
+
+            for index, error in result.errors.items():
+                report.errors[(kind, ids[index])] = error
+
+            if report.errors:
+                log.error("Reconcile stopped at {}: {} errors".format(kind, len(report.errors)))
+                return report
+
+        if report.changes:
+            self.client.reload_cache()
+
+        report.applied = True
+
+        return report
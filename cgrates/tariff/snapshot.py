@@ -0,0 +1,251 @@
+import os
+import mmap
+import json
+import time
+import zlib
+import struct
+import hashlib
+import threading
+import weakref
+from cgrates.tariff.plan import TariffPlan
+from cgrates.tariff.index import PrefixIndex
+import logging
+
+log = logging.getLogger()
+
+
+MAGIC = b"CGRSNAP\x01"
+FORMAT_VERSION = 1
+
+# magic, format, created_at, stamp, version, prefix count,
+# then (offset, size) of the prefix records, prefix strings, meta (json) and plan (zlib json) sections
+HEADER = struct.Struct("<8sId32s64sIQQQQQQQQ")
+
+# prefix string offset, prefix length, destination ordinal
+RECORD = struct.Struct("<IHI")
+
+
+class SnapshotException(Exception):
+    pass
+
+
+def plan_stamp(plan: TariffPlan):
+    """
+    Content hash of a tariff plan, used to detect a stale snapshot
+    """
+    data = json.dumps(plan.to_dict(), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def dump_snapshot(plan: TariffPlan, path, version=""):
+    """
+    Write the tariff plan and a prebuilt prefix index to a binary snapshot file
+    The file is replaced atomically so readers can keep using an already mapped snapshot
+    :param version: Free form version stamp (eg the engine load id), max 64 bytes
+    :return: Content stamp of the plan
+    """
+
+    plan_json = json.dumps(plan.to_dict(), sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    stamp = hashlib.blake2b(plan_json, digest_size=16).hexdigest()
+
+    destination_ids = sorted(plan.destinations)
+    ordinals = {d: i for i, d in enumerate(destination_ids)}
+
+    index = PrefixIndex.from_destinations(plan.destinations.values())
+
+    records = bytearray()
+    strings = bytearray()
+
+    for prefix, destination_id in sorted((p.encode("utf-8"), d) for p, d in index.items()):
+        records += RECORD.pack(len(strings), len(prefix), ordinals[destination_id])
+        strings += prefix
+
+    meta = json.dumps({
+        "tenant": plan.tenant,
+        "destination_ids": destination_ids,
+        "max_prefix_length": max((len(p) for p, _ in index.items()), default=0)
+    }).encode("utf-8")
+    compressed = zlib.compress(plan_json, 6)
+
+    offset = HEADER.size
+    sections = []
+    for section in (records, strings, meta, compressed):
+        sections += [offset, len(section)]
+        offset += len(section)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), stamp.encode("ascii"), version.encode("utf-8"),
+                         len(index), *sections)
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    with open(tmp_path, "wb") as f:
+        for chunk in (header, records, strings, meta, compressed):
+            f.write(chunk)
+
+    os.replace(tmp_path, path)
+
+    return stamp
+
+
+def load_snapshot(path):
+    return TariffSnapshot(path)
+
+
+class TariffSnapshot:
+    """
+    Memory mapped tariff plan snapshot
+    Opening only parses the header, prefix lookups binary search the mapped index and the plan is decoded on first access
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Unmapped once the snapshot is no longer referenced (eg readers still holding a swapped out one)
+        self._finalizer = weakref.finalize(self, self._mm.close)
+
+        if len(self._mm) < HEADER.size:
+            raise SnapshotException("{} is not a tariff plan snapshot".format(path))
+
+        (magic, format_version, self.created_at, stamp, version, self.prefix_count,
+         self._records_offset, _, self._strings_offset, _, meta_offset, meta_size,
+         self._plan_offset, self._plan_size) = HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotException("{} is not a tariff plan snapshot (or unsupported format)".format(path))
+
+        self.stamp = stamp.decode("ascii")
+        self.version = version.rstrip(b"\x00").decode("utf-8")
+
+        meta = json.loads(self._mm[meta_offset:meta_offset + meta_size])
+        self.tenant = meta['tenant']
+        self.destination_ids = meta['destination_ids']
+        self._max_prefix_length = meta['max_prefix_length']
+
+        self._plan = None
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            data = zlib.decompress(self._mm[self._plan_offset:self._plan_offset + self._plan_size])
+            self._plan = TariffPlan.from_dict(json.loads(data))
+        return self._plan
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    def is_stale(self, plan: TariffPlan = None, max_age: float = None):
+        """
+        :param plan: Current tariff plan, stale if its content differs
+        :param max_age: Stale if older than this many seconds
+        """
+        if max_age is not None and self.age > max_age:
+            return True
+
+        if plan is not None and plan_stamp(plan) != self.stamp:
+            return True
+
+        return False
+
+    def _prefix_at(self, i):
+        offset, length, ordinal = RECORD.unpack_from(self._mm, self._records_offset + i * RECORD.size)
+        start = self._strings_offset + offset
+        return self._mm[start:start + length], ordinal
+
+    def _find(self, prefix):
+        lo, hi = 0, self.prefix_count
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value, ordinal = self._prefix_at(mid)
+            if value < prefix:
+                lo = mid + 1
+            elif value > prefix:
+                hi = mid
+            else:
+                return ordinal
+
+        return None
+
+    def lookup(self, number):
+        """
+        :return: (prefix, destination_id) of the longest matching prefix or None
+        """
+        number = number.encode("utf-8")
+
+        for length in range(min(len(number), self._max_prefix_length), 0, -1):
+            ordinal = self._find(number[:length])
+            if ordinal is not None:
+                return number[:length].decode("utf-8"), self.destination_ids[ordinal]
+
+        return None
+
+    def close(self):
+        self._finalizer()
+
+    def __repr__(self):
+        return '<TariffSnapshot(tenant={}, stamp={}, prefixes={})>'.format(self.tenant, self.stamp, self.prefix_count)
+
+
+class SnapshotRefresher:
+    """
+    Keeps a snapshot file up to date from the engine in a background thread
+    Readers use .snapshot, which is loaded from disk straight away and swapped when the engine's plan changes
+    A swapped out snapshot is unmapped as soon as the last reader drops it
+    """
+
+    def __init__(self, client, path, interval: float = 300, version=""):
+        self.client = client
+        self.path = path
+        self.interval = interval
+        self.version = version
+
+        self.snapshot = load_snapshot(path) if os.path.exists(path) else None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """
+        Fetch the engine's tariff plan and rewrite the snapshot if it changed
+        :return: True if the snapshot was replaced
+        """
+
+        plan = self.client.get_tariff_plan()
+
+        if self.snapshot and not self.snapshot.is_stale(plan=plan):
+            return False
+
+        dump_snapshot(plan, self.path, version=self.version)
+        self.snapshot = load_snapshot(self.path)
+
+        log.info("Refreshed tariff plan snapshot {}".format(self.snapshot))
+
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.error("Failed to refresh tariff plan snapshot: {}".format(e))
+
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cgrates-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
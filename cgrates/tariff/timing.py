@@ -0,0 +1,204 @@
+import datetime
+from bisect import bisect_right
+from collections import namedtuple
+from typing import List
+
+
+TimingSegment = namedtuple("TimingSegment", ["start", "end", "binding"])
+
+
+def _bits(values):
+    """
+    Bitset of the given ints, 0 (no restriction) if empty
+    """
+    mask = 0
+    for value in values or []:
+        mask |= 1 << int(value)
+    return mask
+
+
+def _seconds(value):
+    if not value or value in ("*asap", "*now"):
+        return 0
+
+    if isinstance(value, datetime.time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+
+    hours, minutes, seconds = (int(v) for v in value.split(":"))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class CompiledTiming:
+    """
+    Timing (or ActionPlan) compiled to bitsets per calendar field and a start second of day
+    An empty field matches anything. Week days follow CGRateS (0 = Sunday, 7 is accepted as Sunday too)
+    """
+
+    __slots__ = ('timing_id', 'years', 'months', 'month_days', 'week_days', 'start')
+
+    def __init__(self, timing_id, years=None, months=None, month_days=None, week_days=None, start=0):
+        self.timing_id = timing_id
+        self.years = frozenset(int(y) for y in years) if years else None
+        self.months = _bits(months)
+        self.month_days = _bits(month_days)
+
+        week_days = [0 if int(d) == 7 else int(d) for d in week_days or []]
+        self.week_days = _bits(week_days)
+
+        self.start = start
+
+    @classmethod
+    def from_model(cls, model, timing_id=None):
+        """
+        :param model: models.Timing or models.ActionPlan
+        """
+        return cls(
+            timing_id=timing_id or getattr(model, 'timing_id', None),
+            years=model.years,
+            months=model.months,
+            month_days=model.month_days,
+            week_days=model.week_days,
+            start=_seconds(model.time),
+        )
+
+    @classmethod
+    def any(cls, timing_id="*any"):
+        return cls(timing_id)
+
+    def matches_date(self, date: datetime.date):
+        if self.years is not None and date.year not in self.years:
+            return False
+        if self.months and not self.months >> date.month & 1:
+            return False
+        if self.month_days and not self.month_days >> date.day & 1:
+            return False
+        # isoweekday: Monday = 1 .. Sunday = 7
+        if self.week_days and not self.week_days >> (date.isoweekday() % 7) & 1:
+            return False
+        return True
+
+    def __repr__(self):
+        return '<CompiledTiming(timing_id={}, start={})>'.format(self.timing_id, self.start)
+
+
+class TimingResolver:
+    """
+    Resolve which binding is active at a given time
+    A binding is active from its timing's start time on days its timing matches, until another binding takes over
+    (or the day ends). When several are active the highest weight wins, then the latest start time
+
+    Each distinct day (by the set of timings matching it) is compiled once into sorted switch points,
+    so resolving is a cached day lookup plus a bisect over a handful of switch points
+    """
+
+    def __init__(self, bindings: List, cache_size: int = 1024):
+        """
+        :param bindings: List of (binding, CompiledTiming, weight), binding is returned as is (eg a models.RatingPlan)
+        """
+        self.bindings = list(bindings)
+        self.cache_size = cache_size
+
+        self._schedules = {}
+        self._days = {}
+
+    @classmethod
+    def from_rating_plan(cls, rating_plans, timings: dict, **kwargs):
+        """
+        :param rating_plans: List of models.RatingPlan bindings
+        :param timings: timing_id => models.Timing (timings starting with * such as *any match always)
+        """
+        bindings = []
+
+        for rp in rating_plans:
+            if rp.timing_id in timings:
+                timing = CompiledTiming.from_model(timings[rp.timing_id], timing_id=rp.timing_id)
+            elif rp.timing_id.startswith("*"):
+                timing = CompiledTiming.any(rp.timing_id)
+            else:
+                raise KeyError("Timing {} Not found".format(rp.timing_id))
+
+            bindings.append((rp, timing, rp.weight or 0))
+
+        return cls(bindings, **kwargs)
+
+    def _compile_schedule(self, matching):
+        """
+        :return: (switch point seconds, binding active from each switch point)
+        """
+        starts = sorted({self.bindings[i][1].start for i in matching})
+
+        points, active = [], []
+
+        for start in starts:
+            candidates = [i for i in matching if self.bindings[i][1].start <= start]
+            winner = max(candidates, key=lambda i: (self.bindings[i][2], self.bindings[i][1].start))
+            binding = self.bindings[winner][0]
+
+            if active and active[-1] is binding:
+                continue
+
+            points.append(start)
+            active.append(binding)
+
+        return points, active
+
+    def schedule(self, date: datetime.date):
+        schedule = self._days.get(date)
+
+        if schedule is None:
+            matching = tuple(i for i, (_, timing, _) in enumerate(self.bindings) if timing.matches_date(date))
+
+            schedule = self._schedules.get(matching)
+            if schedule is None:
+                schedule = self._schedules[matching] = self._compile_schedule(matching)
+
+            if len(self._days) >= self.cache_size:
+                self._days.clear()
+            self._days[date] = schedule
+
+        return schedule
+
+    def resolve(self, when: datetime.datetime):
+        """
+        :return: Active binding at when, None if nothing is active
+        """
+        points, active = self.schedule(when.date())
+
+        index = bisect_right(points, when.hour * 3600 + when.minute * 60 + when.second) - 1
+
+        return active[index] if index >= 0 else None
+
+    def segments(self, start: datetime.datetime, usage: float):
+        """
+        Split a usage window into per binding segments at timing boundaries
+        :param usage: Usage in seconds
+        :return: List of TimingSegment(start, end, binding)
+        """
+
+        end = start + datetime.timedelta(seconds=usage)
+        result = []
+        current = start
+
+        while current < end:
+            points, active = self.schedule(current.date())
+            midnight = datetime.datetime.combine(current.date(), datetime.time(0), tzinfo=current.tzinfo)
+            offset = (current - midnight).total_seconds()
+
+            index = bisect_right(points, offset) - 1
+            binding = active[index] if index >= 0 else None
+
+            if index + 1 < len(points):
+                boundary = midnight + datetime.timedelta(seconds=points[index + 1])
+            else:
+                boundary = midnight + datetime.timedelta(days=1)
+
+            segment_end = min(boundary, end)
+
+            if result and result[-1].binding is binding:
+                result[-1] = TimingSegment(result[-1].start, segment_end, binding)
+            else:
+                result.append(TimingSegment(current, segment_end, binding))
+
+            current = segment_end
+
+        return result
@@ -0,0 +1,186 @@
+from collections import namedtuple, defaultdict
+from cgrates.client.base import TAG_RE
+from cgrates.tariff.plan import TariffPlan
+import logging
+
+log = logging.getLogger()
+
+
+ERROR = "error"
+WARNING = "warning"
+
+ValidationIssue = namedtuple("ValidationIssue", ["severity", "kind", "object_id", "message"])
+
+# Required id prefix per kind (timings have none)
+TAG_PREFIXES = {
+    'timings': None,
+    'destinations': "DST",
+    'rates': "RT",
+    'destination_rates': "DR",
+    'rating_plans': "RPL",
+    'rating_profiles': "RPF",
+}
+
+
+class TariffPlanError(Exception):
+
+    def __init__(self, issues):
+        self.issues = issues
+        super(TariffPlanError, self).__init__("Invalid tariff plan: {} errors, first: {}".format(len(issues), issues[0].message if issues else None))
+
+
+class ValidationReport:
+
+    def __init__(self, issues):
+        self.issues = issues
+
+    @property
+    def errors(self):
+        return [i for i in self.issues if i.severity == ERROR]
+
+    @property
+    def warnings(self):
+        return [i for i in self.issues if i.severity == WARNING]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_for_errors(self):
+        if not self.ok:
+            raise TariffPlanError(self.errors)
+
+    def __repr__(self):
+        return '<ValidationReport(errors={}, warnings={})>'.format(len(self.errors), len(self.warnings))
+
+
+class TariffPlanValidator:
+    """
+    Offline tariff plan validator, checks a whole plan in one pass using hash indexes over the object ids:
+    tag syntax and prefixes, dangling references (including rating profiles' rating plans), duplicate/overlapping destination prefixes and unused objects
+    """
+
+    def __init__(self, known: TariffPlan = None, check_overlaps: bool = True, check_unused: bool = True, known_ids: dict = None):
+        """
+        :param known: Objects that already exist (eg on the engine), references to them are not dangling
+        :param known_ids: Ids of further existing objects, dict of kind => ids (eg client.get_tariff_plan_ids())
+        """
+        self.known = known or TariffPlan()
+        self.known_ids = known_ids or {}
+        self.check_overlaps = check_overlaps
+        self.check_unused = check_unused
+
+    def _ids(self, plan, kind):
+        return set(getattr(plan, kind)) | set(getattr(self.known, kind)) | set(self.known_ids.get(kind) or [])
+
+    def validate(self, plan: TariffPlan):
+        """
+        :return: ValidationReport
+        """
+
+        issues = []
+
+        def add(severity, kind, object_id, message):
+            issues.append(ValidationIssue(severity, kind, object_id, message))
+
+        # Tag syntax
+        for kind, prefix in TAG_PREFIXES.items():
+            for object_id in getattr(plan, kind):
+                if prefix and not object_id.startswith("{}_".format(prefix)):
+                    add(ERROR, kind, object_id, "{} must begin with prefix {}_".format(object_id, prefix))
+                elif not TAG_RE.match(object_id):
+                    add(ERROR, kind, object_id, "{} must be upper case/alpha or underscore only".format(object_id))
+
+        rate_ids = self._ids(plan, 'rates')
+        destination_ids = self._ids(plan, 'destinations')
+        dest_rate_ids = self._ids(plan, 'destination_rates')
+        timing_ids = self._ids(plan, 'timings')
+        rating_plan_ids = self._ids(plan, 'rating_plans')
+
+        used = defaultdict(set)
+
+        # References
+        for dest_rate_id, dest_rates in plan.destination_rates.items():
+            for dr in dest_rates:
+                used['rates'].add(dr.rate_id)
+                used['destinations'].add(dr.dest_id)
+
+                if dr.rate_id not in rate_ids:
+                    add(ERROR, 'destination_rates', dest_rate_id, "Rate {} Not found. Referenced by destination rate {}".format(dr.rate_id, dest_rate_id))
+                if dr.dest_id not in destination_ids:
+                    add(ERROR, 'destination_rates', dest_rate_id, "Destination {} Not found. Referenced by destination rate {}".format(dr.dest_id, dest_rate_id))
+
+        for rating_plan_id, rating_plans in plan.rating_plans.items():
+            for rp in rating_plans:
+                used['destination_rates'].add(rp.dest_rate_id)
+                used['timings'].add(rp.timing_id)
+
+                if rp.dest_rate_id not in dest_rate_ids:
+                    add(ERROR, 'rating_plans', rating_plan_id, "Destination Rate {} Not found. Referenced by rating plan {}".format(rp.dest_rate_id, rating_plan_id))
+                # Builtin timings (eg *any) are always available
+                if rp.timing_id not in timing_ids and not rp.timing_id.startswith("*"):
+                    add(ERROR, 'rating_plans', rating_plan_id, "Timing {} Not found. Referenced by rating plan {}".format(rp.timing_id, rating_plan_id))
+
+        for rating_profile_id, activations in plan.rating_profiles.items():
+            for rpa in activations:
+                used['rating_plans'].add(rpa.rating_plan_id)
+
+                if rpa.rating_plan_id not in rating_plan_ids:
+                    add(ERROR, 'rating_profiles', rating_profile_id, "Rating Plan {} Not found. Referenced by rating profile {}".format(rpa.rating_plan_id, rating_profile_id))
+
+        # Objects only in the known plan still reference things
+        for dest_rate_id, dest_rates in self.known.destination_rates.items():
+            if dest_rate_id not in plan.destination_rates:
+                for dr in dest_rates:
+                    used['rates'].add(dr.rate_id)
+                    used['destinations'].add(dr.dest_id)
+
+        for rating_plan_id, rating_plans in self.known.rating_plans.items():
+            if rating_plan_id not in plan.rating_plans:
+                for rp in rating_plans:
+                    used['destination_rates'].add(rp.dest_rate_id)
+                    used['timings'].add(rp.timing_id)
+
+        # Prefixes
+        prefix_owner = {}
+
+        for destination_id, destination in plan.destinations.items():
+            seen = set()
+            for prefix in destination.prefixes or []:
+                if prefix in seen:
+                    add(WARNING, 'destinations', destination_id, "Prefix {} listed more than once in {}".format(prefix, destination_id))
+                    continue
+                seen.add(prefix)
+
+                owner = prefix_owner.get(prefix)
+                if owner is not None:
+                    add(WARNING, 'destinations', destination_id, "Prefix {} of {} is also in {}".format(prefix, destination_id, owner))
+                else:
+                    prefix_owner[prefix] = destination_id
+
+        if self.check_overlaps:
+            for prefix, destination_id in prefix_owner.items():
+                for length in range(len(prefix) - 1, 0, -1):
+                    owner = prefix_owner.get(prefix[:length])
+                    if owner is not None and owner != destination_id:
+                        add(WARNING, 'destinations', destination_id, "Prefix {} of {} overlaps {} of {}".format(prefix, destination_id, prefix[:length], owner))
+                        break
+
+        # Unused
+        if self.check_unused:
+            kinds = ['timings', 'destinations', 'rates', 'destination_rates']
+
+            # Rating plans are only referenced by rating profiles, which the engine does not return
+            if plan.rating_profiles:
+                kinds.append('rating_plans')
+
+            for kind in kinds:
+                for object_id in getattr(plan, kind):
+                    if object_id not in used[kind]:
+                        add(WARNING, kind, object_id, "{} is not referenced".format(object_id))
+
+        return ValidationReport(issues)
+
+
+def validate_plan(plan: TariffPlan, known: TariffPlan = None, **kwargs):
+    return TariffPlanValidator(known=known, **kwargs).validate(plan)
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class Span:
+    """
+    A timed operation, nested spans share the trace_id and point to their parent
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start', 'end', '_timer', 'duration', 'error')
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.end = None
+        self.duration = None
+        self.error = None
+        self._timer = time.perf_counter()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = str(error)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._timer
+        self.end = self.start + self.duration
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return '<Span(name={}, duration={}, error={})>'.format(self.name, self.duration, self.error)
+
+
+class InMemoryExporter:
+    """
+    Keeps finished spans in a list (for tests)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name):
+        return [s for s in self.spans if s.name == name]
+
+    def children(self, span: Span):
+        return [s for s in self.spans if s.parent_id == span.span_id]
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+
+class JSONLinesExporter:
+    """
+    Appends finished spans to a file, one JSON object per line
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """
+    Creates nested spans, the current span is tracked per thread
+    Work handed to other threads can be parented with activate(span)
+    """
+
+    def __init__(self, exporter=None):
+        """
+        :param exporter: Object with export(span), eg InMemoryExporter or JSONLinesExporter
+        """
+        self.exporter = exporter or InMemoryExporter()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+
+        span = Span(name, trace_id=parent.trace_id if parent else None, parent_id=parent.span_id if parent else None, attributes=attributes)
+        stack.append(span)
+
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            stack.pop()
+            span.finish()
+            self.exporter.export(span)
+
+    @contextmanager
+    def activate(self, span: Span):
+        """
+        Make span the parent of spans opened by this thread (eg in a worker pool)
+        """
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+
+
+def traced(func):
+    """
+    Open a span named after the method (with the client's tenant) when the client has a tracer
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        tracer = self.tracer
+        if tracer is None:
+            return func(self, *args, **kwargs)
+
+        with tracer.span(func.__name__, tenant=self.tenant):
+            return func(self, *args, **kwargs)
+
+    return wrapper
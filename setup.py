@@ -19,7 +19,11 @@ setup(name='py-cgrates',
           'Programming Language :: Python :: 3'
       ],
       packages=find_packages(exclude=["tests"]),
+      entry_points={
+        'console_scripts': ['cgrates-bench=cgrates.bench.cli:main'],
+      },
       install_requires=[
+        'requests',
         'schematics==2.1.0',
         'rfc3339==6.0'
       ]
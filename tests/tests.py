@@ -3,11 +3,32 @@ import json
 import pprint
 import logging
 import uuid
-from datetime import datetime
-from unittest import TestCase
+import os
+import sys
+import subprocess
+import tempfile
+import threading
+import io
+import asyncio
+import random
+import unittest
+import importlib.util
+from datetime import datetime, time as dt_time, timezone, timedelta
+from unittest import TestCase, mock
 from cgrates import Client
 from cgrates import models
 from cgrates import TPNotFoundException
+from cgrates.accounts import AccountSync, BalanceTable, ReservationLedger, estimate_cost, ADDED, CHANGED, REMOVED
+from cgrates.client import AccountRecord, ClientV2
+from cgrates.bench import TrafficRecorder, Replayer, FakeEngine, ENGINE_HANDLERS, read_capture
+from cgrates.bench.cli import main as bench_main
+from cgrates.bench.workloads import Workload, BalanceChurnWorkload
+from cgrates.tracing import Tracer, InMemoryExporter
+from cgrates.cdrs import CDRBatch, CDRExporter, RotatingWriter, NDJSONWriter, ParquetWriter, CDRDeduplicator, BloomFilter, ScalableBloomFilter
+from cgrates.client import SingleFlight, AsyncSingleFlight, SharedCache, Compression
+from cgrates.client.scheduler import Scheduler, TokenBucket, INTERACTIVE, BULK
+from cgrates.client.limiter import AdaptiveLimiter
+from cgrates.tariff import TariffPlan, Reconciler, TariffPlanError, TimingResolver, PriceMatrix, Quote, SnapshotRefresher, DestinationUploader, minimize_prefixes, minimize_destinations, dump_snapshot, load_snapshot, validate_plan
 
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
@@ -68,6 +89,1370 @@ class TPManagementHelpers(BaseTests):
         return self.client.add_timing(timing_id=timing_id)
 
 
+class ClientTests(BaseTests):
+    """
+    Client Tests
+    """
+
+    def test_with_tenant(self):
+
+        client = Client(tenant="test")
+
+        view = client.with_tenant("other")
+
+        self.assertEqual(view.tenant, "other")
+        self.assertEqual(client.tenant, "test")
+        self.assertIs(view.transport, client.transport)
+
+    def test_singleflight(self):
+
+        singleflight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(1)
+            return "OK"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(singleflight.do("key", work))) for _ in range(5)]
+
+        for t in threads:
+            t.start()
+
+        while singleflight.coalesced + singleflight.leaders < 5:
+            time.sleep(0.001)
+
+        release.set()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertListEqual(results, [("OK", True)] * 5)
+        self.assertDictEqual(singleflight.stats(), {'leaders': 1, 'coalesced': 4, 'in_flight': 0})
+
+    def test_async_singleflight_leader_cancelled(self):
+
+        async def run():
+            singleflight = AsyncSingleFlight()
+            release = asyncio.Event()
+            calls = []
+
+            async def work():
+                calls.append(1)
+                await release.wait()
+                return "OK"
+
+            leader = asyncio.ensure_future(singleflight.do("key", work))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(singleflight.do("key", work))
+            await asyncio.sleep(0)
+
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+
+            self.assertEqual(await follower, ("OK", True))
+            self.assertTrue(leader.cancelled())
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(singleflight.stats()['in_flight'], 0)
+
+        asyncio.run(run())
+
+
+class ImportTests(BaseTests):
+    """
+    Import Time Tests
+    """
+
+    # Budget for `import cgrates` in microseconds (cumulative, as reported by python -X importtime)
+    IMPORT_BUDGET_US = 20000
+
+    def run_python(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=root,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    def test_import_is_lazy(self):
+
+        result = self.run_python("import sys, cgrates; print([m for m in ('requests', 'schematics', 'rfc3339') if m in sys.modules])")
+
+        self.assertEqual(result.stdout.strip(), "[]")
+
+        cumulative = [int(line.split("|")[1]) for line in result.stderr.splitlines() if line.rstrip().endswith("| cgrates")]
+
+        self.assertLess(cumulative[0], self.IMPORT_BUDGET_US)
+
+    def test_transport_is_lazy(self):
+
+        result = self.run_python("import sys; from cgrates import Client; Client(tenant='test'); print('requests' in sys.modules)")
+
+        self.assertEqual(result.stdout.strip(), "False")
+
+
+class TransportCompressionTests(BaseTests):
+    """
+    Transport Compression Tests
+    """
+
+    # Repetitive like real GetTP* responses, so it compresses well
+    PREFIXES = ["64{}".format(i) for i in range(2000)]
+
+    def get_engine(self, response_encoding=None):
+        return FakeEngine(handlers={"ApierV1.GetDestination": lambda params: {"Id": params[0], "Prefixes": self.PREFIXES}},
+                          response_encoding=response_encoding)
+
+    def test_compressed_responses(self):
+
+        for encoding in ("gzip", "deflate"):
+            with self.get_engine(response_encoding=encoding) as engine:
+                api = Client(tenant="test", host=engine.host, port=engine.port)
+
+                self.assertEqual(api.get_destination("DST_64").prefixes, self.PREFIXES)
+
+                stats = api.transport.stats.to_dict()
+
+            self.assertEqual(stats['calls'], 1)
+            self.assertGreater(stats['response_ratio'], 2)
+            self.assertEqual(stats['response_bytes'], len(json.dumps({"id": None, "result": {"Id": "DST_64", "Prefixes": self.PREFIXES}, "error": None})))
+            self.assertGreater(stats['compression_cpu'], 0)
+
+    def test_identity_responses(self):
+
+        with self.get_engine(response_encoding="gzip") as engine:
+            api = Client(tenant="test", host=engine.host, port=engine.port, compression=Compression(accept_compressed=False))
+            api.get_destination("DST_64")
+
+        self.assertEqual(api.transport.stats.to_dict()['response_ratio'], 1.0)
+
+    def test_compressed_requests(self):
+
+        with self.get_engine() as engine:
+            api = Client(tenant="test", host=engine.host, port=engine.port, compression=Compression(request_threshold=1000))
+
+            api.set_destination("DST_64", self.PREFIXES)
+            api.get_destination("DST_64")
+
+            # Only the large SetTPDestination body is compressed (Content-Encoding: gzip)
+            self.assertEqual(engine.compressed_requests, 1)
+
+        stats = api.transport.stats.to_dict()
+
+        self.assertEqual(stats['calls'], 3)
+        self.assertGreater(stats['request_ratio'], 2)
+        self.assertLess(stats['request_wire_bytes'], stats['request_bytes'])
+
+
+class TariffSnapshotTests(BaseTests):
+    """
+    Tariff Plan Snapshot Tests
+    """
+
+    def test_snapshot(self):
+
+        plan = TariffPlan(tenant="test", destinations={
+            "DST_64": models.Destination({"Id": "DST_64", "Prefixes": ["64"]}),
+            "DST_6421": models.Destination({"Id": "DST_6421", "Prefixes": ["6421", "6422"]}),
+        })
+
+        path = os.path.join(tempfile.mkdtemp(), "plan.snapshot")
+
+        stamp = dump_snapshot(plan, path, version="1")
+
+        snapshot = load_snapshot(path)
+
+        self.assertEqual(snapshot.stamp, stamp)
+        self.assertEqual(snapshot.version, "1")
+        self.assertEqual(snapshot.lookup("6421555"), ("6421", "DST_6421"))
+        self.assertEqual(snapshot.lookup("6499"), ("64", "DST_64"))
+        self.assertIsNone(snapshot.lookup("61"))
+        self.assertFalse(snapshot.is_stale(plan=plan))
+
+        plan.destinations["DST_64"].prefixes.append("640")
+
+        self.assertTrue(snapshot.is_stale(plan=plan))
+        self.assertDictEqual(snapshot.plan.destinations["DST_6421"].to_dict(), {"Id": "DST_6421", "Prefixes": ["6421", "6422"]})
+
+    def test_refresher_unmaps_swapped_snapshot(self):
+
+        plans = [TariffPlan(tenant="test", destinations={"DST_64": models.Destination({"Id": "DST_64", "Prefixes": prefixes})})
+                 for prefixes in (["64"], ["64", "640"])]
+
+        class PlanClient:
+            def get_tariff_plan(self):
+                return plans.pop(0)
+
+        refresher = SnapshotRefresher(PlanClient(), os.path.join(tempfile.mkdtemp(), "plan.snapshot"))
+
+        self.assertTrue(refresher.refresh())
+        first = refresher.snapshot
+        mapped = first._mm
+
+        # Still referenced by a reader, stays mapped
+        self.assertTrue(refresher.refresh())
+        self.assertFalse(mapped.closed)
+
+        del first
+        self.assertTrue(mapped.closed)
+
+        refresher.close()
+
+
+class ReconcileTests(BaseTests):
+    """
+    Tariff Plan Reconcile Tests
+    """
+
+    def get_plan(self):
+        return TariffPlan(
+            tenant="test",
+            destinations={"DST_64": models.Destination({"Id": "DST_64", "Prefixes": ["64", "65"]})},
+            rates={"RT_STANDARD": [models.Rate({"rate": 0.1, "rate_unit": 60, "rate_increment": 60})]},
+        )
+
+    def test_diff(self):
+
+        current = self.get_plan()
+        current.destinations["DST_64"].prefixes = ["65", "64"]
+
+        desired = self.get_plan()
+        desired.rates["RT_STANDARD"][0].rate = 0.2
+        desired.destinations["DST_1"] = models.Destination({"Id": "DST_1", "Prefixes": ["1"]})
+
+        report = Reconciler(client=None).diff(desired, current)
+
+        self.assertDictEqual(
+            {'created': {'destinations': ['DST_1']},
+             'updated': {'rates': ['RT_STANDARD']},
+             'unchanged': {'timings': 0, 'destinations': 1, 'rates': 0, 'destination_rates': 0, 'rating_plans': 0},
+             'errors': {},
+             'applied': False},
+            report.to_dict()
+        )
+
+
+    def test_engine_defaults_are_not_changes(self):
+
+        current = TariffPlan(destination_rates={"DR_1": [models.DestinationRate({"RateId": "RT_1", "DestinationId": "DST_64", "MaxCost": 0.0, "MaxCostStrategy": ""})]},
+                             rates={"RT_1": [models.Rate({"ConnectFee": 0, "Rate": 1.0, "RateUnit": "60s", "RateIncrement": "60s", "GroupIntervalStart": "0s"})]})
+        desired = TariffPlan(destination_rates={"DR_1": [models.DestinationRate({"rate_id": "RT_1", "dest_id": "DST_64"})]},
+                             rates={"RT_1": [models.Rate({"rate": 1, "rate_unit": 60, "rate_increment": 60})]})
+
+        report = Reconciler(client=None).diff(desired, current)
+
+        self.assertEqual((report.changes, report.unchanged['destination_rates'], report.unchanged['rates']), (0, 1, 1))
+
+    def test_reconcile_reads_desired_objects_only(self):
+
+        calls = []
+
+        def handler(method, result):
+            def handle(params):
+                calls.append((method, params[0] if isinstance(params[0], str) else params[0].get('ID') or params[0].get('id')))
+                return result(params) if callable(result) else result
+            return handle
+
+        handlers = {m: handler(m, []) for m in ("ApierV1.GetTPTimingIds", "ApierV1.GetTPRateIds", "ApierV1.GetTPDestinationRateIds", "ApierV1.GetTPRatingPlanIds")}
+        handlers.update({
+            "ApierV1.GetTPDestinationIDs": handler("ApierV1.GetTPDestinationIDs", ["DST_64", "DST_OTHER"]),
+            "ApierV1.GetDestination": handler("ApierV1.GetDestination", lambda params: {"Id": params[0], "Prefixes": ["64"]}),
+            "ApierV1.SetTPDestination": handler("ApierV1.SetTPDestination", "OK"),
+            "ApierV1.LoadDestination": handler("ApierV1.LoadDestination", "OK"),
+            "ApierV1.ReloadCache": handler("ApierV1.ReloadCache", "OK"),
+        })
+
+        desired = TariffPlan(tenant="test", destinations={
+            "DST_64": models.Destination({"Id": "DST_64", "Prefixes": ["64"]}),
+            "DST_1": models.Destination({"Id": "DST_1", "Prefixes": ["1"]}),
+        })
+
+        with FakeEngine(handlers=handlers) as engine:
+            report = Reconciler(Client(tenant="test", host=engine.host, port=engine.port)).reconcile(desired)
+
+        self.assertEqual((report.created['destinations'], report.unchanged['destinations'], report.applied), (["DST_1"], 1, True))
+        self.assertEqual([c for c in calls if not c[0].endswith(("Ids", "IDs"))],
+                         [("ApierV1.GetDestination", "DST_64"), ("ApierV1.SetTPDestination", "DST_1"), ("ApierV1.LoadDestination", "DST_1"), ("ApierV1.ReloadCache", None)])
+
+
+class TariffPlanValidatorTests(BaseTests):
+    """
+    Tariff Plan Validator Tests
+    """
+
+    def test_validate(self):
+
+        plan = TariffPlan(
+            tenant="test",
+            timings={"ALWAYS": models.Timing({"timing_id": "ALWAYS"})},
+            destinations={
+                "DST_64": models.Destination({"Id": "DST_64", "Prefixes": ["64"]}),
+                "DST_6421": models.Destination({"Id": "DST_6421", "Prefixes": ["6421", "64"]}),
+            },
+            rates={"RT_1": [models.Rate({"rate": 0.1, "rate_unit": 60, "rate_increment": 60})]},
+            destination_rates={"DR_1": [models.DestinationRate({"rate_id": "RT_1", "dest_id": "DST_MISSING"})]},
+            rating_plans={"rpl_1": [models.RatingPlan({"dest_rate_id": "DR_1", "timing_id": "ALWAYS"})]},
+        )
+
+        report = validate_plan(plan)
+
+        self.assertListEqual(
+            [(i.kind, i.object_id) for i in report.errors],
+            [('rating_plans', 'rpl_1'), ('destination_rates', 'DR_1')]
+        )
+
+        self.assertListEqual(
+            [i.message for i in report.warnings],
+            ['Prefix 64 of DST_6421 is also in DST_64',
+             'Prefix 6421 of DST_6421 overlaps 64 of DST_64',
+             'DST_64 is not referenced',
+             'DST_6421 is not referenced']
+        )
+
+        with self.assertRaises(TariffPlanError):
+            report.raise_for_errors()
+
+    def test_rating_profiles(self):
+
+        plan = TariffPlan(
+            tenant="test",
+            rating_plans={"RPL_1": [models.RatingPlan({"dest_rate_id": "DR_1", "timing_id": "*any"})],
+                          "RPL_2": [models.RatingPlan({"dest_rate_id": "DR_1", "timing_id": "*any"})]},
+            rating_profiles={"RPF_1": [models.RatingPlanActivation({"rating_plan_id": "RPL_1"})],
+                             "rpf_2": [models.RatingPlanActivation({"rating_plan_id": "RPL_MISSING"})]},
+        )
+
+        report = validate_plan(plan, known_ids={'destination_rates': ["DR_1"]})
+
+        self.assertListEqual(
+            [i.message for i in report.errors],
+            ['rpf_2 must begin with prefix RPF_', 'Rating Plan RPL_MISSING Not found. Referenced by rating profile rpf_2']
+        )
+        self.assertListEqual([i.message for i in report.warnings], ['RPL_2 is not referenced'])
+
+    def test_add_checks_references(self):
+
+        methods = []
+        ids = {"ApierV1.GetTPRateIds": ["RT_1"], "ApierV1.GetTPDestinationIDs": ["DST_1"],
+               "ApierV1.GetTPDestinationRateIds": ["DR_1"], "ApierV1.GetTPTimingIds": []}
+
+        def handler(method):
+            def handle(params):
+                methods.append(method)
+                if method == "ApierV1.GetTPRatingPlan":
+                    return {"RatingPlanBindings": [{"DestinationRatesId": "DR_1", "TimingId": "*any", "Weight": 10}]}
+                return ids.get(method, "OK")
+            return handle
+
+        all_methods = list(ids) + ["ApierV1.SetTPDestinationRate", "ApierV1.SetTPRatingPlan", "ApierV1.LoadRatingPlan", "ApierV1.GetTPRatingPlan"]
+
+        with FakeEngine(handlers={m: handler(m) for m in all_methods}) as engine:
+            api = Client(tenant="test", host=engine.host, port=engine.port)
+
+            with self.assertRaises(TPNotFoundException) as raised:
+                api.add_destination_rates("DR_2", [models.DestinationRate({"rate_id": "RT_1", "dest_id": "DST_1"}),
+                                                   models.DestinationRate({"rate_id": "RT_1", "dest_id": "DST_2"})])
+
+            self.assertEqual(str(raised.exception), "Destination DST_2 Not found. Referenced by destination rate DR_2")
+            # One listing per kind, no per row reads
+            self.assertEqual(methods, ["ApierV1.GetTPRateIds", "ApierV1.GetTPDestinationIDs"])
+
+            with self.assertRaises(TPNotFoundException):
+                api.add_rating_plans("RPL_1", [models.RatingPlan({"dest_rate_id": "DR_1", "timing_id": "TM_PEAK"})])
+
+            del methods[:]
+            rating_plans = api.add_rating_plans("RPL_1", [models.RatingPlan({"dest_rate_id": "DR_1", "timing_id": "*any"})])
+
+        self.assertEqual(rating_plans[0].dest_rate_id, "DR_1")
+        self.assertEqual(methods, ["ApierV1.GetTPDestinationRateIds", "ApierV1.GetTPTimingIds", "ApierV1.SetTPRatingPlan",
+                                   "ApierV1.LoadRatingPlan", "ApierV1.GetTPRatingPlan"])
+
+
+class TimingResolverTests(BaseTests):
+    """
+    Compiled Timing Tests
+    """
+
+    def setUp(self):
+        timings = {
+            "OFFPEAK": models.Timing({"timing_id": "OFFPEAK", "week_days": [1, 2, 3, 4, 5]}),
+            "PEAK": models.Timing({"timing_id": "PEAK", "week_days": [1, 2, 3, 4, 5], "time": dt_time(8, 0)}),
+            "EVENING": models.Timing({"timing_id": "EVENING", "week_days": [1, 2, 3, 4, 5], "time": "19:00:00"}),
+            "WEEKEND": models.Timing({"timing_id": "WEEKEND", "week_days": [6, 7]}),
+        }
+
+        rating_plans = [models.RatingPlan({"dest_rate_id": "DR_{}".format(k), "timing_id": k}) for k in timings]
+
+        self.resolver = TimingResolver.from_rating_plan(rating_plans, timings)
+
+    def test_resolve(self):
+
+        # Friday
+        self.assertEqual(self.resolver.resolve(datetime(2024, 1, 5, 7, 59, 59)).dest_rate_id, "DR_OFFPEAK")
+        self.assertEqual(self.resolver.resolve(datetime(2024, 1, 5, 8, 0)).dest_rate_id, "DR_PEAK")
+        self.assertEqual(self.resolver.resolve(datetime(2024, 1, 5, 19, 0)).dest_rate_id, "DR_EVENING")
+        # Sunday
+        self.assertEqual(self.resolver.resolve(datetime(2024, 1, 7, 12, 0)).dest_rate_id, "DR_WEEKEND")
+
+    def test_segments(self):
+
+        segments = self.resolver.segments(datetime(2024, 1, 5, 18, 30), usage=6 * 3600)
+
+        self.assertListEqual(
+            [(s.start, s.end, s.binding.dest_rate_id) for s in segments],
+            [(datetime(2024, 1, 5, 18, 30), datetime(2024, 1, 5, 19, 0), "DR_PEAK"),
+             (datetime(2024, 1, 5, 19, 0), datetime(2024, 1, 6, 0, 0), "DR_EVENING"),
+             (datetime(2024, 1, 6, 0, 0), datetime(2024, 1, 6, 0, 30), "DR_WEEKEND")]
+        )
+
+
+class PriceMatrixTests(BaseTests):
+    """
+    Price Matrix Tests
+    """
+
+    def get_rates(self, rate, connect_fee=0):
+        return [models.Rate({"rate": rate, "rate_unit": 60, "rate_increment": 60, "connect_fee": connect_fee})]
+
+    def test_lookup(self):
+
+        plan = TariffPlan(
+            timings={
+                "PEAK": models.Timing({"timing_id": "PEAK", "week_days": [1, 2, 3, 4, 5], "time": "08:00:00"}),
+                "OFFPEAK": models.Timing({"timing_id": "OFFPEAK"}),
+            },
+            destinations={"DST_64": models.Destination({"Id": "DST_64", "Prefixes": ["64"]})},
+            rates={"RT_PEAK": self.get_rates(0.5, connect_fee=0.1), "RT_OFFPEAK": self.get_rates(0.2)},
+            destination_rates={
+                "DR_PEAK": [models.DestinationRate({"rate_id": "RT_PEAK", "dest_id": "DST_64"})],
+                "DR_OFFPEAK": [models.DestinationRate({"rate_id": "RT_OFFPEAK", "dest_id": "DST_64"})],
+            },
+            rating_plans={"RPL_1": [
+                models.RatingPlan({"dest_rate_id": "DR_PEAK", "timing_id": "PEAK"}),
+                models.RatingPlan({"dest_rate_id": "DR_OFFPEAK", "timing_id": "OFFPEAK"}),
+            ]},
+        )
+
+        matrix = PriceMatrix(plan, "RPL_1")
+
+        quote = matrix.lookup("6421555", datetime(2024, 1, 5, 9, 0))
+
+        self.assertEqual((quote.destination_id, quote.timing_id, quote.first_increment_price, quote.connect_fee, quote.increment), ("DST_64", "PEAK", 0.5, 0.1, 60))
+        self.assertEqual(matrix.lookup("6421555", datetime(2024, 1, 5, 7, 0)).first_increment_price, 0.2)
+        self.assertIsNone(matrix.lookup("61", datetime(2024, 1, 5, 9, 0)))
+
+        self.assertEqual(matrix.update_rate("RT_PEAK", self.get_rates(0.6)), 1)
+        self.assertEqual(matrix.lookup("6421555", datetime(2024, 1, 5, 9, 0)).first_increment_price, 0.6)
+
+    def test_band_per_destination(self):
+
+        plan = TariffPlan(
+            timings={"PEAK": models.Timing({"timing_id": "PEAK", "week_days": [1, 2, 3, 4, 5], "time": "08:00:00"})},
+            destinations={
+                "DST_AU": models.Destination({"Id": "DST_AU", "Prefixes": ["61"]}),
+                "DST_NZ": models.Destination({"Id": "DST_NZ", "Prefixes": ["64"]}),
+                "DST_NZM": models.Destination({"Id": "DST_NZM", "Prefixes": ["6421"]}),
+            },
+            rates={"RT_AU": self.get_rates(0.3), "RT_NZ": self.get_rates(0.5)},
+            destination_rates={
+                "DR_AU": [models.DestinationRate({"rate_id": "RT_AU", "dest_id": "DST_AU"})],
+                "DR_NZ": [models.DestinationRate({"rate_id": "RT_NZ", "dest_id": "DST_NZ"})],
+            },
+            rating_plans={"RPL_1": [
+                models.RatingPlan({"dest_rate_id": "DR_AU", "timing_id": "*any"}),
+                models.RatingPlan({"dest_rate_id": "DR_NZ", "timing_id": "PEAK"}),
+            ]},
+        )
+
+        matrix = PriceMatrix(plan, "RPL_1")
+
+        # PEAK wins the plan's timing at 09:00 on a Friday but does not rate DST_AU
+        self.assertEqual(matrix.lookup("61299", datetime(2024, 1, 5, 9, 0)).first_increment_price, 0.3)
+
+        # DST_NZM is not rated by the plan, the rated shorter prefix matches
+        self.assertEqual(matrix.lookup("6421555", datetime(2024, 1, 5, 9, 0)).destination_id, "DST_NZ")
+        self.assertIsNone(matrix.lookup("6421555", datetime(2024, 1, 5, 7, 0)))
+
+
+class CaptureReplayTests(BaseTests):
+    """
+    Traffic Capture/Replay Tests
+    """
+
+    def test_capture_replay(self):
+
+        with tempfile.TemporaryDirectory() as tmp, FakeEngine(handlers={"ApierV1.GetCost": lambda params: {"Cost": 1}}) as engine:
+            path = os.path.join(tmp, "capture.ndjson.gz")
+
+            recorder = TrafficRecorder(path, max_bytes=1024, backups=5)
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, recorder=recorder)
+
+            for i in range(20):
+                api.call_api("ApierV1.GetCost", [{"Tenant": "cgrates.org", "Subject": str(i)}])
+            recorder.close()
+
+            self.assertTrue(os.path.exists(path + ".1"))
+
+            records = read_capture(*[os.path.join(tmp, name) for name in os.listdir(tmp)])
+
+            self.assertEqual(len(records), 20)
+
+            self.assertEqual(records[0]['m'], "ApierV1.GetCost")
+            self.assertGreater(records[0]['rs'], 0)
+
+            stats = Replayer(Client(tenant="cgrates.org", host=engine.host, port=engine.port), speed=None).replay(records)
+
+            self.assertEqual((stats.count, stats.errors), (len(records), 0))
+            self.assertEqual(engine.calls, 40)
+
+
+class BenchTests(BaseTests):
+    """
+    Load Generator Tests
+    """
+
+    def test_bench_cli(self):
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+
+            bench_main(["mix", "--fake", "--duration", "0.5", "--warmup", "0.1", "--concurrency", "2", "--seed", "1", "--output", path])
+
+            with open(path) as f:
+                report = json.load(f)
+
+        self.assertEqual(report['model'], "closed")
+        self.assertGreater(report['total']['count'], 0)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(sum(count for _, count in report['total']['histogram']), report['total']['count'])
+        self.assertIn("get_cost", report['operations'])
+
+    def test_balance_churn_workload(self):
+
+        methods = []
+
+        def handler(method):
+            return lambda params: methods.append(method) or "OK"
+
+        with self.assertRaises(TypeError):
+            Workload()
+
+        with FakeEngine(handlers={m: handler(m) for m in ("ApierV1.AddBalance", "ApierV2.GetAccount")}) as engine:
+            api = Client(tenant="test", host=engine.host, port=engine.port)
+
+            workload = BalanceChurnWorkload(accounts=["1001"], read_ratio=0)
+            self.assertEqual(workload(api, random.Random(1)), "add_balance")
+
+        # No read back of the account on writes
+        self.assertEqual(methods, ["ApierV1.AddBalance"])
+
+    def test_fake_engine_round_trip(self):
+
+        with FakeEngine(latency=0) as engine:
+            api = Client(tenant="test", host=engine.host, port=engine.port)
+
+            timings = []
+            for _ in range(20):
+                started = time.perf_counter()
+                api.call_api("ApierV1.GetCost", [{}])
+                timings.append(time.perf_counter() - started)
+
+        # Kept alive connection without delayed ACK stalls
+        self.assertLess(sorted(timings)[len(timings) // 2], 0.01)
+
+
+class TracingTests(BaseTests):
+    """
+    Tracing Tests
+    """
+
+    def test_nested_spans(self):
+
+        handlers = {"ApierV1.GetDestination": lambda params: {"Id": params[0], "Prefixes": ["64"]}}
+
+        with FakeEngine(handlers=handlers) as engine:
+            exporter = InMemoryExporter()
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, tracer=Tracer(exporter))
+
+            api.add_destination("DST_TRACE", ["64"])
+
+        root, = exporter.find("add_destination")
+
+        self.assertIsNone(root.parent_id)
+        self.assertEqual([s.name for s in exporter.children(root)], ["set_destination", "get_destination"])
+
+        calls = exporter.find("call_api")
+
+        self.assertEqual([s.attributes['method'] for s in calls], ["ApierV1.SetTPDestination", "ApierV1.LoadDestination", "ApierV1.GetDestination"])
+        self.assertTrue(all(s.trace_id == root.trace_id for s in exporter.spans))
+        self.assertEqual([s.name for s in exporter.children(calls[0])], ["serialize", "request", "deserialize"])
+        self.assertGreater(exporter.children(calls[0])[0].attributes['payload_size'], 0)
+
+    def test_bulk_spans(self):
+
+        methods = ("ApierV1.GetTPTimingIds", "ApierV1.GetTPDestinationIDs", "ApierV1.GetTPRateIds", "ApierV1.GetTPDestinationRateIds", "ApierV1.GetTPRatingPlanIds")
+
+        with FakeEngine(handlers={m: lambda params: [] for m in methods}) as engine:
+            exporter = InMemoryExporter()
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, tracer=Tracer(exporter))
+
+            api.get_tariff_plan(ids=api.get_tariff_plan_ids())
+
+        # One span per public method, none for the helpers
+        self.assertEqual(len(exporter.find("get_tariff_plan_ids")), 1)
+        self.assertEqual(len(exporter.find("get_tariff_plan")), 1)
+        self.assertEqual(exporter.find("_tariff_plan_fetchers"), [])
+
+
+class SchedulerTests(BaseTests):
+    """
+    Scheduler Tests
+    """
+
+    def test_token_bucket(self):
+
+        bucket = TokenBucket(rate=100, burst=2)
+
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertGreater(bucket.acquire(), 0)
+
+    def test_priority(self):
+
+        scheduler = Scheduler(max_in_flight=1)
+        order = []
+
+        def call(method, priority=None):
+            if priority is None:
+                with scheduler.slot(method):
+                    order.append(method)
+            else:
+                with scheduler.priority(priority), scheduler.slot(method):
+                    order.append(method)
+
+        with scheduler.slot("ApierV1.GetTPRate"):
+            threads = [threading.Thread(target=call, args=("ApierV1.SetTPRate", BULK))]
+            threads[0].start()
+
+            while scheduler.stats()['bulk']['queued'] < 1:
+                time.sleep(0.001)
+
+            threads.append(threading.Thread(target=call, args=("ApierV1.GetCost",)))
+            threads[1].start()
+
+            while scheduler.stats()['interactive']['queued'] < 1:
+                time.sleep(0.001)
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["ApierV1.GetCost", "ApierV1.SetTPRate"])
+
+        stats = scheduler.stats()
+        self.assertEqual((stats['bulk']['max_queued'], stats['interactive']['waited'], stats['in_flight']), (1, 1, 0))
+
+    def test_reserved(self):
+
+        scheduler = Scheduler(max_in_flight=2, reserved=1)
+
+        with scheduler.priority(BULK), scheduler.slot("ApierV1.SetTPRate"):
+            self.assertEqual(scheduler.in_flight, 1)
+
+            with scheduler.priority(INTERACTIVE), scheduler.slot("ApierV1.GetCost"):
+                self.assertEqual(scheduler.in_flight, 2)
+
+
+class AdaptiveLimiterTests(BaseTests):
+    """
+    Adaptive Concurrency Tests
+    """
+
+    def feed(self, limiter, latency, windows, ok=True):
+        for _ in range(limiter.window * windows):
+            limiter.acquire()
+            limiter.release(latency, ok)
+
+    def test_aimd(self):
+
+        limiter = AdaptiveLimiter(initial=4, max_limit=10, window=10)
+
+        self.feed(limiter, 0.01, windows=4)
+        self.assertEqual(limiter.limit, 8)
+
+        # Queueing: latency well above the baseline
+        self.feed(limiter, 0.05, windows=1)
+        self.assertEqual(limiter.limit, 5)
+
+        self.feed(limiter, 0.01, windows=20)
+        self.assertEqual(limiter.limit, 10)
+
+        self.feed(limiter, 0.01, windows=1, ok=False)
+        self.assertEqual(limiter.limit, 7)
+
+        self.assertEqual([c.limit for c in limiter.history][:5], [5, 6, 7, 8, 5])
+
+    def test_fan_out(self):
+
+        with FakeEngine() as engine:
+            limiter = AdaptiveLimiter(initial=2, max_limit=4, window=5)
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, limiter=limiter)
+
+            result = api.fan_out(lambda i: api.call_api("ApierV1.SetTPRate", [{}]), range(40))
+
+        self.assertTrue(result.ok)
+        self.assertEqual(len(limiter.history), 8)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_fan_out_item_errors(self):
+
+        def get_destination(params):
+            raise Exception("SERVER_ERROR")
+
+        with FakeEngine(handlers={"ApierV1.GetDestination": get_destination}) as engine:
+            limiter = AdaptiveLimiter(initial=4, max_limit=4, window=5, tolerance=100)
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, limiter=limiter)
+
+            result = api.fan_out(lambda i: api.get_destination("DST_{}".format(i)), range(20))
+
+            self.assertEqual(len(result.errors), 20)
+            self.assertEqual(limiter.limit, 4)
+            self.assertEqual([c.error_rate for c in limiter.history], [0.0] * 4)
+
+        # Engine gone: transport errors back off
+        result = api.fan_out(lambda i: api.get_destination("DST_{}".format(i)), range(5))
+
+        self.assertEqual(len(result.errors), 5)
+        self.assertEqual(limiter.history[-1].error_rate, 1.0)
+        self.assertLess(limiter.limit, 4)
+
+
+class CDRBatchTests(BaseTests):
+    """
+    CDR Batch Tests
+    """
+
+    def get_cdr(self, answer_time):
+        cdr = models.VoiceCDR()
+        cdr.origin_id = "ORIGIN_1"
+        cdr.account = "1001"
+        cdr.destination = "6421555"
+        cdr.answer_time = answer_time
+        cdr.usage = "30s"
+        return cdr
+
+    def test_payloads(self):
+
+        for answer_time in [datetime(2024, 2, 29, 23, 59, 59), datetime(2024, 2, 29, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5)))]:
+            cdr = self.get_cdr(answer_time)
+
+            batch = CDRBatch(tz=answer_time.tzinfo, type_of_record="*voice")
+            batch.append(origin_id="ORIGIN_1", account="1001", destination="6421555", answer_time=answer_time, usage=30)
+
+            self.assertDictEqual(batch.payloads()[0], {k: v for k, v in cdr.to_dict().items() if v is not None})
+
+    def test_from_csv(self):
+
+        f = io.StringIO("OriginID,Account,Destination,AnswerTime,Usage\nO1,1001,6421555,2024-01-01 10:00:00,30s\nO2,1002,6121555,,0s\n")
+
+        batch = CDRBatch.from_csv(f, type_of_record="*voice")
+
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.payloads(1)[0], {"ToR": "*voice", "OriginID": "O2", "Account": "1002", "Destination": "6121555", "AnswerTime": None, "Usage": "0s"})
+        self.assertEqual(batch.payloads()[0]['AnswerTime'], "2024-01-01T10:00:00")
+
+    def test_process_cdrs(self):
+
+        received = []
+
+        def process(params):
+            received.append(params[0])
+            if params[0]['OriginID'] == "O3":
+                raise Exception("SERVER_ERROR")
+            return "OK"
+
+        batch = CDRBatch.from_columns({"origin_id": ["O{}".format(i) for i in range(5)], "usage": [10] * 5}, type_of_record="*voice")
+
+        with FakeEngine(handlers={"CdrsV1.ProcessExternalCDR": process}) as engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port)
+            result = api.process_cdrs(batch, chunk_size=2)
+
+        self.assertEqual(list(result.errors), [3])
+        self.assertEqual(sorted(r['OriginID'] for r in received), ["O0", "O1", "O2", "O3", "O4"])
+        self.assertEqual(received[0]['Tenant'], "cgrates.org")
+
+
+class AccountPagingTests(BaseTests):
+    """
+    Account Paging Tests
+    """
+
+    def get_engine(self, accounts):
+        calls = []
+
+        def get_accounts(params):
+            calls.append(params[0])
+            ids = params[0].get('AccountIds') or sorted(accounts)
+            offset = params[0].get('Offset', 0)
+            page = ids[offset:offset + params[0].get('Limit', len(ids))]
+            return [{"ID": "cgrates.org:{}".format(a), "BalanceMap": {"*monetary": [{"ID": "MAIN", "Value": accounts[a]}]}} for a in page if a in accounts]
+
+        return FakeEngine(handlers={"ApierV2.GetAccounts": get_accounts}), calls
+
+    def test_iter_accounts(self):
+
+        accounts = {"ACC_{}".format(i): float(i) for i in range(7)}
+        engine, calls = self.get_engine(accounts)
+
+        with engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port)
+
+            self.assertEqual([a.account for a in api.iter_accounts(page_size=3)], sorted(accounts))
+            self.assertEqual([(c.get('Offset', 0), c['Limit']) for c in calls], [(0, 3), (3, 3), (6, 3)])
+
+            records = list(api.iter_accounts(page_size=2, account_ids=["ACC_1", "ACC_5", "ACC_9"], records=True))
+
+            self.assertEqual([(r.account, r.balances[0].value) for r in records], [("ACC_1", 1.0), ("ACC_5", 5.0)])
+            self.assertEqual([c.get('AccountIds') for c in calls[3:]], [["ACC_1", "ACC_5"], ["ACC_9"]])
+
+    def test_account_sync(self):
+
+        accounts = {"ACC_1": 1.0, "ACC_2": 2.0}
+        engine, _ = self.get_engine(accounts)
+
+        with engine:
+            sync = AccountSync(Client(tenant="cgrates.org", host=engine.host, port=engine.port), page_size=1)
+
+            self.assertEqual([(c.kind, c.account_id) for c in sync.changes()], [(ADDED, "ACC_1"), (ADDED, "ACC_2")])
+
+            accounts["ACC_2"] = 3.0
+            del accounts["ACC_1"]
+
+            self.assertEqual([(c.kind, c.account_id) for c in sync.changes()], [(CHANGED, "ACC_2"), (REMOVED, "ACC_1")])
+
+    def test_account_digest_ignores_balance_order(self):
+
+        balances = [{"ID": "MAIN", "Value": 1.0}, {"ID": "PROMO", "Value": 2.0}]
+
+        first = ClientV2()._create_account_from_data({"ID": "ACC_1", "BalanceMap": {"*monetary": balances}})
+        second = ClientV2()._create_account_from_data({"ID": "ACC_1", "BalanceMap": {"*monetary": balances[::-1]}})
+
+        self.assertEqual(AccountSync.digest(first), AccountSync.digest(second))
+
+
+class CostResultTests(BaseTests):
+    """
+    Cost Result Tests
+    """
+
+    def test_get_cost_many(self):
+
+        with FakeEngine(handlers=ENGINE_HANDLERS) as engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port)
+
+            result = api.get_cost_many([{"subject": "1001", "destination": "6421555", "answer_time": datetime.now(), "usage": "{}s".format(u)} for u in (60, 120)])
+
+        self.assertTrue(result.ok)
+        self.assertEqual([(r.cost, r.usage) for r in result], [(0.6, "60s"), (1.2, "120s")])
+        self.assertIsNone(result[0]._charges)
+
+        self.assertEqual(result[0]['rates'], [[{'value': 0.6, 'group_interval_start': 0, 'rate_increment': '1s', 'rate_unit': '60s'}]])
+        self.assertEqual(sorted(result[0].to_dict()), ['charges', 'cost', 'rates', 'rating_filters', 'usage'])
+
+        # Dict compatible
+        cost = result[1]
+        self.assertIn('cost', cost)
+        self.assertNotIn('Cost', cost)
+        self.assertIsNone(cost._charges)
+        self.assertEqual(cost.get('usage'), "120s")
+        self.assertEqual(cost.get('missing', 0), 0)
+        self.assertEqual(dict(cost), cost.to_dict())
+
+
+class CDRExportTests(BaseTests):
+    """
+    CDR Export Tests
+    """
+
+    def get_engine(self, cdrs):
+
+        def get_cdrs(params):
+            start = params[0].get('OrderIDStart', 0)
+            # Storage order unless asked for
+            found = [c for c in reversed(cdrs) if c['OrderID'] >= start]
+            if params[0].get('OrderBy') == "OrderID":
+                found.sort(key=lambda c: c['OrderID'])
+            return found[:params[0]['Limit']]
+
+        return FakeEngine(handlers={"CdrsV1.GetCDRs": get_cdrs})
+
+    def get_cdrs(self, start, stop):
+        return [{"OrderID": i, "OriginID": "O{}".format(i), "Cost": 0.1, "CostDetails": {"Charges": []}} for i in range(start, stop)]
+
+    def test_ndjson_resume(self):
+
+        cdrs = self.get_cdrs(1, 26)
+
+        with tempfile.TemporaryDirectory() as tmp, self.get_engine(cdrs) as engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port)
+            checkpoint = os.path.join(tmp, "checkpoint.json")
+
+            exporter = CDRExporter(api, NDJSONWriter(tmp, max_bytes=500), page_size=10, checkpoint=checkpoint)
+
+            self.assertEqual(exporter.run(), 25)
+            self.assertEqual(exporter.last_order_id, 25)
+
+            cdrs.extend(self.get_cdrs(26, 31))
+
+            exporter = CDRExporter(api, NDJSONWriter(tmp, max_bytes=500), page_size=10, checkpoint=checkpoint)
+
+            self.assertEqual(exporter.run(), 5)
+
+            rows = []
+            for name in sorted(os.listdir(tmp)):
+                if name.endswith(".ndjson"):
+                    with open(os.path.join(tmp, name)) as f:
+                        rows.extend(json.loads(line) for line in f)
+
+        self.assertEqual([r['OrderID'] for r in rows], list(range(1, 31)))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow not installed")
+    def test_parquet(self):
+
+        import pyarrow.parquet
+
+        with tempfile.TemporaryDirectory() as tmp, self.get_engine(self.get_cdrs(1, 26)) as engine:
+            writer = ParquetWriter(tmp)
+            CDRExporter(Client(tenant="cgrates.org", host=engine.host, port=engine.port), writer, page_size=10).run()
+
+            table = pyarrow.parquet.read_table(writer.files[0])
+
+        self.assertEqual(table.column("OrderID").to_pylist(), list(range(1, 26)))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow not installed")
+    def test_parquet_null_columns(self):
+
+        import pyarrow.parquet
+
+        # Not rated yet in the first page: Cost and CostDetails are null throughout it
+        cdrs = [{"OrderID": i, "OriginID": "O{}".format(i), "Usage": 60, "Cost": None, "CostDetails": None} for i in range(1, 11)]
+        cdrs += self.get_cdrs(11, 21)
+
+        with tempfile.TemporaryDirectory() as tmp, self.get_engine(cdrs) as engine:
+            writer = ParquetWriter(tmp)
+            CDRExporter(Client(tenant="cgrates.org", host=engine.host, port=engine.port), writer, page_size=10).run()
+
+            table = pyarrow.parquet.read_table(writer.files[0])
+
+        self.assertEqual(str(table.schema.field("Cost").type), "double")
+        self.assertEqual(table.column("Cost").to_pylist(), [None] * 10 + [0.1] * 10)
+        self.assertEqual(table.column("Usage").to_pylist()[0], "60")
+        self.assertEqual(json.loads(table.column("CostDetails").to_pylist()[-1]), {"Charges": []})
+
+    def test_writer_is_abstract(self):
+
+        class Incomplete(RotatingWriter):
+
+            def _open(self, path):
+                pass
+
+            def _write(self, rows):
+                return 0
+
+        with self.assertRaises(TypeError):
+            Incomplete("/tmp")
+
+
+class CDRDedupTests(BaseTests):
+    """
+    CDR Dedup Tests
+    """
+
+    def test_bloom_filter(self):
+
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+
+        for i in range(10000):
+            bloom.add("ORIGIN_{}".format(i))
+
+        self.assertTrue(all("ORIGIN_{}".format(i) in bloom for i in range(10000)))
+        self.assertLess(sum("OTHER_{}".format(i) in bloom for i in range(10000)), 200)
+        self.assertLess(len(bloom.bits), 10000 * 1.3)
+
+    def test_scalable_bloom_filter(self):
+
+        bloom = ScalableBloomFilter(capacity=1000, error_rate=0.01)
+
+        for i in range(10000):
+            bloom.add("ORIGIN_{}".format(i))
+
+        # 1000 + 2000 + 4000 + 8000
+        self.assertEqual(len(bloom.stages), 4)
+        self.assertTrue(all("ORIGIN_{}".format(i) in bloom for i in range(10000)))
+        self.assertLessEqual(bloom.false_positive_rate, 0.01)
+        self.assertLess(sum("OTHER_{}".format(i) in bloom for i in range(10000)), 200)
+
+    def test_dedup(self):
+
+        dedup = CDRDeduplicator(capacity=100, exact_size=2)
+
+        for origin_id in ("O1", "O2", "O3"):
+            dedup.add(origin_id)
+
+        self.assertTrue(dedup.is_duplicate("O3"))
+        self.assertFalse(dedup.is_duplicate("O4"))
+        # Evicted from the exact set: a filter hit alone is sent on
+        self.assertFalse(dedup.is_duplicate("O1"))
+        self.assertEqual(dedup.stats()['unconfirmed'], 1)
+
+        dedup.trust_filter = True
+        self.assertTrue(dedup.is_duplicate("O1"))
+        self.assertEqual(dedup.stats()['probable'], 1)
+        self.assertEqual(dedup.stats()['duplicates'], 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dedup.bin")
+            dedup.save(path)
+            loaded = CDRDeduplicator.load(path)
+
+        self.assertTrue(loaded.trust_filter)
+        self.assertTrue(loaded.is_duplicate("O1"))
+        self.assertTrue(loaded.is_duplicate("O2"))
+        self.assertEqual(loaded.stats()['filters'], [3])
+
+    def test_dedup_window(self):
+
+        dedup = CDRDeduplicator(window=60, capacity=100, generations=2, exact_size=0, trust_filter=True)
+
+        for i in range(500):
+            dedup.add("O{}".format(i))
+
+        # Past capacity the filter grows rather than forgets
+        self.assertEqual(dedup.stats()['stages'], [3])
+        self.assertTrue(all(dedup.is_duplicate("O{}".format(i)) for i in range(500)))
+        self.assertLessEqual(dedup.stats()['false_positive_rate'], dedup.error_rate)
+
+        # Kept for the next window, forgotten after
+        for origin_id in ("N1", "N2"):
+            dedup.started -= 60
+            dedup.add(origin_id)
+
+            self.assertEqual(dedup.is_duplicate("O1"), origin_id == "N1")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dedup.bin")
+            dedup.save(path)
+            loaded = CDRDeduplicator.load(path)
+
+        self.assertEqual(loaded.stats()['filters'], [1, 1])
+        self.assertTrue(loaded.is_duplicate("N1"))
+
+    def test_process_cdrs(self):
+
+        received = []
+
+        def process(params):
+            received.append(params[0]['OriginID'])
+            return "OK"
+
+        with FakeEngine(handlers={"CdrsV1.ProcessExternalCDR": process}) as engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, dedup=CDRDeduplicator())
+
+            api.process_cdrs(CDRBatch.from_columns({"origin_id": ["O1", "O2"]}))
+            result = api.process_cdrs(CDRBatch.from_columns({"origin_id": ["O2", "O3"]}))
+
+        self.assertEqual(result.results, [False, True])
+        self.assertEqual(sorted(received), ["O1", "O2", "O3"])
+
+    def test_concurrent_submissions(self):
+
+        received = []
+        fail = []
+
+        def process(params):
+            received.append(params[0]['OriginID'])
+            time.sleep(0.2)
+            if fail:
+                raise Exception("SERVER_ERROR")
+            return "OK"
+
+        with FakeEngine(handlers={"CdrsV1.ProcessExternalCDR": process}) as engine:
+            api = Client(tenant="cgrates.org", host=engine.host, port=engine.port, dedup=CDRDeduplicator())
+
+            def submit(origin_id, results):
+                cdr = models.CDR()
+                cdr.origin_id = origin_id
+                try:
+                    results.append(api.process_cdr(cdr))
+                except Exception:
+                    results.append(None)
+
+            for failing in (False, True):
+                if failing:
+                    fail.append(True)
+
+                results = []
+                origin_id = "F1" if failing else "O1"
+                threads = [threading.Thread(target=submit, args=(origin_id, results)) for _ in range(2)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                # The second waits for the first: dropped once it was accepted, sent again if it failed
+                self.assertEqual(sorted(results, key=str), [None, None] if failing else [False, True])
+
+        self.assertEqual(received, ["O1", "F1", "F1"])
+
+
+class BalanceTableTests(BaseTests):
+    """
+    Balance Analytics Tests
+    """
+
+    def get_record(self, account_id, *balances):
+        return AccountRecord.from_data({"ID": account_id, "BalanceMap": {
+            "*monetary": [{"ID": b[0], "Value": b[1], "ExpirationDate": b[2], "DestinationIDs": b[3]} for b in balances],
+            "*voice": [{"ID": "MINUTES", "Value": 600, "ExpirationDate": "0001-01-01T00:00:00Z"}],
+        }})
+
+    def get_table(self):
+        return BalanceTable.from_accounts([
+            self.get_record("ACC_1", ("MAIN", 10.0, "0001-01-01T00:00:00Z", {}), ("PROMO", 5.0, "2024-01-10T00:00:00.123456789Z", {"DST_64": True})),
+            self.get_record("ACC_2", ("MAIN", 1.5, "2024-03-01T00:00:00Z", {})),
+        ])
+
+    def get_results(self, table):
+        return {
+            'monetary': table.filter(balance_type="*monetary").total(),
+            'expiring': table.expiring_within(30, now=datetime(2024, 1, 1, tzinfo=timezone.utc)).balance_id,
+            'below': table.accounts_below(10),
+            'exposure': table.exposure_by_destination(),
+            'voice': table.filter(balance_type="*voice").by_account(),
+            'take': [(table.accounts[a], v) for a, v in zip(table.take([3, 0]).account, table.take([3, 0]).value)],
+        }
+
+    def test_queries(self):
+
+        table = self.get_table()
+
+        self.assertEqual(len(table), 5)
+
+        # Pure Python path
+        with mock.patch("cgrates.accounts.balances._np", return_value=None):
+            results = self.get_results(table)
+
+        self.assertEqual(results, {
+            'monetary': 16.5,
+            'expiring': ["PROMO"],
+            'below': ["ACC_2"],
+            'exposure': {"*any": 11.5, "DST_64": 5.0},
+            'voice': {"ACC_1": 600, "ACC_2": 600},
+            'take': [("ACC_2", 1.5), ("ACC_1", 10.0)],
+        })
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy not installed")
+    def test_numpy_matches_python(self):
+
+        table = self.get_table()
+
+        with mock.patch("cgrates.accounts.balances._np", return_value=None):
+            expected = self.get_results(table)
+
+        self.assertIsNotNone(table._vectorized())
+        self.assertEqual(self.get_results(table), expected)
+
+
+class ReservationLedgerTests(BaseTests):
+    """
+    Reservation Ledger Tests
+    """
+
+    def test_reservations(self):
+
+        balances = {"1001": 1.0}
+        fetches = []
+        during_settle = []
+
+        def get_accounts(params):
+            fetches.append(params[0]['AccountIds'])
+            if during_settle:
+                # What other calls see while settle refreshes the balance
+                during_settle.append(ledger.available("1001"))
+            return [{"ID": "cgrates.org:{}".format(a), "BalanceMap": {"*monetary": [{"ID": "MAIN", "Value": balances[a]}]}}
+                    for a in params[0]['AccountIds'] if a in balances]
+
+        def process_cdr(params):
+            balances[params[0]['Account']] -= 0.3
+            return "OK"
+
+        # 0.01 per second, 0.1 connect fee
+        quote = Quote("DST_64", "64", "*any", 0.01, 0.01, 0.1, 1)
+
+        with FakeEngine(handlers={"ApierV2.GetAccounts": get_accounts, "CdrsV1.ProcessExternalCDR": process_cdr}) as engine:
+            ledger = ReservationLedger(Client(tenant="cgrates.org", host=engine.host, port=engine.port), max_age=None)
+
+            self.assertEqual(ledger.max_seconds("1001", quote), 90)
+
+            first = ledger.authorize("1001", quote, 60)
+            self.assertAlmostEqual(ledger.available("1001"), 0.3)
+            self.assertIsNone(ledger.authorize("1001", quote, 60))
+            self.assertIsNone(ledger.authorize("UNKNOWN", quote, 1))
+
+            self.assertEqual(fetches, [["1001"], ["UNKNOWN"]])
+
+            cdr = models.CDR()
+            cdr.account = "1001"
+            cdr.destination = "6421555"
+            cdr.answer_time = datetime.now()
+            cdr.usage = "30s"
+
+            during_settle.append(None)
+            self.assertTrue(ledger.settle(first.reservation_id, cdr))
+
+            # Before the refresh the debit is still held as the reservation, never above the settled 0.7
+            self.assertAlmostEqual(during_settle[1], 0.3)
+            self.assertAlmostEqual(ledger.available("1001"), 0.7)
+            self.assertEqual(ledger.stats()['reservations'], 0)
+
+            second = ledger.reserve("1001", 0.5)
+            self.assertEqual(ledger.release(second.reservation_id), second)
+            self.assertIsNone(ledger.release(second.reservation_id))
+
+    def test_increments(self):
+
+        # 1.0 per minute billed per started minute
+        quote = Quote("DST_64", "64", "*any", 1.0, 1.0 / 60, 0.0, 60)
+
+        self.assertEqual(estimate_cost(quote, 1), 1.0)
+        self.assertEqual(estimate_cost(quote, 60), 1.0)
+        self.assertEqual(estimate_cost(quote, 61), 2.0)
+
+        with FakeEngine(handlers={"ApierV2.GetAccounts": lambda params: [
+                {"ID": "cgrates.org:1001", "BalanceMap": {"*monetary": [{"ID": "MAIN", "Value": 2.5}]}}]}) as engine:
+            ledger = ReservationLedger(Client(tenant="cgrates.org", host=engine.host, port=engine.port), max_age=None)
+
+            # Two whole minutes, not 150 seconds
+            self.assertEqual(ledger.max_seconds("1001", quote), 120)
+
+            self.assertIsNotNone(ledger.authorize("1001", quote, 61))
+            self.assertAlmostEqual(ledger.available("1001"), 0.5)
+            self.assertIsNone(ledger.authorize("1001", quote, 1))
+
+
+class SharedCacheTests(BaseTests):
+    """
+    Shared Cache Tests
+    """
+
+    def test_shared_cache(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.bin")
+
+            cache = SharedCache(path, size=64 + 8 * 1024, slot_size=1024, ways=4)
+            other = SharedCache(path, size=1024 * 1024)
+
+            self.assertEqual((other.slots, other.slot_size), (8, 1024))
+
+            self.assertTrue(cache.set("a", b"1"))
+            self.assertTrue(cache.set("big", b"x" * 100000))
+            self.assertFalse(cache.set("random", os.urandom(2000)))
+
+            self.assertEqual(other.get("a"), b"1")
+            self.assertEqual(other.get("big"), b"x" * 100000)
+
+            generation = other.generation
+            other.invalidate()
+
+            self.assertIsNone(cache.get("a"))
+            self.assertFalse(cache.set("a", b"1", generation=generation))
+
+            for i in range(20):
+                cache.set("key_{}".format(i), b"v")
+            self.assertGreater(cache.evictions, 0)
+            self.assertEqual(cache.get("key_19"), b"v")
+
+            cache.close()
+            other.close()
+
+    def test_client_cache(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            calls = []
+
+            def handler(method):
+                def handle(params):
+                    calls.append(method)
+                    return ENGINE_HANDLERS[method](params) if method in ENGINE_HANDLERS else "OK"
+                return handle
+
+            engine = FakeEngine(handlers={m: handler(m) for m in ("ApierV1.GetCost", "ApierV1.ReloadCache")})
+
+            with engine:
+                workers = [Client(tenant="cgrates.org", host=engine.host, port=engine.port, cache=SharedCache(os.path.join(directory, "cache.bin")))
+                           for _ in range(2)]
+
+                request = dict(subject="1001", destination="6421555", answer_time=datetime(2024, 1, 1, 12), usage="60s")
+
+                self.assertEqual(workers[0].get_cost(**request).cost, 0.6)
+                self.assertEqual(workers[1].get_cost(**request).cost, 0.6)
+                self.assertEqual(calls, ["ApierV1.GetCost"])
+
+                workers[1].reload_cache()
+                workers[0].get_cost(**request)
+
+                self.assertEqual(calls, ["ApierV1.GetCost", "ApierV1.ReloadCache", "ApierV1.GetCost"])
+
+            # Same file, another engine: not served the first engine's entries
+            with FakeEngine(handlers={"ApierV1.GetCost": handler("ApierV1.GetCost")}) as other:
+                api = Client(tenant="cgrates.org", host=other.host, port=other.port, cache=SharedCache(os.path.join(directory, "cache.bin")))
+                api.get_cost(**request)
+
+            self.assertEqual(calls, ["ApierV1.GetCost", "ApierV1.ReloadCache", "ApierV1.GetCost", "ApierV1.GetCost"])
+
+
+class PrefixMinimizeTests(BaseTests):
+    """
+    Prefix Minimization Tests
+    """
+
+    def test_minimize(self):
+
+        self.assertEqual(minimize_prefixes(["642{}".format(d) for d in range(10)] + ["64{}".format(d) for d in range(10) if d != 2] + ["6425"]), ["64"])
+
+        # A prefix of another destination between them keeps the longer one, and is never collapsed over
+        self.assertEqual(minimize_destinations({"DST_A": ["64", "6421"], "DST_B": ["642"]}), {"DST_A": ["64", "6421"], "DST_B": ["642"]})
+        self.assertEqual(minimize_destinations({"DST_A": ["642{}".format(d) for d in range(10)], "DST_B": ["642"]})["DST_A"][:2], ["6420", "6421"])
+
+    def test_delta_upload(self):
+
+        calls = []
+
+        def handler(method):
+            def handle(params):
+                calls.append((method, params[0]['id'], params[0].get('Prefixes')))
+                return "OK"
+            return handle
+
+        destinations = {"DST_NZ": ["64{}".format(d) for d in range(10)], "DST_AU": ["61"]}
+
+        with FakeEngine(handlers={m: handler(m) for m in ("ApierV1.SetTPDestination", "ApierV1.LoadDestination")}) as engine:
+            uploader = DestinationUploader(Client(tenant="cgrates.org", host=engine.host, port=engine.port))
+
+            report = uploader.upload(destinations)
+            self.assertEqual((sorted(report.sent), report.prefixes, report.minimized), (["DST_AU", "DST_NZ"], 11, 2))
+
+            del calls[:]
+            destinations["DST_AU"] = ["612", "61", "672"]
+            destinations["DST_NZ"] = destinations["DST_NZ"][::-1]
+
+            report = uploader.upload(destinations)
+            self.assertEqual((report.sent, report.unchanged), (["DST_AU"], ["DST_NZ"]))
+            self.assertEqual(calls, [("ApierV1.SetTPDestination", "DST_AU", ["61", "672"]), ("ApierV1.LoadDestination", "DST_AU", None)])
+
+
 class TPManagementTests(TPManagementHelpers, BaseTests):
     """
     TP Management Tests
@@ -366,7 +1751,7 @@ class CDRTests(TPManagementHelpers, RatingHelpers, BaseTests):
                                  'rating_plan_id': self.rating_plan_id,
                                  'subject': '*out:test:call:*any'}],
              'usage': '60s'},
-            result
+            result.to_dict()
         )
 
 
@@ -473,3 +1858,46 @@ class AccountTests(TPManagementHelpers, RatingHelpers, BaseTests):
         self.assertEqual(len(result), 2)
 
         self.assertEqual(result[1]['Cost'], 0.1)
+
+    def test_bulk_balances(self):
+
+        account_ids = [self.get_id("ACC") for _ in range(3)]
+
+        for account_id in account_ids:
+            self.client.add_account(account_id)
+
+        progress = []
+
+        result = self.client.add_balances(
+            [{"account": account_id, "balance_id": "MainBalance", "value": 10} for account_id in account_ids],
+            refresh=True,
+            progress=lambda done, total: progress.append((done, total))
+        )
+
+        self.assertTrue(result.ok)
+        self.assertListEqual([a.account for a in result], account_ids)
+        self.assertEqual(progress[-1], (3, 3))
+
+        missing_id = self.get_id("ACC")
+
+        result = self.client.get_accounts_by_id(account_ids + [missing_id])
+
+        self.assertListEqual([a.account for a in result.results[:3]], account_ids)
+        self.assertListEqual([a.balance_map['*monetary'][0].value for a in result.results[:3]], [10.0] * 3)
+        self.assertIsNone(result[3])
+        self.assertListEqual(list(result.errors.keys()), [3])
+
+    def test_account_sync(self):
+
+        account_id = self.get_id("ACC")
+
+        self.client.add_account(account_id)
+
+        sync = AccountSync(self.client, page_size=10)
+
+        self.assertListEqual([(c.kind, c.account_id) for c in sync.changes()], [(ADDED, account_id)])
+        self.assertListEqual(list(sync.changes()), [])
+
+        self.client.add_balance(account_id, balance_id="MainBalance", value=10)
+
+        self.assertListEqual([(c.kind, c.account_id) for c in sync.changes()], [(CHANGED, account_id)])